@@ -0,0 +1,159 @@
+"""
+WebSocket 连接准入控制
+
+过载时与其让所有会话一起变慢（队列堆积、播放卡顿、上游超时），不如拒绝新连接，
+保住已有会话的体验。判断依据：
+
+- 当前连接数（每个连接对应一个设备会话）
+- 事件循环延迟（平滑值）
+- 进行中的上游 HTTP 请求数（LLM / TTS）
+
+超限时新连接最多排队等待 queue_timeout_s，期间条件恢复则放行；否则以 1013（稍后重试）
+关闭，关闭原因中带 retry-after 秒数，设备据此退避重连（多 worker 时通常会落到其他 worker）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from xiaozhi_nexus.api.drain import get_drainer
+from xiaozhi_nexus.inferencers.clients import upstream_inflight
+from xiaozhi_nexus.observability import REGISTRY, get_loop_monitor
+
+logger = logging.getLogger(__name__)
+
+# Try Again Later：服务端暂时过载
+CLOSE_TRY_AGAIN_LATER = 1013
+
+_rejected = REGISTRY.counter(
+    "xiaozhi_admission_rejected_total",
+    "WebSocket connections rejected by admission control",
+    labelnames=("reason",),
+)
+_queued = REGISTRY.counter(
+    "xiaozhi_admission_queued_total",
+    "WebSocket connections that waited in the admission queue",
+)
+_waiting = REGISTRY.gauge(
+    "xiaozhi_admission_waiting",
+    "WebSocket connections currently waiting for admission",
+)
+
+
+@dataclass(frozen=True)
+class AdmissionLimits:
+    """准入阈值（0 表示不限制该项）"""
+
+    max_sessions: int = 0
+    max_loop_lag_ms: float = 0.0
+    max_upstream_inflight: int = 0
+    # 超限时排队等待的最长时间（0 表示不排队，直接拒绝）与同时排队的连接数上限
+    queue_timeout_s: float = 0.0
+    max_queued: int = 100
+    retry_after_s: int = 5
+
+
+@dataclass(frozen=True)
+class AdmissionDecision:
+    admitted: bool
+    reason: str = ""
+
+    def close_reason(self, retry_after_s: int) -> str:
+        return f"{self.reason}; retry-after={retry_after_s}"
+
+
+class AdmissionController:
+    """
+    准入判断（在事件循环线程中使用）
+
+    admit() 返回放行结果后应立即（不经过 await）登记连接，避免多个排队连接同时被放行。
+
+    Args:
+        limits: 准入阈值
+        sessions: 返回当前连接数
+        loop_lag_s: 返回事件循环延迟（秒）
+        upstream_inflight: 返回进行中的上游请求数
+    """
+
+    def __init__(
+        self,
+        limits: AdmissionLimits,
+        sessions: Callable[[], int],
+        loop_lag_s: Callable[[], float],
+        upstream_inflight: Callable[[], int],
+    ) -> None:
+        self.limits = limits
+        self._sessions = sessions
+        self._loop_lag_s = loop_lag_s
+        self._upstream_inflight = upstream_inflight
+        self.waiting = 0
+
+    def overload_reason(self) -> Optional[str]:
+        """当前是否超限；返回超限项，未超限返回 None"""
+        limits = self.limits
+        if limits.max_sessions and self._sessions() >= limits.max_sessions:
+            return "sessions"
+        if limits.max_loop_lag_ms and self._loop_lag_s() * 1000.0 >= limits.max_loop_lag_ms:
+            return "loop_lag"
+        if (
+            limits.max_upstream_inflight
+            and self._upstream_inflight() >= limits.max_upstream_inflight
+        ):
+            return "upstream"
+        return None
+
+    async def admit(self) -> AdmissionDecision:
+        reason = self.overload_reason()
+        if reason is None:
+            return AdmissionDecision(True)
+
+        limits = self.limits
+        if limits.queue_timeout_s <= 0 or self.waiting >= limits.max_queued:
+            return self._reject(reason)
+
+        _queued.inc()
+        self.waiting += 1
+        _waiting.inc()
+        try:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + limits.queue_timeout_s
+            while loop.time() < deadline:
+                await asyncio.sleep(min(0.1, max(0.0, deadline - loop.time())))
+                reason = self.overload_reason()
+                if reason is None:
+                    return AdmissionDecision(True)
+        finally:
+            self.waiting -= 1
+            _waiting.dec()
+        return self._reject(reason or "timeout")
+
+    def _reject(self, reason: str) -> AdmissionDecision:
+        _rejected.inc(reason=reason)
+        logger.warning(f"Rejecting WebSocket connection: {reason} limit reached")
+        return AdmissionDecision(False, reason)
+
+
+_controller: Optional[AdmissionController] = None
+
+
+def configure_admission(limits: AdmissionLimits) -> AdmissionController:
+    """按配置创建当前进程的准入控制器（服务启动时调用）"""
+    global _controller
+    _controller = AdmissionController(
+        limits,
+        sessions=lambda: get_drainer().active,
+        loop_lag_s=lambda: get_loop_monitor().lag_s,
+        upstream_inflight=upstream_inflight,
+    )
+    return _controller
+
+
+def get_admission() -> AdmissionController:
+    """获取准入控制器；未配置时返回不做任何限制的实例"""
+    global _controller
+    if _controller is None:
+        _controller = configure_admission(AdmissionLimits())
+    return _controller
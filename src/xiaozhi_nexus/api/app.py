@@ -1,12 +1,116 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 
-from xiaozhi_nexus.api.ws import router as ws_router
+from xiaozhi_nexus.api.admission import AdmissionLimits, configure_admission
+from xiaozhi_nexus.api.debug import router as debug_router
+from xiaozhi_nexus.api.metrics import router as metrics_router
+from xiaozhi_nexus.api.ws import asr_realtime_target, router as ws_router
+from xiaozhi_nexus.audio.executor import configure_audio_executor, shutdown_audio_executor
+from xiaozhi_nexus.config import get_config
+from xiaozhi_nexus.inferencers.clients import (
+    ClientPoolLimits,
+    aclose_clients,
+    configure_client_pool,
+)
+from xiaozhi_nexus.inferencers.stream_asr import (
+    RealtimePoolLimits,
+    aclose_realtime_pool,
+    configure_realtime_pool,
+    get_realtime_pool,
+)
+from xiaozhi_nexus.observability import configure_loop_monitor
+from xiaozhi_nexus.observability.multiprocess import run_snapshot_writer
+from xiaozhi_nexus.observability.tracing import configure_tracing, shutdown_tracing
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
+    cfg = get_config()
+    if cfg.tts.audio_send_delay_ms is not None:
+        logger.warning(
+            "tts.audio_send_delay_ms is deprecated and ignored; "
+            "audio is paced by the playout scheduler (see tts.playout_burst_ms)"
+        )
+    configure_client_pool(
+        ClientPoolLimits(
+            max_connections=cfg.openai.max_connections,
+            max_keepalive_connections=cfg.openai.max_keepalive_connections,
+            keepalive_expiry=cfg.openai.keepalive_expiry,
+        )
+    )
+    # 多 worker 模式下定期导出本进程指标快照，供 /metrics 汇总
+    snapshot_task = asyncio.create_task(run_snapshot_writer())
+    configure_realtime_pool(
+        RealtimePoolLimits(
+            min_idle=cfg.asr.pool_min_idle,
+            max_connections=cfg.asr.pool_max_connections,
+            max_idle_s=cfg.asr.pool_max_idle_s,
+            health_check_interval_s=cfg.asr.pool_health_check_interval_s,
+            acquire_timeout_s=cfg.asr.pool_acquire_timeout_s,
+        )
+    )
+    configure_audio_executor(
+        thread_workers=cfg.system.audio_thread_workers,
+        process_workers=cfg.system.audio_process_workers,
+    )
+    admission = cfg.server.admission
+    configure_admission(
+        AdmissionLimits(
+            max_sessions=admission.max_sessions,
+            max_loop_lag_ms=admission.max_loop_lag_ms,
+            max_upstream_inflight=admission.max_upstream_inflight,
+            queue_timeout_s=admission.queue_timeout_s,
+            max_queued=admission.max_queued,
+            retry_after_s=admission.retry_after_s,
+        )
+    )
+    tracing = cfg.tracing
+    configure_tracing(
+        sample_rate=tracing.sample_rate,
+        slow_turn_ms=tracing.slow_turn_ms,
+        ring_size=tracing.ring_size,
+        path=Path(tracing.file.replace("{pid}", str(os.getpid()))) if tracing.file else None,
+        fmt=tracing.file_format,
+    )
+    loop_cfg = cfg.server.loop_monitor
+    loop_monitor = configure_loop_monitor(
+        interval_s=loop_cfg.interval_ms / 1000.0,
+        stall_threshold_s=loop_cfg.stall_threshold_ms / 1000.0,
+        stack_log_interval_s=loop_cfg.stack_log_interval_s,
+    )
+    loop_monitor.start()
+    target = asr_realtime_target()
+    if cfg.asr.pool_enabled and cfg.system.session_mode == "async" and target.api_key:
+        # 启动即预热，首个设备的 listen start 也无需等待建连
+        get_realtime_pool().prewarm(target)
+    try:
+        yield
+    finally:
+        snapshot_task.cancel()
+        try:
+            await snapshot_task
+        except asyncio.CancelledError:
+            pass
+        await loop_monitor.stop()
+        await aclose_realtime_pool()
+        await aclose_clients()
+        shutdown_audio_executor()
+        shutdown_tracing()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="xiaozhi-nexus")
+    app = FastAPI(title="xiaozhi-nexus", lifespan=_lifespan)
     app.include_router(ws_router)
+    app.include_router(metrics_router)
+    app.include_router(debug_router)
     return app
-
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from xiaozhi_nexus.config import get_config
+from xiaozhi_nexus.observability.tracing import get_tracer
+
+router = APIRouter(prefix="/debug")
+
+
+@router.get("/traces")
+async def traces(
+    device_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|chrome)$"),
+) -> Any:
+    """
+    最近的轮次追踪（新的在前），可按设备过滤
+
+    format=chrome 时返回 Chrome trace 事件数组，保存为文件后可直接在 chrome://tracing / Perfetto 中打开。
+    多 worker 部署时只包含处理本次请求的 worker 记录的轮次。
+    """
+    if not get_config().tracing.debug_endpoint:
+        raise HTTPException(status_code=404)
+    recent = get_tracer().recent(device_id, limit)
+    if format == "chrome":
+        tids: dict[str, int] = {}
+        events: list[dict[str, Any]] = []
+        for trace in reversed(recent):
+            tid = tids.setdefault(trace.session_id, len(tids) + 1)
+            events.extend(trace.to_chrome_events(tid))
+        return events
+    return {"traces": [trace.to_dict() for trace in recent]}
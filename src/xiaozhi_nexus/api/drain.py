@@ -0,0 +1,89 @@
+"""
+WebSocket 连接排空
+
+worker 收到退出信号后先停止接受新连接，再等待已有连接在各自的空闲时刻（不在说话、
+不在播放）以 1012（服务重启）关闭，设备随即重连到其他 worker；超过排空时限后才强制退出。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+from xiaozhi_nexus.observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# 服务重启，客户端应稍后重连
+CLOSE_SERVICE_RESTART = 1012
+
+
+class ConnectionDrainer:
+    """
+    跟踪当前进程的 WebSocket 连接数，并在退出前协调排空
+
+    所有方法都在事件循环线程中调用。
+    """
+
+    def __init__(self) -> None:
+        self.active = 0
+        self._draining = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def draining(self) -> bool:
+        return self._draining.is_set()
+
+    def opened(self) -> None:
+        self.active += 1
+        self._idle.clear()
+
+    def closed(self) -> None:
+        self.active = max(0, self.active - 1)
+        if self.active == 0:
+            self._idle.set()
+
+    def begin(self) -> None:
+        """开始排空：通知所有连接在空闲时关闭"""
+        if not self.draining:
+            logger.info(f"Draining {self.active} WebSocket connection(s)")
+            self._draining.set()
+
+    async def wait_draining(self) -> None:
+        await self._draining.wait()
+
+    async def wait_closed(self, timeout: Optional[float]) -> bool:
+        """
+        等待所有连接关闭
+
+        Returns:
+            是否在超时前全部关闭
+        """
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Drain timeout after {timeout}s, {self.active} connection(s) still open"
+            )
+            return False
+        return True
+
+
+_drainer: Optional[ConnectionDrainer] = None
+
+
+def get_drainer() -> ConnectionDrainer:
+    """获取当前进程的连接排空协调器"""
+    global _drainer
+    if _drainer is None:
+        _drainer = ConnectionDrainer()
+    return _drainer
+
+
+REGISTRY.gauge(
+    "xiaozhi_ws_connections",
+    "Open device WebSocket connections",
+    fn=lambda: _drainer.active if _drainer is not None else 0,
+)
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from xiaozhi_nexus.observability import render_metrics
+
+router = APIRouter()
+
+# Prometheus 文本格式的内容类型
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Prometheus 抓取端点（多 worker 部署时为所有 worker 的汇总）"""
+    return PlainTextResponse(render_metrics(), media_type=CONTENT_TYPE)
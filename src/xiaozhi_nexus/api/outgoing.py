@@ -0,0 +1,223 @@
+"""
+WebSocket 下行消息通道
+
+控制消息（stt / llm / tts 状态等 JSON）和 Opus 音频包分为两条队列：
+
+- 控制队列总是优先发送，不会排在积压的音频之后
+- 音频队列在打断时整体替换为空队列，O(1) 截断
+- 两条队列都有上限，溢出时按明确的策略丢弃并计数：
+  音频默认丢弃最旧的包（保证播放跟上最新内容），控制消息丢弃最新的消息
+
+发送端每次被唤醒时取出所有已就绪的消息（控制消息在前）连续写出，
+固定内容的控制消息使用预先编码好的文本，其余用共享的紧凑 JSON 编码器序列化。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import weakref
+from collections import deque
+from typing import Any, Deque, List, Literal, Optional, Tuple
+
+from starlette.websockets import WebSocket
+
+from xiaozhi_nexus.api.protocol import BinaryProtocol
+from xiaozhi_nexus.observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+OverflowPolicy = Literal["drop_oldest", "drop_newest"]
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest")
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+# 内容固定、发送频繁的控制消息，预先编码
+FIXED_CONTROL_MESSAGES: Tuple[dict, ...] = (
+    {"type": "tts", "state": "start"},
+    {"type": "tts", "state": "stop"},
+    {"type": "tts", "state": "stop", "interrupted": True},
+    {"type": "llm", "emotion": "neutral"},
+    {"type": "llm", "state": "stop", "interrupted": True},
+)
+
+
+def _template_key(payload: dict) -> tuple:
+    # 键中带上值的类型：True == 1 且哈希相同，只比较值会让 {"interrupted": 1} 命中 true 的模板
+    return tuple((key, type(value), value) for key, value in payload.items())
+
+
+_templates = {_template_key(msg): _json_encoder.encode(msg) for msg in FIXED_CONTROL_MESSAGES}
+
+
+def encode_control(payload: dict) -> str:
+    """序列化控制消息：命中模板时直接返回预编码文本"""
+    try:
+        cached = _templates.get(_template_key(payload))
+    except TypeError:
+        # 值不可哈希（嵌套结构），不可能命中模板
+        cached = None
+    if cached is not None:
+        return cached
+    return _json_encoder.encode(payload)
+
+
+_channels: "weakref.WeakSet[OutgoingChannel]" = weakref.WeakSet()
+
+_dropped = REGISTRY.counter(
+    "xiaozhi_outgoing_dropped_total",
+    "Outgoing messages dropped because a lane was full",
+    labelnames=("lane",),
+)
+_truncated = REGISTRY.counter(
+    "xiaozhi_outgoing_audio_truncated_total",
+    "Queued audio packets discarded by interrupts",
+)
+REGISTRY.gauge(
+    "xiaozhi_outgoing_control_depth",
+    "Queued control messages across all connections",
+    fn=lambda: sum(ch.control_depth for ch in list(_channels)),
+)
+REGISTRY.gauge(
+    "xiaozhi_outgoing_audio_depth",
+    "Queued audio packets across all connections",
+    fn=lambda: sum(ch.audio_depth for ch in list(_channels)),
+)
+
+
+class OutgoingChannel:
+    """
+    单个连接的双队列下行通道
+
+    put_*/clear_audio 只能在事件循环线程中调用（线程模式会话经 call_soon_threadsafe 转发）。
+    """
+
+    def __init__(
+        self,
+        audio_maxsize: int = 2000,
+        control_maxsize: int = 500,
+        audio_overflow: OverflowPolicy = "drop_oldest",
+    ) -> None:
+        if audio_overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {audio_overflow}")
+        self.audio_maxsize = int(audio_maxsize)
+        self.control_maxsize = int(control_maxsize)
+        self.audio_overflow = audio_overflow
+
+        self._control: Deque[Any] = deque()
+        self._audio: Deque[bytes] = deque()
+        self._ready = asyncio.Event()
+        # 每次打断截断音频时递增，发送端据此丢弃已取出但尚未发出的音频
+        self.audio_epoch = 0
+
+        self.dropped_audio = 0
+        self.dropped_control = 0
+        _channels.add(self)
+
+    @property
+    def control_depth(self) -> int:
+        return len(self._control)
+
+    @property
+    def audio_depth(self) -> int:
+        return len(self._audio)
+
+    def put_control(self, payload: Any) -> None:
+        if len(self._control) >= self.control_maxsize:
+            # 控制消息保序：丢弃新消息而不是打乱已排队的消息
+            self.dropped_control += 1
+            _dropped.inc(lane="control")
+            if self.dropped_control == 1 or self.dropped_control % 100 == 0:
+                logger.warning(
+                    f"Outgoing control lane full ({self.control_maxsize}), "
+                    f"dropped {self.dropped_control} messages"
+                )
+            return
+        self._control.append(payload)
+        self._ready.set()
+
+    def put_audio(self, packet: bytes) -> None:
+        if len(self._audio) >= self.audio_maxsize:
+            self.dropped_audio += 1
+            _dropped.inc(lane="audio")
+            if self.dropped_audio == 1 or self.dropped_audio % 100 == 0:
+                logger.warning(
+                    f"Outgoing audio lane full ({self.audio_maxsize}, {self.audio_overflow}), "
+                    f"dropped {self.dropped_audio} packets"
+                )
+            if self.audio_overflow == "drop_newest":
+                return
+            self._audio.popleft()
+        self._audio.append(packet)
+        self._ready.set()
+
+    def clear_audio(self) -> None:
+        """丢弃所有排队的音频（打断）；直接换成空队列，不逐个出队"""
+        self.audio_epoch += 1
+        if self._audio:
+            _truncated.inc(len(self._audio))
+            self._audio = deque()
+
+    async def get_batch(self, max_audio: int = 16) -> Tuple[List[Any], List[bytes]]:
+        """
+        等待并取出一批已就绪的消息
+
+        Returns:
+            (全部控制消息, 至多 max_audio 个音频包)；发送端应先发控制消息。
+            限制每批音频数量，使批次发送期间新到的控制消息不必等待太久。
+        """
+        while not self._control and not self._audio:
+            self._ready.clear()
+            await self._ready.wait()
+
+        control: List[Any] = []
+        if self._control:
+            control = list(self._control)
+            self._control.clear()
+
+        audio: List[bytes] = []
+        queue = self._audio
+        if queue:
+            if len(queue) <= max_audio:
+                audio = list(queue)
+                self._audio = deque()
+            else:
+                popleft = queue.popleft
+                audio = [popleft() for _ in range(max_audio)]
+        return control, audio
+
+    def close(self) -> None:
+        self._control.clear()
+        self._audio = deque()
+        _channels.discard(self)
+
+
+async def run_sender(
+    channel: OutgoingChannel,
+    websocket: WebSocket,
+    protocol: Optional[BinaryProtocol] = None,
+    max_audio: int = 16,
+) -> None:
+    """
+    下行发送循环：每次唤醒发出一整批消息，批内不再逐条等待队列
+
+    protocol 协商为带头部的版本时，音频包在发出前才加上头部（时间戳即实际发送时间）。
+    """
+    send_text = websocket.send_text
+    send_bytes = websocket.send_bytes
+    while True:
+        control, audio = await channel.get_batch(max_audio)
+        for payload in control:
+            await send_text(encode_control(payload))
+        epoch = channel.audio_epoch
+        for packet in audio:
+            if channel.audio_epoch != epoch:
+                # 批次发送期间发生了打断，剩余音频作废
+                break
+            if protocol is not None and protocol.has_header:
+                # 复用协议缓冲区，必须在发出后才能封装下一帧
+                await send_bytes(protocol.frame(packet))  # type: ignore[arg-type]
+            else:
+                await send_bytes(packet)
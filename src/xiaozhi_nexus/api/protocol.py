@@ -0,0 +1,124 @@
+"""
+小智 WebSocket 二进制协议
+
+版本 1 的二进制帧就是裸 Opus 包；版本 2/3 在负载前带有头部（网络字节序）：
+
+- v2: version(u16) type(u16) reserved(u32) timestamp_ms(u32) payload_size(u32)，共 16 字节
+- v3: type(u8) reserved(u8) payload_size(u16)，共 4 字节
+
+type 为 0 表示 Opus 音频，1 表示 JSON。版本由客户端 hello 中的 version 字段
+（或握手请求头 Protocol-Version）决定，服务端在 hello 回复中确认同一版本。
+"""
+
+from __future__ import annotations
+
+import struct
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+BINARY_TYPE_OPUS = 0
+BINARY_TYPE_JSON = 1
+
+SUPPORTED_VERSIONS = (1, 2, 3)
+
+_V2_HEADER = struct.Struct(">HHIII")
+_V3_HEADER = struct.Struct(">BBH")
+
+
+@dataclass(frozen=True)
+class BinaryFrame:
+    """解析后的上行二进制帧"""
+
+    type: int
+    payload: memoryview
+    timestamp_ms: Optional[int] = None  # 仅 v2 携带
+
+
+def negotiate_version(
+    requested: object, header_version: Optional[str] = None, max_version: int = 3
+) -> int:
+    """
+    根据客户端 hello 的 version 字段（缺省时使用 Protocol-Version 请求头）确定协议版本
+
+    不支持或超出 max_version 的版本回退到 1。
+    """
+    candidate = requested if requested is not None else header_version
+    try:
+        version = int(candidate)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return 1
+    if version not in SUPPORTED_VERSIONS or version > max_version:
+        return 1
+    return version
+
+
+class BinaryProtocol:
+    """
+    单个连接的二进制帧编解码
+
+    下行帧复用同一个 bytearray：头部用 pack_into 原地写入，负载只拷贝一次，
+    返回的 memoryview 在下一次 frame() 调用前有效（发送端须在发出后再封装下一帧）。
+    """
+
+    def __init__(self, version: int = 1, max_payload: int = 4000) -> None:
+        self._buffer = bytearray(_V2_HEADER.size + max_payload)
+        self._epoch = time.monotonic()
+        self.set_version(version)
+
+    def set_version(self, version: int) -> None:
+        """切换协议版本（收到 hello 后调用）"""
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported binary protocol version: {version}")
+        self.version = version
+        self._header_size = {1: 0, 2: _V2_HEADER.size, 3: _V3_HEADER.size}[version]
+
+    @property
+    def has_header(self) -> bool:
+        return self.version != 1
+
+    def timestamp_ms(self) -> int:
+        """服务端时间戳：自连接建立以来的毫秒数（u32 回绕）"""
+        return int((time.monotonic() - self._epoch) * 1000) & 0xFFFFFFFF
+
+    def frame(
+        self, payload: bytes, frame_type: int = BINARY_TYPE_OPUS
+    ) -> bytes | memoryview:
+        """为下行负载加上协议头，版本 1 原样返回"""
+        if self.version == 1:
+            return payload
+
+        size = len(payload)
+        total = self._header_size + size
+        if total > len(self._buffer):
+            self._buffer = bytearray(total)
+        buf = self._buffer
+        if self.version == 2:
+            _V2_HEADER.pack_into(buf, 0, 2, frame_type, 0, self.timestamp_ms(), size)
+        else:
+            _V3_HEADER.pack_into(buf, 0, frame_type, 0, size)
+        buf[self._header_size : total] = payload
+        return memoryview(buf)[:total]
+
+    def parse(self, data: bytes) -> Optional[BinaryFrame]:
+        """
+        解析上行二进制帧
+
+        Returns:
+            BinaryFrame；头部不完整或长度不符时返回 None
+        """
+        view = memoryview(data)
+        if self.version == 1:
+            return BinaryFrame(type=BINARY_TYPE_OPUS, payload=view)
+
+        if len(view) < self._header_size:
+            return None
+        if self.version == 2:
+            _, frame_type, _, timestamp, size = _V2_HEADER.unpack_from(view, 0)
+        else:
+            frame_type, _, size = _V3_HEADER.unpack_from(view, 0)
+            timestamp = None
+        payload = view[self._header_size :]
+        if size > len(payload):
+            return None
+        return BinaryFrame(type=frame_type, payload=payload[:size], timestamp_ms=timestamp)
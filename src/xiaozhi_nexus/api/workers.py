@@ -0,0 +1,316 @@
+"""
+多 worker 服务
+
+serve --workers N 时主进程只做监管：启动 N 个 worker 进程，每个 worker 各自以
+SO_REUSEPORT 绑定同一端口（由内核在 worker 之间分配新连接），各自持有客户端连接池、
+Realtime 连接池、音频计算池和指标注册表。
+
+- 收到 SIGHUP 时滚动重启：逐个启动新 worker，就绪后再让旧 worker 排空退出，服务不中断
+- 收到 SIGINT/SIGTERM 时让所有 worker 排空后退出
+- worker 意外退出时自动补起
+
+worker 收到第一个 SIGTERM/SIGINT 后停止接受新连接，等待已有 WebSocket 连接在空闲时关闭
+（最长 drain_timeout_s），之后才执行正常的关闭流程；排空期间再次收到 SIGINT 则立即退出。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import FrameType
+from typing import Any, Callable, List, Optional
+
+import uvicorn
+
+from xiaozhi_nexus.observability.multiprocess import METRICS_DIR_ENV, retire_snapshot
+
+logger = logging.getLogger(__name__)
+
+APP_FACTORY = "xiaozhi_nexus.api.app:create_app"
+
+# 新 worker 启动（完成 lifespan 初始化）的最长等待时间
+_READY_TIMEOUT_S = 60.0
+# worker 启动后很快退出时，补起前的等待时间（避免配置错误时高频重启）
+_RESPAWN_BACKOFF_S = 1.0
+
+
+def reuseport_supported() -> bool:
+    return hasattr(socket, "SO_REUSEPORT")
+
+
+def create_reuseport_socket(host: str, port: int) -> socket.socket:
+    """创建设置了 SO_REUSEPORT 的监听套接字，多个进程可同时绑定同一端口"""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+class DrainingServer(uvicorn.Server):
+    """
+    退出前排空 WebSocket 连接的 uvicorn 服务
+
+    第一个退出信号只关闭监听套接字并开始排空，连接全部关闭（或超时）后才进入 uvicorn 的
+    正常关闭流程；重复的 SIGTERM 被忽略（监管进程可能重发），排空期间的 SIGINT 立即退出。
+    """
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        drain_timeout_s: float = 30.0,
+        on_ready: Optional[Callable[[], None]] = None,
+    ) -> None:
+        super().__init__(config)
+        self.drain_timeout_s = drain_timeout_s
+        self._on_ready = on_ready
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._drain_started = False
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        self._loop = asyncio.get_running_loop()
+        await super().startup(sockets=sockets)
+        if not self.should_exit and self._on_ready is not None:
+            self._on_ready()
+
+    def handle_exit(self, sig: int, frame: Optional[FrameType]) -> None:
+        if self._loop is None or self.should_exit:
+            super().handle_exit(sig, frame)
+            return
+        if self._drain_started:
+            if sig == signal.SIGINT:
+                logger.warning("Second interrupt, exiting without waiting for connections")
+                super().handle_exit(sig, frame)
+            return
+        self._drain_started = True
+        self._loop.call_soon_threadsafe(self._start_drain)
+
+    def _start_drain(self) -> None:
+        from xiaozhi_nexus.api.drain import get_drainer
+
+        # 停止接受新连接：SO_REUSEPORT 下新连接由其他 worker 接收
+        for server in getattr(self, "servers", []):
+            server.close()
+        drainer = get_drainer()
+        drainer.begin()
+
+        async def drain_then_exit() -> None:
+            await drainer.wait_closed(self.drain_timeout_s)
+            self.should_exit = True
+
+        asyncio.ensure_future(drain_then_exit())
+
+
+def _worker_main(
+    index: int,
+    host: str,
+    port: int,
+    config_path: Optional[str],
+    drain_timeout_s: float,
+    metrics_dir: str,
+    ready: Any,
+) -> None:
+    """worker 进程入口（spawn 启动，需重新加载配置）"""
+    os.environ[METRICS_DIR_ENV] = metrics_dir
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s [%(levelname)s] [worker {index}] %(message)s",
+        stream=sys.stdout,
+    )
+    # 终端挂断会发给整个进程组：滚动重启由监管进程处理，worker 忽略 SIGHUP
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    from xiaozhi_nexus.config import load_config
+
+    load_config(Path(config_path) if config_path else None)
+
+    sock = create_reuseport_socket(host, port)
+    config = uvicorn.Config(APP_FACTORY, factory=True, log_level="info")
+    server = DrainingServer(config, drain_timeout_s=drain_timeout_s, on_ready=ready.set)
+    server.run(sockets=[sock])
+
+
+@dataclass
+class _Worker:
+    index: int
+    process: multiprocessing.process.BaseProcess
+    ready: Any
+    started_at: float = field(default_factory=time.monotonic)
+
+
+class WorkerSupervisor:
+    """
+    worker 进程监管
+
+    Args:
+        workers: worker 数量
+        host/port: 所有 worker 共同绑定的地址
+        config_path: 配置文件路径（worker 重新加载；None 时按默认规则查找）
+        drain_timeout_s: 每个 worker 退出前排空连接的最长时间
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        host: str,
+        port: int,
+        config_path: Optional[Path] = None,
+        drain_timeout_s: float = 30.0,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be >= 1")
+        if not reuseport_supported():
+            raise RuntimeError("SO_REUSEPORT is not supported on this platform")
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.config_path = str(config_path) if config_path else None
+        self.drain_timeout_s = drain_timeout_s
+
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots: List[Optional[_Worker]] = [None] * workers
+        self._retiring: List[_Worker] = []
+        self._stop = False
+        self._restart = False
+        self._metrics_dir = tempfile.mkdtemp(prefix="xiaozhi-metrics-")
+
+    # ---- 主循环 ----
+
+    def run(self) -> None:
+        # 先在主进程中绑定一次，端口被占用时立即报错，而不是让 worker 反复失败
+        create_reuseport_socket(self.host, self.port).close()
+
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._handle_restart)
+
+        logger.info(
+            f"Starting {self.workers} workers on {self.host}:{self.port} (pid {os.getpid()}), "
+            "send SIGHUP for a rolling restart"
+        )
+        try:
+            for index in range(self.workers):
+                self._slots[index] = self._spawn(index)
+            while not self._stop:
+                if self._restart:
+                    self._restart = False
+                    self._rolling_restart()
+                self._reap()
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+
+    def _handle_stop(self, sig: int, frame: Optional[FrameType]) -> None:
+        if self._stop:
+            # 再次收到停止信号：不再等待排空
+            logger.warning("Forcing worker shutdown")
+            for worker in self._all_workers():
+                if worker.process.is_alive():
+                    worker.process.kill()
+            return
+        self._stop = True
+
+    def _handle_restart(self, sig: int, frame: Optional[FrameType]) -> None:
+        self._restart = True
+
+    # ---- worker 管理 ----
+
+    def _spawn(self, index: int) -> _Worker:
+        ready = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                index,
+                self.host,
+                self.port,
+                self.config_path,
+                self.drain_timeout_s,
+                self._metrics_dir,
+                ready,
+            ),
+            name=f"xiaozhi-worker-{index}",
+        )
+        process.start()
+        logger.info(f"Worker {index} started (pid {process.pid})")
+        return _Worker(index=index, process=process, ready=ready)
+
+    def _retire(self, worker: _Worker) -> None:
+        """让 worker 排空后退出（不等待）"""
+        if worker.process.is_alive() and worker.process.pid is not None:
+            os.kill(worker.process.pid, signal.SIGTERM)
+        self._retiring.append(worker)
+
+    def _rolling_restart(self) -> None:
+        logger.info("Rolling restart")
+        for index in range(self.workers):
+            if self._stop:
+                return
+            old = self._slots[index]
+            new = self._spawn(index)
+            deadline = time.monotonic() + _READY_TIMEOUT_S
+            while not new.ready.wait(0.2):
+                if not new.process.is_alive() or time.monotonic() > deadline or self._stop:
+                    logger.error(
+                        f"Replacement worker {index} failed to start, aborting rolling restart"
+                    )
+                    self._retire(new)
+                    return
+            self._slots[index] = new
+            if old is not None:
+                self._retire(old)
+        logger.info("Rolling restart complete")
+
+    def _reap(self) -> None:
+        for worker in list(self._retiring):
+            if not worker.process.is_alive():
+                worker.process.join()
+                retire_snapshot(Path(self._metrics_dir), worker.process.pid)
+                self._retiring.remove(worker)
+                logger.info(f"Worker {worker.index} (pid {worker.process.pid}) exited")
+
+        for index, worker in enumerate(self._slots):
+            if worker is None or worker.process.is_alive():
+                continue
+            worker.process.join()
+            retire_snapshot(Path(self._metrics_dir), worker.process.pid)
+            logger.warning(
+                f"Worker {index} (pid {worker.process.pid}) exited unexpectedly "
+                f"with code {worker.process.exitcode}, restarting"
+            )
+            if time.monotonic() - worker.started_at < 5.0:
+                time.sleep(_RESPAWN_BACKOFF_S)
+            self._slots[index] = self._spawn(index)
+
+    def _all_workers(self) -> List[_Worker]:
+        return [w for w in self._slots if w is not None] + list(self._retiring)
+
+    def _shutdown(self) -> None:
+        workers = self._all_workers()
+        logger.info(f"Stopping {len(workers)} worker(s)")
+        for worker in workers:
+            if worker.process.is_alive() and worker.process.pid is not None:
+                os.kill(worker.process.pid, signal.SIGTERM)
+
+        # 排空时间之外再留出 uvicorn 正常关闭的时间
+        deadline = time.monotonic() + self.drain_timeout_s + 10.0
+        for worker in workers:
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning(f"Worker {worker.index} did not exit in time, killing")
+                worker.process.kill()
+                worker.process.join()
+        shutil.rmtree(self._metrics_dir, ignore_errors=True)
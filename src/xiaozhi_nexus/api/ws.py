@@ -1,27 +1,56 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import json
 import logging
+import uuid
 from dataclasses import dataclass
-from typing import Any, Literal
+from typing import Any, Callable
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from xiaozhi_nexus.api.admission import CLOSE_TRY_AGAIN_LATER, get_admission
+from xiaozhi_nexus.api.drain import CLOSE_SERVICE_RESTART, ConnectionDrainer, get_drainer
+from xiaozhi_nexus.api.outgoing import OutgoingChannel, run_sender
+from xiaozhi_nexus.api.protocol import (
+    BINARY_TYPE_JSON,
+    BINARY_TYPE_OPUS,
+    BinaryProtocol,
+    negotiate_version,
+)
+from xiaozhi_nexus.audio.executor import get_audio_executor
 from xiaozhi_nexus.audio.opus import OpusDecoder, OpusEncoder
+from xiaozhi_nexus.audio.vad import Endpointer, StreamingVAD
+from xiaozhi_nexus.observability.latency import TurnTimer
+from xiaozhi_nexus.observability.loop import call_soon_threadsafe
+from xiaozhi_nexus.observability.tracing import get_tracer
+from xiaozhi_nexus.runtime.async_session import AsyncStreamSession
+from xiaozhi_nexus.runtime.playout import get_playout_scheduler
 from xiaozhi_nexus.runtime.session import StreamSession
-from xiaozhi_nexus.inferencers.stream_asr import OpenAIRealtimeASRInferencer
+from xiaozhi_nexus.inferencers.stream_asr import (
+    OpenAIRealtimeASRInferencer,
+    RealtimeTarget,
+    get_realtime_pool,
+)
 from xiaozhi_nexus.inferencers.chat import OpenAIChatInferencer
 from xiaozhi_nexus.inferencers.tts import OpenAITTSInferencer
 from xiaozhi_nexus.config import get_config
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
-def _create_chat_inferencer() -> OpenAIChatInferencer | None:
+def _create_chat_inferencer(
+    on_stage: Callable[[str], None] | None = None,
+) -> OpenAIChatInferencer | None:
     """
     从全局配置创建 Chat 推理器
 
+    Args:
+        on_stage: 链路计时回调（llm_first_token / llm_done）
+
     Returns:
         OpenAIChatInferencer 实例，如果未配置 API Key 则返回 None
     """
@@ -40,10 +69,15 @@ def _create_chat_inferencer() -> OpenAIChatInferencer | None:
         max_history=cfg.llm.max_history,
         system_prompt=cfg.system.prompt,
         verify_ssl=cfg.openai.verify_ssl,
+        on_stage=on_stage,
     )
 
 
-def _create_tts_inferencer(sample_rate: int) -> OpenAITTSInferencer:
+def _create_tts_inferencer(
+    sample_rate: int,
+    on_stage: Callable[[str], None] | None = None,
+    on_span: Callable[..., None] | None = None,
+) -> OpenAITTSInferencer:
     """从全局配置创建 TTS 推理器"""
     cfg = get_config()
 
@@ -57,27 +91,102 @@ def _create_tts_inferencer(sample_rate: int) -> OpenAITTSInferencer:
         model=cfg.tts.model,
         voice=cfg.tts.voice,
         response_format=cfg.tts.response_format,
+        pcm_sample_rate=cfg.tts.pcm_sample_rate,
         output_sample_rate=sample_rate,
         chunk_duration_ms=cfg.tts.chunk_duration_ms,
+        resample_quality=cfg.tts.resample_quality,
         verify_ssl=cfg.tts.verify_ssl,
+        on_stage=on_stage,
+        on_span=on_span,
     )
 
 
-def _create_asr_inferencer(sample_rate: int) -> OpenAIRealtimeASRInferencer:
-    """从全局配置创建 ASR 推理器"""
+def asr_realtime_target() -> RealtimeTarget:
+    """从全局配置得到 ASR 的 Realtime 连接目标"""
     cfg = get_config()
 
     # ASR 配置回退到 OpenAI 配置
-    base_url = cfg.asr.base_url or cfg.openai.base_url
-    api_key = cfg.asr.api_key or cfg.openai.api_key
+    return RealtimeTarget(
+        base_url=cfg.asr.base_url or cfg.openai.base_url,
+        api_key=cfg.asr.api_key or cfg.openai.api_key,
+        model=cfg.asr.model,
+        verify_ssl=cfg.asr.verify_ssl,
+    )
+
+
+def _use_realtime_pool() -> bool:
+    cfg = get_config()
+    return cfg.asr.pool_enabled and cfg.system.session_mode == "async"
+
+
+def _create_asr_inferencer(
+    sample_rate: int,
+    on_stage: Callable[[str], None] | None = None,
+    vad: StreamingVAD | None = None,
+) -> OpenAIRealtimeASRInferencer:
+    """
+    从全局配置创建 ASR 推理器
+
+    vad 为会话用于打断检测的 VAD 时，端点检测直接读取它的状态，不再重复计算
+    """
+    cfg = get_config()
+    target = asr_realtime_target()
+
+    endpointer_factory = None
+    if cfg.asr.endpointing:
+        endpointer_factory = functools.partial(
+            _create_endpointer,
+            sample_rate,
+            cfg.asr.endpoint_silence_ms,
+            cfg.asr.endpoint_min_speech_ms,
+            vad,
+        )
 
     return OpenAIRealtimeASRInferencer(
-        base_url=base_url,
-        api_key=api_key,
-        model=cfg.asr.model,
+        base_url=target.base_url,
+        api_key=target.api_key,
+        model=target.model,
         sample_rate=sample_rate,
         chunk_duration_ms=cfg.asr.chunk_duration_ms,
-        verify_ssl=cfg.asr.verify_ssl,
+        endpointer_factory=endpointer_factory,
+        verify_ssl=target.verify_ssl,
+        connection_pool=get_realtime_pool() if _use_realtime_pool() else None,
+        on_stage=on_stage,
+    )
+
+
+def _create_vad(sample_rate: int) -> StreamingVAD:
+    """从全局配置创建会话级 VAD"""
+    cfg = get_config()
+
+    return StreamingVAD(
+        sample_rate=sample_rate,
+        energy_threshold_db=cfg.vad.energy_threshold_db,
+        snr_threshold_db=cfg.vad.snr_threshold_db,
+        zcr_threshold=cfg.vad.zcr_threshold,
+        noise_adapt_rate=cfg.vad.noise_adapt_rate,
+        speech_start_ms=cfg.vad.speech_start_ms,
+        hangover_ms=cfg.vad.hangover_ms,
+    )
+
+
+def _create_endpointer(
+    sample_rate: int,
+    silence_ms: int,
+    min_speech_ms: int,
+    vad: StreamingVAD | None = None,
+) -> Endpointer:
+    """
+    创建 ASR 端点检测器
+
+    传入会话的 VAD 时共用它的逐帧判定（会话在音频送入 ASR 之前已处理过同一段音频），
+    否则按同一份 VAD 配置单独创建。
+    """
+    return Endpointer(
+        vad=vad if vad is not None else _create_vad(sample_rate),
+        silence_ms=silence_ms,
+        min_speech_ms=min_speech_ms,
+        feed_vad=vad is None,
     )
 
 
@@ -103,81 +212,197 @@ def _parse_audio_params(payload: dict[str, Any]) -> AudioParams:
     )
 
 
-OutgoingKind = Literal["json", "bytes"]
-
-
-@dataclass(frozen=True)
-class Outgoing:
-    kind: OutgoingKind
-    payload: Any
-
-
 @router.websocket("/ws")
 @router.websocket("/xiaozhi/v1")
 @router.websocket("/xiaozhi/v1/")
 async def websocket_endpoint(websocket: WebSocket) -> None:
+    decision = await get_admission().admit()
+    if not decision.admitted:
+        # 先 accept 再关闭，设备才能收到关闭码（握手阶段拒绝只会得到 HTTP 403）
+        retry_after_s = get_admission().limits.retry_after_s
+        await websocket.accept()
+        await websocket.close(
+            code=CLOSE_TRY_AGAIN_LATER, reason=decision.close_reason(retry_after_s)
+        )
+        return
+
+    # 放行后立即登记（中间不能有 await），排队中的其他连接才能看到最新的连接数
+    drainer = get_drainer()
+    drainer.opened()
+    try:
+        await _handle_connection(websocket, drainer)
+    finally:
+        drainer.closed()
+
+
+def _device_id(websocket: WebSocket) -> str:
+    """设备标识：优先取握手头 device-id，其次查询参数，最后回退为客户端地址"""
+    device_id = websocket.headers.get("device-id") or websocket.query_params.get("device-id")
+    if device_id:
+        return device_id
+    client = websocket.client
+    return f"{client.host}:{client.port}" if client is not None else "unknown"
+
+
+async def _handle_connection(websocket: WebSocket, drainer: ConnectionDrainer) -> None:
     await websocket.accept()
+    device_id = _device_id(websocket)
+    connection_id = uuid.uuid4().hex[:12]
 
     loop = asyncio.get_running_loop()
-    outgoing: asyncio.Queue[Outgoing] = asyncio.Queue(maxsize=2000)
+    server_cfg = get_config().server
+    outgoing = OutgoingChannel(
+        audio_maxsize=server_cfg.outgoing_audio_maxsize,
+        control_maxsize=server_cfg.outgoing_control_maxsize,
+        audio_overflow=server_cfg.outgoing_audio_overflow,
+    )
+
+    # 二进制帧协议：hello 之前按版本 1（裸 Opus）处理
+    protocol = BinaryProtocol(version=1)
 
     listening = False
     audio_params: AudioParams | None = None
     decoder: OpusDecoder | None = None
     encoder = OpusEncoder(sample_rate=24000, channels=1, frame_duration_ms=20)
+    # 上行解码和下行编码各占一个有序通道：同一方向内保序，两个方向之间可并行
+    executor = get_audio_executor()
+    decode_lane = executor.lane("thread")
+    encode_lane = executor.lane("thread")
 
-    session: StreamSession | None = None
+    session: StreamSession | AsyncStreamSession | None = None
 
     async def sender_loop() -> None:
-        while True:
-            try:
-                msg = await outgoing.get()
-                if msg.kind == "json":
-                    await websocket.send_text(
-                        json.dumps(msg.payload, ensure_ascii=False)
-                    )
-                else:
-                    await websocket.send_bytes(msg.payload)
-            except asyncio.CancelledError:
-                break
-            except WebSocketDisconnect:
-                break
-            except Exception:
-                break
+        try:
+            await run_sender(outgoing, websocket, protocol)
+        except asyncio.CancelledError:
+            pass
+        except WebSocketDisconnect:
+            pass
+        except Exception:
+            pass
 
     sender_task = asyncio.create_task(sender_loop())
 
-    def _enqueue(msg: Outgoing) -> None:
-        try:
-            outgoing.put_nowait(msg)
-        except asyncio.QueueFull:
-            logging.warning("Outgoing queue full (2000), audio packets may be dropped!")
-
     def publish_json(payload: dict[str, Any]) -> None:
-        loop.call_soon_threadsafe(_enqueue, Outgoing(kind="json", payload=payload))
+        call_soon_threadsafe(loop, outgoing.put_control, payload)
 
     def publish_bytes(payload: bytes) -> None:
-        loop.call_soon_threadsafe(_enqueue, Outgoing(kind="bytes", payload=payload))
+        call_soon_threadsafe(loop, outgoing.put_audio, payload)
 
     def clear_outgoing_bytes() -> None:
-        def _drain_bytes() -> None:
-            kept: list[Outgoing] = []
-            try:
-                while True:
-                    item = outgoing.get_nowait()
-                    if item.kind == "bytes":
-                        continue
-                    kept.append(item)
-            except asyncio.QueueEmpty:
-                pass
-            for item in kept:
-                try:
-                    outgoing.put_nowait(item)
-                except asyncio.QueueFull:
-                    logging.warning("Outgoing queue full while requeueing control messages")
-                    break
+        call_soon_threadsafe(loop, outgoing.clear_audio)
+
+    # TTS 音频和 tts 控制消息由共享的播放调度器按截止时间送入发送队列
+    playout_cfg = get_config().tts
+    playout = get_playout_scheduler().open_stream(
+        send_bytes=outgoing.put_audio,
+        send_json=outgoing.put_control,
+        frame_duration_ms=encoder.frame_duration_ms,
+        burst_ms=playout_cfg.playout_burst_ms,
+        max_buffer_ms=playout_cfg.playout_max_buffer_ms,
+    )
 
-        loop.call_soon_threadsafe(_drain_bytes)
+    def _create_session(params: AudioParams) -> StreamSession | AsyncStreamSession:
+        cfg = get_config()
+        # 链路计时：各推理器上报自己负责的阶段，会话记录音频包的发出时刻；
+        # 启用追踪时同时记录被采样轮次的时间线
+        turn_timer = TurnTimer(
+            {"asr": cfg.asr.model, "llm": cfg.openai.model, "tts": cfg.tts.model},
+            tracer=get_tracer(),
+            device_id=device_id,
+            session_id=connection_id,
+        )
+        # 打断检测与 ASR 端点检测共用一个 VAD，每帧上行音频只计算一次
+        vad = _create_vad(params.sample_rate)
+        kwargs: dict[str, Any] = dict(
+            asr_inferencer=_create_asr_inferencer(params.sample_rate, turn_timer.mark, vad),
+            chat_inferencer=_create_chat_inferencer(turn_timer.mark),
+            tts=_create_tts_inferencer(encoder.sample_rate, turn_timer.mark, turn_timer.span),
+            encoder=encoder,
+            turn_timer=turn_timer,
+            allow_interrupt=cfg.system.allow_interrupt,
+            playout=playout,
+            tts_split_by_punctuation=cfg.tts.split_by_punctuation,
+            tts_lookahead=cfg.tts.lookahead_sentences,
+            vad=vad,
+            input_frame_size=params.frame_size,
+        )
+        if cfg.system.session_mode == "thread":
+            # 线程模式（回退方案）：会话在独立线程中运行，需线程安全地转发到事件循环
+            return StreamSession(
+                publish_json=publish_json,
+                publish_bytes=publish_bytes,
+                clear_outgoing_bytes=clear_outgoing_bytes,
+                **kwargs,
+            )
+        # 异步模式：会话运行在当前事件循环上，直接入队；TTS 编码提交到音频计算池
+        return AsyncStreamSession(
+            publish_json=outgoing.put_control,
+            publish_bytes=outgoing.put_audio,
+            clear_outgoing_bytes=outgoing.clear_audio,
+            audio_lane=encode_lane,
+            **kwargs,
+        )
+
+    async def drain_watcher() -> None:
+        # worker 退出前：等当前一轮对话结束（不在说话、不在播放）再关闭，设备会重连到其他 worker
+        await drainer.wait_draining()
+        while session is not None and not (session.state.idle and not playout.busy):
+            await asyncio.sleep(0.2)
+        try:
+            await websocket.close(code=CLOSE_SERVICE_RESTART)
+        except Exception:
+            pass
+
+    def handle_control(payload: dict[str, Any]) -> None:
+        nonlocal listening, audio_params, decoder, session
+
+        typ = payload.get("type")
+        if typ == "hello":
+            audio_params = _parse_audio_params(payload)
+            decoder = OpusDecoder(
+                sample_rate=audio_params.sample_rate,
+                channels=audio_params.channels,
+                frame_size=audio_params.frame_size,
+            )
+            # 二进制协议版本以客户端声明为准（不支持时回退到 1），并在回复中确认
+            protocol.set_version(
+                negotiate_version(
+                    payload.get("version"),
+                    websocket.headers.get("protocol-version"),
+                    max_version=server_cfg.max_binary_protocol_version,
+                )
+            )
+            publish_json(
+                {"type": "hello", "transport": "websocket", "version": protocol.version}
+            )
+            return
+
+        if typ == "listen":
+            state = payload.get("state")
+            if state == "start":
+                listening = True
+                if decoder is not None:
+                    # 两次收音之间的停顿不是丢包
+                    decoder.reset_timeline()
+                # Ensure an existing session is running
+                if session is not None:
+                    session.start()
+                else:
+                    # 创建新的 session
+                    if not decoder or not audio_params:
+                        return
+                    session = _create_session(audio_params)
+                    session.start()
+                return
+            if state == "stop":
+                listening = False
+                if session:
+                    session.stop()
+                    session = None
+                return
+
+    drain_task = asyncio.create_task(drain_watcher())
 
     try:
         while True:
@@ -192,71 +417,47 @@ async def websocket_endpoint(websocket: WebSocket) -> None:
                     payload = json.loads(message["text"])
                 except json.JSONDecodeError:
                     continue
+                handle_control(payload)
+                continue
 
-                typ = payload.get("type")
-                if typ == "hello":
-                    audio_params = _parse_audio_params(payload)
-                    decoder = OpusDecoder(
-                        sample_rate=audio_params.sample_rate,
-                        channels=audio_params.channels,
-                        frame_size=audio_params.frame_size,
-                    )
-                    publish_json(
-                        {"type": "hello", "transport": "websocket", "version": 1}
-                    )
+            if "bytes" in message and message["bytes"] is not None:
+                frame = protocol.parse(message["bytes"])
+                if frame is None:
                     continue
-
-                if typ == "listen":
-                    state = payload.get("state")
-                    if state == "start":
-                        listening = True
-                        # Ensure an existing session is running
-                        if session is not None:
-                            session.start()
-                        else:
-                            # 创建新的 session
-                            if not decoder or not audio_params:
-                                continue
-                            cfg = get_config()
-                            session = StreamSession(
-                                publish_json=publish_json,
-                                publish_bytes=publish_bytes,
-                                asr_inferencer=_create_asr_inferencer(
-                                    audio_params.sample_rate
-                                ),
-                                chat_inferencer=_create_chat_inferencer(),
-                                tts=_create_tts_inferencer(encoder.sample_rate),
-                                encoder=encoder,
-                                allow_interrupt=cfg.system.allow_interrupt,
-                                audio_send_delay_ms=cfg.tts.audio_send_delay_ms,
-                                tts_split_by_punctuation=cfg.tts.split_by_punctuation,
-                                clear_outgoing_bytes=clear_outgoing_bytes,
-                            )
-                            session.start()
-                        continue
-                    if state == "stop":
-                        listening = False
-                        if session:
-                            session.stop()
-                            session = None
+                if frame.type == BINARY_TYPE_JSON:
+                    try:
+                        payload = json.loads(bytes(frame.payload))
+                    except (json.JSONDecodeError, UnicodeDecodeError):
                         continue
+                    handle_control(payload)
+                    continue
+                if frame.type != BINARY_TYPE_OPUS:
+                    continue
 
-                continue
-
-            if "bytes" in message and message["bytes"] is not None:
                 if not listening or not decoder or not session:
                     continue
-                try:
-                    pcm = decoder.decode_to_float32(message["bytes"])
-                except Exception:
+                ring = session.audio_input()
+                if ring is None:
                     continue
-                session.push_audio(pcm)
+                opus = bytes(frame.payload) if protocol.has_header else message["bytes"]
+                # 在音频计算池中解码，结果直接写入会话的 int16 环形缓冲
+                await decode_lane.run(decoder.decode_into, ring, opus, frame.timestamp_ms)
 
     except WebSocketDisconnect:
         pass
     finally:
         if session:
             session.stop()
+        if decoder is not None:
+            stats = decoder.stats
+            if stats.decode_errors or stats.plc_frames or stats.fec_frames:
+                logger.info(
+                    f"Uplink audio: decoded={stats.decoded_frames} plc={stats.plc_frames} "
+                    f"fec={stats.fec_frames} errors={stats.decode_errors}"
+                )
+        playout.close()
+        outgoing.close()
+        drain_task.cancel()
         sender_task.cancel()
         try:
             await sender_task
@@ -1,4 +1,14 @@
-from xiaozhi_nexus.audio.opus import OpusDecoder, OpusEncoder
-
-__all__ = ["OpusDecoder", "OpusEncoder"]
+from xiaozhi_nexus.audio.opus import OpusDecoder, OpusDecoderStats, OpusEncoder
+from xiaozhi_nexus.audio.resample import StreamingResampler
+from xiaozhi_nexus.audio.ring import PCMRingBuffer
+from xiaozhi_nexus.audio.wav import PCMChunker, StreamingWavDecoder
 
+__all__ = [
+    "OpusDecoder",
+    "OpusDecoderStats",
+    "OpusEncoder",
+    "PCMChunker",
+    "PCMRingBuffer",
+    "StreamingResampler",
+    "StreamingWavDecoder",
+]
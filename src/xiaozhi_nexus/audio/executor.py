@@ -0,0 +1,244 @@
+"""
+音频计算卸载
+
+Opus 编解码、重采样等 CPU 密集的音频处理不在事件循环线程上执行，而是提交到：
+
+- 线程池：opuslib（ctypes 调用期间释放 GIL）、numpy 向量运算等可并行的 C 调用
+- 进程池（可选）：重采样等较重的纯计算；任务及其参数必须可 pickle
+
+所有提交都经由 AudioLane：同一 lane 上的任务严格按提交顺序串行执行（有状态的编解码器、
+重采样器需要如此），不同 lane 之间并行。线程数为 0 时任务直接在调用方线程内联执行。
+
+每个池统计忙碌时间和任务数，利用率 = rate(xiaozhi_audio_executor_busy_seconds_total) / workers，
+据此确定需要多少核。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Literal, Optional, Tuple
+
+from xiaozhi_nexus.observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PoolKind = Literal["thread", "process"]
+
+_busy_seconds = REGISTRY.counter(
+    "xiaozhi_audio_executor_busy_seconds_total",
+    "Time audio executor workers spent running jobs",
+    labelnames=("pool",),
+)
+_jobs = REGISTRY.counter(
+    "xiaozhi_audio_executor_jobs_total",
+    "Jobs completed by the audio executor",
+    labelnames=("pool",),
+)
+_workers = REGISTRY.gauge(
+    "xiaozhi_audio_executor_workers",
+    "Configured audio executor workers",
+    labelnames=("pool",),
+)
+_inflight = REGISTRY.gauge(
+    "xiaozhi_audio_executor_inflight",
+    "Audio executor jobs submitted but not yet finished",
+    labelnames=("pool",),
+)
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[Any, float]:
+    """在工作线程/进程中执行任务，同时返回实际执行耗时"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+@dataclass
+class PoolUtilization:
+    """一个池在统计窗口内的使用情况"""
+
+    workers: int
+    jobs: int
+    busy_s: float
+    window_s: float
+
+    @property
+    def utilization(self) -> float:
+        """忙碌时间占全部工作者可用时间的比例（0~1）"""
+        if self.workers <= 0 or self.window_s <= 0:
+            return 0.0
+        return min(1.0, self.busy_s / (self.window_s * self.workers))
+
+
+class _PoolStats:
+    def __init__(self, workers: int) -> None:
+        self.workers = workers
+        self.jobs = 0
+        self.busy_s = 0.0
+        self._lock = threading.Lock()
+        self._mark: Tuple[float, int, float] = (time.monotonic(), 0, 0.0)
+
+    def record(self, busy_s: float) -> None:
+        with self._lock:
+            self.jobs += 1
+            self.busy_s += busy_s
+
+    def window(self) -> PoolUtilization:
+        """返回自上次调用以来的使用情况，并开始新的窗口"""
+        now = time.monotonic()
+        with self._lock:
+            since, jobs, busy = self._mark
+            self._mark = (now, self.jobs, self.busy_s)
+            return PoolUtilization(
+                workers=self.workers,
+                jobs=self.jobs - jobs,
+                busy_s=self.busy_s - busy,
+                window_s=now - since,
+            )
+
+
+class AudioLane:
+    """
+    有序提交通道（每个会话 / 每个音频流一个）
+
+    前一个任务真正执行完之前不会开始下一个任务；调用方被取消时已提交的任务仍会跑完，
+    在此之前同一 lane 上的后续任务继续等待，保证有状态对象不会被并发访问。
+    """
+
+    def __init__(self, executor: "AudioExecutor", kind: PoolKind = "thread") -> None:
+        self._executor = executor
+        self.kind: PoolKind = kind
+        self._lock = asyncio.Lock()
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._executor.offloaded(self.kind):
+            return fn(*args)
+
+        await self._lock.acquire()
+        try:
+            future = asyncio.ensure_future(self._executor.run(self.kind, fn, *args))
+        except BaseException:
+            self._lock.release()
+            raise
+        future.add_done_callback(lambda _: self._lock.release())
+        return await asyncio.shield(future)
+
+
+class AudioExecutor:
+    """
+    进程级音频计算池
+
+    Args:
+        thread_workers: 线程池大小；0 表示不卸载，任务在调用方线程内联执行
+        process_workers: 进程池大小；0 表示不启用，process 类型的任务退回线程池
+    """
+
+    def __init__(self, thread_workers: int = 0, process_workers: int = 0) -> None:
+        self.thread_workers = max(0, int(thread_workers))
+        self.process_workers = max(0, int(process_workers))
+        self._pools: Dict[str, Executor] = {}
+        if self.thread_workers:
+            self._pools["thread"] = ThreadPoolExecutor(
+                max_workers=self.thread_workers, thread_name_prefix="audio"
+            )
+        if self.process_workers:
+            # spawn：服务进程中已有线程运行，fork 出的子进程可能继承被占用的锁
+            self._pools["process"] = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        self._stats = {
+            "thread": _PoolStats(self.thread_workers),
+            "process": _PoolStats(self.process_workers),
+        }
+        for pool in ("thread", "process"):
+            _workers.set(self._stats[pool].workers, pool=pool)
+
+    @property
+    def resample_kind(self) -> PoolKind:
+        """重采样任务使用的池：配置了进程池时放到进程池"""
+        return "process" if "process" in self._pools else "thread"
+
+    def offloaded(self, kind: PoolKind) -> bool:
+        """该类型的任务是否会被提交到池中执行"""
+        return self._resolve(kind) is not None
+
+    def lane(self, kind: PoolKind = "thread") -> AudioLane:
+        return AudioLane(self, kind)
+
+    async def run(self, kind: PoolKind, fn: Callable[..., Any], *args: Any) -> Any:
+        """提交单个任务（不保证与其他任务的顺序，需要顺序时使用 lane）"""
+        name = self._resolve(kind)
+        if name is None:
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        _inflight.inc(pool=name)
+        try:
+            result, busy_s = await loop.run_in_executor(
+                self._pools[name], _timed_call, fn, args
+            )
+        finally:
+            _inflight.dec(pool=name)
+        self._stats[name].record(busy_s)
+        _busy_seconds.inc(busy_s, pool=name)
+        _jobs.inc(pool=name)
+        return result
+
+    def utilization(self) -> Dict[str, PoolUtilization]:
+        """各池自上次调用以来的利用率"""
+        return {name: self._stats[name].window() for name in self._pools}
+
+    def shutdown(self) -> None:
+        for pool in self._pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools.clear()
+
+    def _resolve(self, kind: PoolKind) -> Optional[str]:
+        if kind in self._pools:
+            return kind
+        if kind == "process" and "thread" in self._pools:
+            return "thread"
+        return None
+
+
+_executor: Optional[AudioExecutor] = None
+
+
+def configure_audio_executor(thread_workers: int, process_workers: int = 0) -> AudioExecutor:
+    """按配置创建进程级音频计算池（服务启动时调用）"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+    _executor = AudioExecutor(thread_workers, process_workers)
+    logger.info(
+        f"Audio executor: {_executor.thread_workers} thread(s), "
+        f"{_executor.process_workers} process(es)"
+    )
+    return _executor
+
+
+def get_audio_executor() -> AudioExecutor:
+    """获取音频计算池；未配置时返回内联执行的默认实例"""
+    global _executor
+    if _executor is None:
+        _executor = AudioExecutor()
+    return _executor
+
+
+def shutdown_audio_executor() -> None:
+    global _executor
+    if _executor is not None:
+        utilization = _executor.utilization()
+        for name, usage in utilization.items():
+            logger.info(
+                f"Audio executor {name} pool: {usage.jobs} jobs, "
+                f"utilization {usage.utilization:.1%} over the last {usage.window_s:.0f}s"
+            )
+        _executor.shutdown()
+        _executor = None
@@ -1,24 +1,55 @@
 from __future__ import annotations
 
+import ctypes
+import logging
 from dataclasses import dataclass
-from typing import Iterator
+from typing import List, Optional, Tuple
 
 import numpy as np
 
+from xiaozhi_nexus.audio.ring import PCMRingBuffer
+from xiaozhi_nexus.observability import REGISTRY
 from xiaozhi_nexus.utils.opus_loader import setup_opus
 
+logger = logging.getLogger(__name__)
 
-def _float32_to_int16(x: np.ndarray) -> np.ndarray:
-    x = np.asarray(x, dtype=np.float32)
-    x = np.clip(x, -1.0, 1.0)
-    return (x * 32767.0).astype(np.int16)
 
+@dataclass
+class OpusDecoderStats:
+    """单个会话的解码统计"""
 
-@dataclass(frozen=True)
+    decoded_frames: int = 0
+    plc_frames: int = 0  # 丢包隐藏（PLC）补出的帧
+    fec_frames: int = 0  # 由下一个包的带内 FEC 恢复的帧
+    decode_errors: int = 0
+
+
+_decode_errors = REGISTRY.counter(
+    "xiaozhi_opus_decode_errors_total",
+    "Incoming Opus packets that failed to decode",
+)
+_concealed_frames = REGISTRY.counter(
+    "xiaozhi_opus_concealed_frames_total",
+    "Incoming audio frames reconstructed by packet loss concealment or in-band FEC",
+    labelnames=("method",),
+)
+
+
+@dataclass
 class OpusDecoder:
+    """
+    上行 Opus 解码器（每个会话一个，有状态）
+
+    协议帧携带时间戳时（v2），根据时间戳检测丢包：缺失的帧用 libopus PLC 补齐，
+    紧邻当前包的那一帧优先用当前包的带内 FEC 恢复，使 ASR 看到连续的音频。
+    超过 max_conceal_frames 的空洞视为客户端暂停发送，不做补偿。
+    解码失败的包同样用一帧 PLC 代替，并计入统计。
+    """
+
     sample_rate: int
     channels: int
     frame_size: int
+    max_conceal_frames: int = 5
 
     def __post_init__(self) -> None:
         if not setup_opus():
@@ -26,22 +57,157 @@ class OpusDecoder:
                 "libopus not found. Set XIAOZHI_OPUS_LIB to opus.dll or provide libs/libopus."
             )
         import opuslib
+        import opuslib.api.decoder
 
-        object.__setattr__(
-            self, "_decoder", opuslib.Decoder(self.sample_rate, self.channels)
-        )
+        self._decoder = opuslib.Decoder(self.sample_rate, self.channels)
+        # 直接调用 opus_decode 写入调用方提供的缓冲区，避免 opuslib 每帧分配并拷贝两次
+        self._opus_decode = opuslib.api.decoder.libopus_decode
+        self._int16_pointer = opuslib.api.c_int16_pointer
+        self._interleaved = np.empty(self.frame_size * self.channels, dtype=np.int16)
+        self._frame_ms = self.frame_size * 1000.0 / self.sample_rate
+        self._last_timestamp: Optional[int] = None
+        self.stats = OpusDecoderStats()
+
+    def reset_timeline(self) -> None:
+        """忘记上一个包的时间戳（客户端重新开始发送时调用，避免把停顿当成丢包）"""
+        self._last_timestamp = None
+
+    def decode_into(
+        self, ring: PCMRingBuffer, packet: bytes, timestamp_ms: Optional[int] = None
+    ) -> int:
+        """
+        解码一个包，直接写入会话的 int16 环形缓冲（单声道）
+
+        Args:
+            ring: 目标缓冲区，frame_size 须与解码器一致
+            packet: Opus 包
+            timestamp_ms: 协议头中的时间戳（没有时不做丢包检测）
 
-    def decode_to_float32(self, packet: bytes) -> np.ndarray:
-        pcm_bytes = self._decoder.decode(packet, self.frame_size, decode_fec=False)
-        pcm_i16 = np.frombuffer(pcm_bytes, dtype=np.int16)
-        pcm_f32 = pcm_i16.astype(np.float32) / 32768.0
+        Returns:
+            写入的帧数（检测到丢包时包含补偿帧）
+        """
+        frames = self._plan(packet, timestamp_ms)
+        for payload, fec in frames:
+            slot = ring.reserve()
+            if self.channels == 1:
+                n = self._decode_frame(payload, fec, slot)
+            else:
+                n = self._decode_frame(payload, fec, self._interleaved)
+                # 多声道交错输出先解码到暂存区，再混为单声道写入
+                mixed = self._interleaved[: n * self.channels].reshape(n, self.channels)
+                slot[:n] = mixed.sum(axis=1, dtype=np.int32) // self.channels
+            ring.commit(n)
+        return len(frames)
+
+    def decode_to_float32(
+        self, packet: bytes, timestamp_ms: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        解码一个包为单声道 float32 PCM
+
+        Returns:
+            若检测到丢包，返回值前部包含补偿出的音频
+        """
+        frames = self._plan(packet, timestamp_ms)
+        step = self.frame_size * self.channels
+        pcm_i16 = np.empty(step * len(frames), dtype=np.int16)
+        used = 0
+        for payload, fec in frames:
+            n = self._decode_frame(payload, fec, pcm_i16[used : used + step])
+            used += n * self.channels
+        pcm_f32 = pcm_i16[:used].astype(np.float32) / 32768.0
         if self.channels > 1:
             pcm_f32 = pcm_f32.reshape(-1, self.channels).mean(axis=1)
         return pcm_f32
 
+    def _plan(
+        self, packet: bytes, timestamp_ms: Optional[int]
+    ) -> List[Tuple[Optional[bytes], bool]]:
+        """
+        本次需要解码的帧：(负载, 是否取 FEC)；负载为 None 表示 PLC
+
+        丢包时前面的帧只能靠 PLC，紧邻当前包的一帧可从当前包的 FEC 数据恢复。
+        """
+        lost = self._lost_frames(timestamp_ms)
+        frames: List[Tuple[Optional[bytes], bool]] = []
+        if lost:
+            frames.extend((None, False) for _ in range(lost - 1))
+            frames.append((packet, True))
+        frames.append((packet, False))
+        return frames
+
+    def _decode_frame(self, payload: Optional[bytes], fec: bool, out: np.ndarray) -> int:
+        """解码一帧写入 out（交错的 int16），返回每声道采样点数；失败时退化为 PLC"""
+        result = self._opus_call(payload, fec, out)
+        if result >= 0:
+            if payload is None:
+                self.stats.plc_frames += 1
+                _concealed_frames.inc(method="plc")
+            elif fec:
+                self.stats.fec_frames += 1
+                _concealed_frames.inc(method="fec")
+            else:
+                self.stats.decoded_frames += 1
+            return result
+
+        if payload is not None and not fec:
+            self.stats.decode_errors += 1
+            _decode_errors.inc()
+            if self.stats.decode_errors == 1 or self.stats.decode_errors % 100 == 0:
+                logger.warning(
+                    f"Opus decode failed ({self.stats.decode_errors} errors in this session)"
+                )
+        if payload is None:
+            # PLC 本身失败：输出静音保持时间轴连续
+            out[: self.frame_size * self.channels] = 0
+            return self.frame_size
+        return self._decode_frame(None, False, out)
+
+    def _opus_call(self, payload: Optional[bytes], fec: bool, out: np.ndarray) -> int:
+        # 空负载让 libopus 执行丢包隐藏
+        data = payload if payload is not None else b""
+        return int(
+            self._opus_decode(
+                self._decoder.decoder_state,
+                data,
+                len(data),
+                out.ctypes.data_as(self._int16_pointer),
+                self.frame_size,
+                int(fec),
+            )
+        )
+
+    def _lost_frames(self, timestamp_ms: Optional[int]) -> int:
+        if timestamp_ms is None:
+            return 0
+        last = self._last_timestamp
+        self._last_timestamp = timestamp_ms
+        if last is None:
+            return 0
+        delta = (timestamp_ms - last) & 0xFFFFFFFF
+        if delta >= 0x80000000:
+            # 时间戳回退（乱序或客户端重置），不做补偿
+            return 0
+        lost = int(round(delta / self._frame_ms)) - 1
+        if lost <= 0 or lost > self.max_conceal_frames:
+            return 0
+        return lost
 
-@dataclass(frozen=True)
+
+# 单个 Opus 包的最大字节数（RFC 6716 建议的上限）
+_MAX_PACKET_BYTES = 4000
+
+
+@dataclass
 class OpusEncoder:
+    """
+    下行 Opus 编码器（有状态）
+
+    每次输入一整段 TTS 音频：整段一次性换算为 int16 写入内部缓冲区，按帧编码；
+    不足一帧的尾部留到下一次调用，与后续音频拼接，只有 flush()（流结束）时才补零，
+    避免在句子中间插入补零帧造成爆音。编码输出写入复用的缓冲区，不为每帧分配。
+    """
+
     sample_rate: int
     channels: int
     frame_duration_ms: int = 20
@@ -50,35 +216,93 @@ class OpusEncoder:
     def __post_init__(self) -> None:
         if self.frame_duration_ms not in (10, 20, 40, 60):
             raise ValueError("frame_duration_ms must be one of 10/20/40/60")
+        if self.channels != 1:
+            raise ValueError("Only mono PCM supported by this encoder")
         if not setup_opus():
             raise RuntimeError(
                 "libopus not found. Set XIAOZHI_OPUS_LIB to opus.dll or provide libs/libopus."
             )
         import opuslib
+        import opuslib.api.encoder
 
         enc = opuslib.Encoder(
             self.sample_rate, self.channels, opuslib.APPLICATION_AUDIO
         )
         enc.bitrate = int(self.bitrate)
-        object.__setattr__(self, "_encoder", enc)
+        self._encoder = enc
+        self._opus_encode = opuslib.api.encoder.libopus_encode
+        self._int16_pointer = opuslib.api.c_int16_pointer
+        self._out = ctypes.create_string_buffer(_MAX_PACKET_BYTES)
+
+        # 待编码的 int16 样本，前 _pending 个是上次剩下的不足一帧的尾部
+        self._pcm = np.zeros(self.frame_size * 8, dtype=np.int16)
+        self._pending = 0
 
     @property
     def frame_size(self) -> int:
         return int(self.sample_rate * (self.frame_duration_ms / 1000))
 
-    def encode_pcm_float32(self, pcm: np.ndarray) -> Iterator[bytes]:
-        pcm = np.asarray(pcm, dtype=np.float32).reshape(-1)
-        if self.channels != 1:
-            raise ValueError("Only mono PCM supported by this stub encoder")
+    @property
+    def pending_samples(self) -> int:
+        """留待下次编码的样本数"""
+        return self._pending
+
+    def encode_pcm_float32(self, pcm: np.ndarray) -> List[bytes]:
+        """
+        编码一段音频（float32，或 int16），返回其中所有完整帧的 Opus 包
+
+        不足一帧的尾部保留到下一次调用或 flush()。
+        """
+        pcm = np.asarray(pcm).reshape(-1)
+        start = self._pending
+        total = start + int(pcm.shape[0])
+        if total > self._pcm.shape[0]:
+            grown = np.zeros(total * 2, dtype=np.int16)
+            grown[:start] = self._pcm[:start]
+            self._pcm = grown
+
+        dst = self._pcm[start:total]
+        if pcm.dtype == np.int16:
+            dst[:] = pcm
+        else:
+            # 整段一次性换算：裁剪到 [-1, 1] 后缩放，直接写入 int16 缓冲区
+            scaled = np.clip(pcm.astype(np.float32, copy=False), -1.0, 1.0)
+            np.multiply(scaled, 32767.0, out=dst, casting="unsafe")
 
         frame_size = self.frame_size
-        total = int(pcm.shape[0])
-        idx = 0
-        while idx < total:
-            frame = pcm[idx : idx + frame_size]
-            if frame.shape[0] < frame_size:
-                frame = np.pad(frame, (0, frame_size - frame.shape[0]))
-            idx += frame_size
-            pcm_i16 = _float32_to_int16(frame)
-            packet = self._encoder.encode(pcm_i16.tobytes(), frame_size)
-            yield packet
+        n_frames = total // frame_size
+        packets = [self._encode_frame(i * frame_size) for i in range(n_frames)]
+
+        used = n_frames * frame_size
+        rest = total - used
+        if rest and used:
+            self._pcm[:rest] = self._pcm[used:total]
+        self._pending = rest
+        return packets
+
+    def flush(self) -> List[bytes]:
+        """流结束：剩余样本补零编码为最后一帧"""
+        if not self._pending:
+            return []
+        self._pcm[self._pending : self.frame_size] = 0
+        self._pending = 0
+        return [self._encode_frame(0)]
+
+    def reset(self) -> None:
+        """丢弃剩余样本（打断或新一轮输出开始时调用）"""
+        self._pending = 0
+
+    def _encode_frame(self, offset: int) -> bytes:
+        pcm_pointer = ctypes.cast(
+            self._pcm.ctypes.data + offset * self._pcm.itemsize, self._int16_pointer
+        )
+        result = self._opus_encode(
+            self._encoder.encoder_state,
+            pcm_pointer,
+            self.frame_size,
+            self._out,
+            _MAX_PACKET_BYTES,
+        )
+        if result < 0:
+            raise RuntimeError(f"Opus encode failed: {result}")
+        return ctypes.string_at(self._out, result)
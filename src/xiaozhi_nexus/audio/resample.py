@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from math import gcd
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 质量预设: (每相位抽头数, Kaiser 窗 beta, 通带截止相对奈奎斯特频率的比例)
+RESAMPLE_QUALITY_PRESETS: Dict[str, Tuple[int, float, float]] = {
+    "fast": (8, 5.0, 0.85),
+    "medium": (16, 8.0, 0.92),
+    "high": (32, 10.0, 0.95),
+}
+
+
+@lru_cache(maxsize=32)
+def _design_filter_bank(up: int, down: int, quality: str) -> np.ndarray:
+    """
+    设计多相低通滤波器组（按 (up, down, quality) 缓存，进程内所有会话共享）
+
+    Returns:
+        形状为 (up, taps) 的滤波器组，第 p 行为相位 p 的系数（已按卷积顺序反转）
+    """
+    from scipy.signal import firwin
+
+    taps, beta, rolloff = RESAMPLE_QUALITY_PRESETS[quality]
+    cutoff = rolloff / max(up, down)
+    # 使用奇数长度设计（群延迟为整数个样本），末尾补零凑满 taps * up
+    h = firwin(taps * up - 1, cutoff, window=("kaiser", beta)) * up
+    h = np.append(h, 0.0)
+    bank = h.reshape(taps, up).T[:, ::-1]
+    return np.ascontiguousarray(bank, dtype=np.float32)
+
+
+class StreamingResampler:
+    """
+    有状态的流式多相重采样器
+
+    逐块输入 float32 单声道样本，跨块保留滤波器历史，输出与一次性处理整段音频完全一致（无拼接缝）。
+    滤波器按 (orig_sr, target_sr, quality) 缓存，常见的 24k↔16k、22.05k→24k 等组合只需设计一次。
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int, quality: str = "medium") -> None:
+        if quality not in RESAMPLE_QUALITY_PRESETS:
+            raise ValueError(
+                f"Unknown resample quality: {quality} "
+                f"(expected one of {', '.join(RESAMPLE_QUALITY_PRESETS)})"
+            )
+        self.orig_sr = int(orig_sr)
+        self.target_sr = int(target_sr)
+        self.quality = quality
+
+        g = gcd(self.orig_sr, self.target_sr)
+        self._up = self.target_sr // g
+        self._down = self.orig_sr // g
+        self._passthrough = self._up == self._down
+
+        if not self._passthrough:
+            self._bank = _design_filter_bank(self._up, self._down, quality)
+            self._taps = int(self._bank.shape[1])
+            # 补偿线性相位滤波器的群延迟，使输出与输入对齐
+            self._delay = (self._taps * self._up - 2) // 2
+        self.reset()
+
+    def __getstate__(self) -> Dict[str, object]:
+        # 跨进程传递时不携带滤波器组，接收方从本进程的缓存中取回
+        state = self.__dict__.copy()
+        state.pop("_bank", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        if not self._passthrough:
+            self._bank = _design_filter_bank(self._up, self._down, self.quality)
+
+    def reset(self) -> None:
+        """清空滤波器状态，开始新的音频流"""
+        self._total_in = 0
+        self._next_out = 0
+        if not self._passthrough:
+            # 缓冲区保存 x[_buf_start:]，起始处补零作为滤波器的初始历史
+            self._buf = np.zeros(self._taps - 1, dtype=np.float32)
+            self._buf_start = -(self._taps - 1)
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        """输入一块样本，返回当前已能完整计算的输出样本"""
+        chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+        if self._passthrough:
+            return chunk.copy()
+        if chunk.size:
+            self._buf = np.concatenate((self._buf, chunk))
+            self._total_in += int(chunk.size)
+        # 输出 n 依赖的最新输入下标为 (n*down + delay) // up，须小于已输入样本数
+        end = (self._total_in * self._up - 1 - self._delay) // self._down + 1
+        return self._compute(end)
+
+    def flush(self) -> np.ndarray:
+        """流结束：以零填充尾部，输出剩余样本（总输出长度为 ceil(输入长度 * target / orig)）"""
+        if self._passthrough:
+            return np.zeros(0, dtype=np.float32)
+        expected = -(-self._total_in * self._up // self._down)
+        pad = self._delay // self._up + self._taps
+        self._buf = np.concatenate((self._buf, np.zeros(pad, dtype=np.float32)))
+        out = self._compute(expected)
+        self.reset()
+        return out
+
+    def _compute(self, end: int) -> np.ndarray:
+        start = self._next_out
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+
+        n = np.arange(start, end, dtype=np.int64)
+        t = n * self._down + self._delay
+        phase = t % self._up
+        # 每个输出对应的输入窗口 x[j0 - taps + 1 : j0 + 1] 在缓冲区中的起点
+        first = t // self._up - (self._taps - 1) - self._buf_start
+        windows = sliding_window_view(self._buf, self._taps)[first]
+        out = np.einsum("ij,ij->i", windows, self._bank[phase]).astype(np.float32)
+
+        self._next_out = end
+        # 丢弃之后的输出不再需要的历史样本
+        keep_from = (end * self._down + self._delay) // self._up - (self._taps - 1)
+        drop = keep_from - self._buf_start
+        if drop > 0:
+            self._buf = self._buf[drop:]
+            self._buf_start = keep_from
+        return out
+
+
+def process_detached(
+    resampler: StreamingResampler, chunk: Optional[np.ndarray]
+) -> Tuple[StreamingResampler, np.ndarray]:
+    """
+    在其他进程中推进重采样（供进程池调用）
+
+    重采样器随任务传入并连同输出一起返回，调用方用返回的实例替换原实例；
+    chunk 为 None 表示流结束（flush）。同一重采样器的任务须按顺序提交。
+    """
+    out = resampler.flush() if chunk is None else resampler.process(chunk)
+    return resampler, out
+
+
+def resample(
+    audio: np.ndarray, orig_sr: int, target_sr: int, quality: str = "medium"
+) -> np.ndarray:
+    """一次性重采样整段音频（与流式逐块处理结果一致）"""
+    resampler = StreamingResampler(orig_sr, target_sr, quality)
+    head = resampler.process(audio)
+    tail = resampler.flush()
+    return np.concatenate((head, tail))
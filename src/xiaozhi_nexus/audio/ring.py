@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+from typing import Callable, Optional
+
+import numpy as np
+
+
+class PCMRingBuffer:
+    """
+    单会话的上行 int16 PCM 环形缓冲（单生产者 / 单消费者）
+
+    预分配 capacity 个帧槽，每槽 frame_size 个单声道采样点：
+
+    - 生产者（解码器）用 reserve() 取得下一个空槽的 ndarray 视图直接解码写入，再 commit(n)
+    - 消费者用 pop() 取出最早的一帧，得到槽内数据的 memoryview，不做拷贝
+    - 缓冲区满时 reserve() 先丢弃最旧的帧（ASR 跟不上时优先保留最新音频），计入 overruns
+
+    pop() 返回的视图在生产者绕回覆盖该槽之前有效（即再写入 capacity 帧之后失效），
+    消费者应在取出后立即处理或拷贝。生产者和消费者可以位于不同线程。
+    """
+
+    def __init__(
+        self,
+        frame_size: int,
+        capacity: int = 200,
+        on_commit: Optional[Callable[[], None]] = None,
+    ) -> None:
+        if frame_size <= 0 or capacity <= 0:
+            raise ValueError("frame_size and capacity must be positive")
+        self.frame_size = int(frame_size)
+        self.capacity = int(capacity)
+        self.on_commit = on_commit
+
+        self._slots = np.zeros((self.capacity, self.frame_size), dtype=np.int16)
+        self._lengths = np.zeros(self.capacity, dtype=np.int64)
+        self._read = 0  # 读写位置为单调递增的帧序号，槽位 = 序号 % capacity
+        self._write = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+        self.overruns = 0
+
+    def __len__(self) -> int:
+        return self._write - self._read
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def reserve(self) -> np.ndarray:
+        """
+        返回下一个空槽（长度 frame_size 的 int16 视图），写入后须调用 commit()
+
+        缓冲区已满时该槽就是最旧的未读帧：先在锁内丢弃它再交给生产者写入，
+        避免消费者同时 pop() 到正在被覆盖的槽。
+        """
+        with self._cond:
+            if self._write - self._read >= self.capacity:
+                self._read = self._write - self.capacity + 1
+                self.overruns += 1
+            return self._slots[self._write % self.capacity]
+
+    def commit(self, n_samples: int) -> None:
+        """提交 reserve() 槽中写入的 n_samples 个采样点"""
+        n = max(0, min(int(n_samples), self.frame_size))
+        with self._cond:
+            if self._closed:
+                return
+            self._lengths[self._write % self.capacity] = n
+            self._write += 1
+            if self._write - self._read > self.capacity:
+                # 未经 reserve() 直接提交：丢弃最旧的帧
+                self._read = self._write - self.capacity
+                self.overruns += 1
+            self._cond.notify()
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def write(self, pcm: np.ndarray) -> None:
+        """写入任意长度的 PCM（int16，或 [-1, 1] 范围的 float32），按帧切分"""
+        pcm = np.asarray(pcm).reshape(-1)
+        if pcm.dtype != np.int16:
+            pcm = (np.clip(pcm, -1.0, 1.0) * 32767.0).astype(np.int16)
+        for offset in range(0, pcm.shape[0], self.frame_size):
+            part = pcm[offset : offset + self.frame_size]
+            self.reserve()[: part.shape[0]] = part
+            self.commit(part.shape[0])
+
+    def pop(self) -> Optional[memoryview]:
+        """取出最早的一帧；没有数据时返回 None"""
+        with self._cond:
+            if self._read == self._write:
+                return None
+            index = self._read % self.capacity
+            self._read += 1
+            n = int(self._lengths[index])
+        return memoryview(self._slots[index, :n])
+
+    def pop_wait(self, timeout: float) -> Optional[memoryview]:
+        """阻塞等待至多 timeout 秒取出一帧（供线程模式消费者使用）"""
+        with self._cond:
+            if self._read == self._write and not self._closed:
+                self._cond.wait(timeout)
+        return self.pop()
+
+    def clear(self) -> None:
+        """丢弃所有未读的帧"""
+        with self._cond:
+            self._read = self._write
+
+    def close(self) -> None:
+        """关闭缓冲区并唤醒等待中的消费者；之后的写入被忽略"""
+        with self._cond:
+            self._closed = True
+            self._read = self._write
+            self._cond.notify_all()
+        if self.on_commit is not None:
+            self.on_commit()
@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+_EPS = 1e-10
+
+
+@dataclass
+class StreamingVAD:
+    """
+    流式语音活动检测（能量 + 过零率 + 自适应噪声底 + hangover 平滑）
+
+    每个会话持有一个实例。输入任意长度的单声道样本（int16 或 float32），按 frame_ms 分帧后
+    对所有完整帧做向量化的能量/过零率计算，再逐帧更新状态机：
+
+    - 帧能量需同时高于绝对门限 energy_threshold_db 和噪声底 + snr_threshold_db
+    - 过零率高于 zcr_threshold 的帧视为噪声（嘶声/白噪声）
+    - 非语音帧以 noise_adapt_rate 跟踪噪声底，语音帧以更慢的速率跟踪（避免持续噪声被误判为语音）
+    - 连续 speech_start_ms 的语音帧才进入说话状态，连续 hangover_ms 的静音帧才退出
+    """
+
+    sample_rate: int = 16000
+    frame_ms: int = 20
+
+    energy_threshold_db: float = -45.0  # 绝对能量门限（dBFS）
+    snr_threshold_db: float = 10.0  # 高于噪声底的最小信噪比（dB）
+    zcr_threshold: float = 0.35  # 过零率上限（每样本）
+    noise_adapt_rate: float = 0.05  # 噪声底跟踪速率
+    initial_noise_db: float = -60.0  # 初始噪声底（dBFS）
+    speech_start_ms: int = 60  # 进入说话状态所需的连续语音时长
+    hangover_ms: int = 300  # 退出说话状态所需的连续静音时长
+
+    # 内部状态
+    speaking: bool = field(default=False, init=False)
+    noise_db: float = field(default=-60.0, init=False)
+    _speech_run: int = field(default=0, init=False, repr=False)
+    _silence_run: int = field(default=0, init=False, repr=False)
+    _work: np.ndarray = field(init=False, repr=False)  # 上次剩余的不足一帧样本 + 本次输入（float32）
+    _pending: int = field(default=0, init=False, repr=False)
+    _has_decision: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.frame_size = max(1, int(self.sample_rate * self.frame_ms / 1000))
+        self._start_frames = max(1, int(round(self.speech_start_ms / self.frame_ms)))
+        self._hangover_frames = max(1, int(round(self.hangover_ms / self.frame_ms)))
+        self.reset()
+
+    def reset(self) -> None:
+        """重置状态（新的音频流）"""
+        self.speaking = False
+        self.noise_db = float(self.initial_noise_db)
+        self._speech_run = 0
+        self._silence_run = 0
+        self._work = np.empty(self.frame_size * 16, dtype=np.float32)
+        self._pending = 0
+        self._has_decision = False
+
+    def frame_features(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        计算每帧的能量（dBFS）和过零率
+
+        Args:
+            frames: 形状为 (n_frames, frame_size) 的 float32 数组
+        """
+        energy = np.einsum("ij,ij->i", frames, frames) / frames.shape[1]
+        energy_db = 10.0 * np.log10(energy + _EPS)
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (
+            frames.shape[1] - 1 if frames.shape[1] > 1 else 1
+        )
+        return energy_db, zcr
+
+    def process(self, pcm: np.ndarray) -> Optional[bool]:
+        """
+        输入一段音频，返回平滑后的说话状态
+
+        Args:
+            pcm: int16 采样，或 [-1, 1] 范围的 float32 采样
+
+        Returns:
+            当前是否在说话；尚未凑满一帧时返回 None
+        """
+        total = self._load(pcm)
+        n_frames = total // self.frame_size
+        used = n_frames * self.frame_size
+        if n_frames == 0:
+            self._pending = total
+            return self.speaking if self._has_decision else None
+
+        frames = self._work[:used].reshape(n_frames, self.frame_size)
+        energy_db, zcr = self.frame_features(frames)
+        # 不足一帧的尾部移到工作区开头，留给下次
+        rest = total - used
+        if rest:
+            self._work[:rest] = self._work[used:total]
+        self._pending = rest
+
+        for e_db, z in zip(energy_db.tolist(), zcr.tolist()):
+            self._update(e_db, z)
+        self._has_decision = True
+        return self.speaking
+
+    def _load(self, pcm: np.ndarray) -> int:
+        """把输入追加到工作区（int16 在此原地换算为 float32），返回工作区中的样本数"""
+        src = np.asarray(pcm).reshape(-1)
+        start = self._pending
+        total = start + src.shape[0]
+        if total > self._work.shape[0]:
+            work = np.empty(total * 2, dtype=np.float32)
+            work[:start] = self._work[:start]
+            self._work = work
+        out = self._work[start:total]
+        if src.dtype == np.int16:
+            np.multiply(src, np.float32(1.0 / 32768.0), out=out)
+        else:
+            out[:] = src
+        return total
+
+    def _update(self, energy_db: float, zcr: float) -> None:
+        threshold = max(self.energy_threshold_db, self.noise_db + self.snr_threshold_db)
+        is_speech = energy_db > threshold and zcr < self.zcr_threshold
+
+        # 自适应噪声底：向下立即跟随，向上缓慢跟随（语音帧更慢）
+        if energy_db < self.noise_db:
+            self.noise_db = energy_db
+        else:
+            rate = self.noise_adapt_rate if not is_speech else self.noise_adapt_rate * 0.05
+            self.noise_db += rate * (energy_db - self.noise_db)
+
+        if is_speech:
+            self._speech_run += 1
+            self._silence_run = 0
+            if not self.speaking and self._speech_run >= self._start_frames:
+                self.speaking = True
+        else:
+            self._silence_run += 1
+            self._speech_run = 0
+            if self.speaking and self._silence_run >= self._hangover_frames:
+                self.speaking = False
+
+
+@dataclass
+class Endpointer:
+    """
+    基于 VAD 尾部静音的端点检测
+
+    VAD 的说话状态在连续静音 hangover_ms 后才下降，端点检测在下降沿之后自行累计静音，
+    直到语音结束后的静音总长达到 silence_ms；若此前的有效语音时长不少于 min_speech_ms，
+    则判定一句话结束（短促噪声不会触发提交）。VAD 的 hangover 大于 silence_ms 时在下降沿即判定。
+
+    feed_vad 为 False 时 VAD 由调用方共享并已处理过同一段音频（如会话用于打断检测的 VAD），
+    这里只读取它的说话状态，每帧音频只做一次特征计算。
+    """
+
+    vad: StreamingVAD
+    silence_ms: int = 500
+    min_speech_ms: int = 200
+    feed_vad: bool = True
+
+    # 内部状态
+    speaking: bool = field(default=False, init=False)  # 最近一次 process() 后 VAD 的说话状态
+    _utterance_ms: float = field(default=0.0, init=False, repr=False)  # 有效语音时长
+    _silence_ms: float = field(default=0.0, init=False, repr=False)  # 语音结束后的静音时长
+    _has_speech: bool = field(default=False, init=False, repr=False)
+
+    def reset(self) -> None:
+        if self.feed_vad:
+            self.vad.reset()
+        self.speaking = False
+        self._reset_utterance()
+
+    def _reset_utterance(self) -> None:
+        self._utterance_ms = 0.0
+        self._silence_ms = 0.0
+        self._has_speech = False
+
+    def process(self, pcm: np.ndarray) -> bool:
+        """输入一段音频（int16 或 float32），返回是否在这段音频中检测到一句话结束"""
+        was_speaking = self.speaking
+        if self.feed_vad:
+            self.vad.process(pcm)
+        is_speech = self.speaking = self.vad.speaking
+        chunk_ms = np.asarray(pcm).size * 1000.0 / self.vad.sample_rate
+
+        if is_speech:
+            self._has_speech = True
+            self._utterance_ms += chunk_ms
+            self._silence_ms = 0.0
+            return False
+
+        if not self._has_speech:
+            return False
+
+        if was_speaking:
+            # 下降沿：说话状态包含了 hangover 期间的静音，从语音时长移到静音时长
+            hangover_ms = float(self.vad.hangover_ms)
+            self._utterance_ms = max(0.0, self._utterance_ms + chunk_ms - hangover_ms)
+            self._silence_ms = hangover_ms
+        else:
+            self._silence_ms += chunk_ms
+
+        if self._silence_ms < self.silence_ms:
+            return False
+        voiced_ms = self._utterance_ms
+        self._reset_utterance()
+        return voiced_ms >= self.min_speech_ms
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# 流式 WAV 常见的 data 块长度占位值（长度未知）
+_UNKNOWN_SIZES = (0, 0xFFFFFFFF)
+
+
+def pcm_bytes_to_float32(
+    data: bytes, sample_width: int, is_float: bool = False
+) -> np.ndarray:
+    """将小端 PCM 字节转换为 [-1, 1] 范围的 float32 样本（支持 8/16/24/32 位）"""
+    if is_float:
+        if sample_width != 4:
+            raise ValueError(f"Unsupported float sample width: {sample_width}")
+        return np.frombuffer(data, dtype="<f4").astype(np.float32)
+    if sample_width == 1:
+        pcm_u8 = np.frombuffer(data, dtype=np.uint8)
+        return (pcm_u8.astype(np.float32) - 128.0) / 128.0
+    if sample_width == 2:
+        pcm_i16 = np.frombuffer(data, dtype="<i2")
+        return pcm_i16.astype(np.float32) / 32768.0
+    if sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8)
+        if raw.size % 3:
+            raw = raw[: raw.size - (raw.size % 3)]
+        raw = raw.reshape(-1, 3)
+        pcm_i32 = (
+            raw[:, 0].astype(np.int32)
+            | (raw[:, 1].astype(np.int32) << 8)
+            | (raw[:, 2].astype(np.int32) << 16)
+        )
+        sign_bit = 1 << 23
+        pcm_i32 = (pcm_i32 ^ sign_bit) - sign_bit
+        return pcm_i32.astype(np.float32) / float(1 << 23)
+    if sample_width == 4:
+        pcm_i32 = np.frombuffer(data, dtype="<i4")
+        return pcm_i32.astype(np.float32) / float(1 << 31)
+    raise ValueError(f"Unsupported sample width: {sample_width}")
+
+
+class StreamingWavDecoder:
+    """
+    增量 WAV / 裸 PCM 解码器
+
+    随网络数据到达逐段 feed()，解析 RIFF 头后按采样帧对齐输出 float32 单声道样本；
+    不完整的采样帧保留到下一次 feed()。裸 PCM 模式（raw=True）跳过头部解析，
+    直接按给定的采样率/位宽/声道数解码。
+    """
+
+    def __init__(
+        self,
+        raw: bool = False,
+        sample_rate: Optional[int] = None,
+        sample_width: int = 2,
+        channels: int = 1,
+    ) -> None:
+        self._buffer = bytearray()
+        self._is_float = False
+        self._data_remaining: Optional[int] = None
+        self._skip = 0
+        self.sample_rate: Optional[int] = None
+        self.sample_width: Optional[int] = None
+        self.channels: Optional[int] = None
+
+        if raw:
+            if not sample_rate:
+                raise ValueError("sample_rate is required for raw PCM")
+            self.sample_rate = int(sample_rate)
+            self.sample_width = int(sample_width)
+            self.channels = int(channels)
+            self._state = "data"
+        else:
+            self._state = "riff"
+
+    @property
+    def ready(self) -> bool:
+        """音频格式是否已确定（头部已解析完毕）"""
+        return self.sample_rate is not None
+
+    def feed(self, data: bytes) -> np.ndarray:
+        """
+        输入一段字节流
+
+        Returns:
+            本次可解码的 float32 单声道样本（可能为空数组）
+        """
+        if data:
+            self._buffer += data
+
+        while self._state not in ("data", "done"):
+            if not self._parse_header_step():
+                return np.zeros(0, dtype=np.float32)
+
+        if self._state == "done":
+            self._buffer.clear()
+            return np.zeros(0, dtype=np.float32)
+
+        return self._decode_available()
+
+    def _parse_header_step(self) -> bool:
+        buf = self._buffer
+
+        if self._state == "riff":
+            if len(buf) < 12:
+                return False
+            if bytes(buf[0:4]) != b"RIFF" or bytes(buf[8:12]) != b"WAVE":
+                raise ValueError("Invalid WAV stream: missing RIFF/WAVE header")
+            del buf[:12]
+            self._state = "chunk"
+            return True
+
+        if self._state == "chunk":
+            if len(buf) < 8:
+                return False
+            chunk_id = bytes(buf[0:4])
+            (chunk_size,) = struct.unpack_from("<I", buf, 4)
+
+            if chunk_id == b"data":
+                if self.sample_rate is None:
+                    raise ValueError("Invalid WAV stream: data chunk before fmt chunk")
+                del buf[:8]
+                self._data_remaining = (
+                    None if chunk_size in _UNKNOWN_SIZES else int(chunk_size)
+                )
+                self._state = "data"
+                return True
+
+            # 其他块按偶数字节对齐
+            total = 8 + chunk_size + (chunk_size & 1)
+            if chunk_id == b"fmt ":
+                if len(buf) < total:
+                    return False
+                self._parse_fmt(bytes(buf[8 : 8 + chunk_size]))
+                del buf[:total]
+                return True
+
+            # 跳过未知块（如 LIST），无需等待完整内容
+            if len(buf) < total:
+                self._skip = total - len(buf)
+                buf.clear()
+                self._state = "skip"
+                return True
+            del buf[:total]
+            return True
+
+        if self._state == "skip":
+            n = min(self._skip, len(buf))
+            del buf[:n]
+            self._skip -= n
+            if self._skip > 0:
+                return False
+            self._state = "chunk"
+            return True
+
+        return False
+
+    def _parse_fmt(self, fmt: bytes) -> None:
+        if len(fmt) < 16:
+            raise ValueError("Invalid WAV stream: fmt chunk too short")
+        audio_format, channels, sample_rate, _, _, bits = struct.unpack_from(
+            "<HHIIHH", fmt, 0
+        )
+        if audio_format == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            (audio_format,) = struct.unpack_from("<H", fmt, 24)
+        if audio_format not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Unsupported WAV format tag: {audio_format:#x}")
+
+        self._is_float = audio_format == _WAVE_FORMAT_IEEE_FLOAT
+        self.channels = int(channels)
+        self.sample_rate = int(sample_rate)
+        self.sample_width = (int(bits) + 7) // 8
+
+    def _decode_available(self) -> np.ndarray:
+        assert self.sample_width is not None and self.channels is not None
+        block_align = self.sample_width * self.channels
+
+        available = len(self._buffer)
+        if self._data_remaining is not None:
+            available = min(available, self._data_remaining)
+        n_bytes = available - (available % block_align)
+        if n_bytes <= 0:
+            return np.zeros(0, dtype=np.float32)
+
+        data = bytes(self._buffer[:n_bytes])
+        del self._buffer[:n_bytes]
+        if self._data_remaining is not None:
+            self._data_remaining -= n_bytes
+            if self._data_remaining < block_align:
+                self._state = "done"
+
+        pcm = pcm_bytes_to_float32(data, self.sample_width, self._is_float)
+        if self.channels > 1:
+            pcm = pcm.reshape(-1, self.channels).mean(axis=1)
+        return pcm.astype(np.float32, copy=False)
+
+
+class PCMChunker:
+    """
+    将任意长度的 float32 样本流重新切分为固定长度的块
+
+    流式解码出的样本长度取决于网络分包，这里统一对齐到 chunk_size 再交给下游；
+    流结束时 flush() 输出不足一块的剩余样本。
+    """
+
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = int(chunk_size)
+        self._pending: List[np.ndarray] = []
+        self._pending_len = 0
+
+    def push(self, samples: np.ndarray) -> List[np.ndarray]:
+        if samples.size == 0:
+            return []
+        if self.chunk_size <= 0:
+            return [samples.astype(np.float32, copy=False)]
+
+        self._pending.append(samples)
+        self._pending_len += int(samples.shape[0])
+        if self._pending_len < self.chunk_size:
+            return []
+
+        data = np.concatenate(self._pending) if len(self._pending) > 1 else self._pending[0]
+        n_full = (self._pending_len // self.chunk_size) * self.chunk_size
+        chunks = [
+            data[idx : idx + self.chunk_size].astype(np.float32)
+            for idx in range(0, n_full, self.chunk_size)
+        ]
+        rest = data[n_full:]
+        self._pending = [rest] if rest.size else []
+        self._pending_len = int(rest.shape[0])
+        return chunks
+
+    def flush(self) -> List[np.ndarray]:
+        if not self._pending_len:
+            return []
+        data = np.concatenate(self._pending).astype(np.float32)
+        self._pending = []
+        self._pending_len = 0
+        return [data]
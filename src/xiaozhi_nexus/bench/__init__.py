@@ -0,0 +1,44 @@
+from xiaozhi_nexus.bench.device import (
+    DeviceResult,
+    EncodedUtterance,
+    SimulatedDevice,
+    encode_utterance,
+    synthetic_utterance,
+)
+from xiaozhi_nexus.bench.loadgen import (
+    LoadgenOptions,
+    LoadgenReport,
+    LoadgenSession,
+    SessionStats,
+    load_corpus,
+    run_loadgen,
+)
+from xiaozhi_nexus.bench.runner import (
+    BenchOptions,
+    BenchReport,
+    BenchServers,
+    LevelResult,
+    run_bench,
+)
+from xiaozhi_nexus.bench.upstream import FakeUpstreamOptions, create_upstream_app
+
+__all__ = [
+    "BenchOptions",
+    "BenchReport",
+    "BenchServers",
+    "DeviceResult",
+    "EncodedUtterance",
+    "FakeUpstreamOptions",
+    "LevelResult",
+    "LoadgenOptions",
+    "LoadgenReport",
+    "LoadgenSession",
+    "SessionStats",
+    "SimulatedDevice",
+    "create_upstream_app",
+    "encode_utterance",
+    "load_corpus",
+    "run_bench",
+    "run_loadgen",
+    "synthetic_utterance",
+]
@@ -0,0 +1,209 @@
+"""
+模拟设备：按小智 WebSocket 协议连接 /ws，发送 hello 与 listen start 后以实时速度上行 Opus 音频
+
+每一轮先发送一段语音，再持续发送静音，直到服务端的 tts stop（本轮回复播放完毕）或超时，
+然后开始下一轮。首音频延迟（time to first audio）从语音的最后一帧发出算起，到收到本轮
+第一个下行音频帧为止，包含服务端端点检测的尾部静音等待。
+
+所有设备共享同一份预先编码好的 Opus 包（见 encode_utterance），单个压测进程即可模拟大量设备。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from xiaozhi_nexus.api.admission import CLOSE_TRY_AGAIN_LATER
+
+
+def synthetic_utterance(
+    sample_rate: int = 16000, speech_s: float = 1.2, lead_silence_s: float = 0.3
+) -> np.ndarray:
+    """
+    合成一段类语音信号（int16）：前导静音 + 带音节起伏的谐波
+
+    基频 150Hz 加若干谐波，按 4Hz 做幅度调制，能量和过零率都落在 VAD 的语音范围内。
+    """
+    lead = np.zeros(int(sample_rate * lead_silence_s), dtype=np.float32)
+    t = np.arange(int(sample_rate * speech_s), dtype=np.float32) / sample_rate
+    voiced = sum(np.sin(2 * np.pi * 150.0 * k * t) / k for k in range(1, 6))
+    envelope = 0.55 + 0.45 * np.sin(2 * np.pi * 4.0 * t)
+    speech = 0.25 * voiced * envelope
+    pcm = np.concatenate([lead, speech.astype(np.float32)])
+    return (np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+@dataclass(frozen=True)
+class EncodedUtterance:
+    """预先编码的上行音频：一句话的 Opus 包和一个静音帧"""
+
+    speech: Sequence[bytes]
+    silence: bytes
+    sample_rate: int
+    frame_duration_ms: int
+
+
+def encode_utterance(
+    pcm: np.ndarray, sample_rate: int = 16000, frame_duration_ms: int = 60
+) -> EncodedUtterance:
+    """把一句话（int16 或 float32 单声道）编码为 Opus 包（需要 libopus）"""
+    from xiaozhi_nexus.audio.opus import OpusEncoder
+
+    encoder = OpusEncoder(
+        sample_rate=sample_rate, channels=1, frame_duration_ms=frame_duration_ms
+    )
+    speech = encoder.encode_pcm_float32(pcm) + encoder.flush()
+    encoder.reset()
+    silence = encoder.encode_pcm_float32(np.zeros(encoder.frame_size, dtype=np.int16))[0]
+    return EncodedUtterance(
+        speech=speech,
+        silence=silence,
+        sample_rate=sample_rate,
+        frame_duration_ms=frame_duration_ms,
+    )
+
+
+def device_headers(device_id: str) -> Dict[str, str]:
+    """握手请求头（二进制协议版本 1：音频帧为裸 Opus）"""
+    return {
+        "device-id": device_id,
+        "client-id": device_id,
+        "protocol-version": "1",
+    }
+
+
+def hello_message(audio: EncodedUtterance) -> Dict[str, Any]:
+    """按上行音频参数生成 hello 消息"""
+    return {
+        "type": "hello",
+        "version": 1,
+        "transport": "websocket",
+        "audio_params": {
+            "format": "opus",
+            "sample_rate": audio.sample_rate,
+            "channels": 1,
+            "frame_duration": audio.frame_duration_ms,
+        },
+    }
+
+
+@dataclass
+class DeviceResult:
+    """单个模拟设备的结果"""
+
+    device_id: str
+    ttfa_s: List[float] = field(default_factory=list)  # 每轮的首音频延迟
+    turns: int = 0  # 完成（收到 tts stop）的轮数
+    timeouts: int = 0
+    rejected: bool = False  # 被服务端准入控制拒绝
+    error: Optional[str] = None
+
+
+class SimulatedDevice:
+    """
+    单个模拟设备
+
+    Args:
+        url: 服务端 WebSocket 地址（如 ws://127.0.0.1:8000/ws）
+        device_id: 设备标识（握手头 device-id）
+        audio: 预先编码的上行音频
+        turn_timeout_s: 单轮等待 tts stop 的最长时间
+    """
+
+    def __init__(
+        self,
+        url: str,
+        device_id: str,
+        audio: EncodedUtterance,
+        turn_timeout_s: float = 30.0,
+    ) -> None:
+        self.url = url
+        self.device_id = device_id
+        self.audio = audio
+        self.turn_timeout_s = turn_timeout_s
+        self.result = DeviceResult(device_id=device_id)
+        self._first_audio: Optional[float] = None
+        self._tts_stopped = asyncio.Event()
+
+    async def run(self, turns: int) -> DeviceResult:
+        from websockets.asyncio.client import connect
+        from websockets.exceptions import ConnectionClosed
+
+        try:
+            async with connect(
+                self.url, additional_headers=device_headers(self.device_id), max_size=None
+            ) as ws:
+                await ws.send(json.dumps(hello_message(self.audio)))
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await ws.send(
+                        json.dumps({"type": "listen", "state": "start", "mode": "realtime"})
+                    )
+                    await self._talk(ws, turns, receiver)
+                    await ws.send(json.dumps({"type": "listen", "state": "stop"}))
+                finally:
+                    receiver.cancel()
+                    try:
+                        await receiver
+                    except (asyncio.CancelledError, ConnectionClosed):
+                        pass
+        except ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == CLOSE_TRY_AGAIN_LATER:
+                self.result.rejected = True
+            else:
+                self.result.error = f"connection closed: {e}"
+        except Exception as e:
+            self.result.error = f"{type(e).__name__}: {e}"
+        return self.result
+
+    async def _receive(self, ws) -> None:
+        async for message in ws:
+            if isinstance(message, bytes):
+                if self._first_audio is None:
+                    self._first_audio = time.perf_counter()
+                continue
+            try:
+                payload = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            if payload.get("type") == "tts" and payload.get("state") == "stop":
+                self._tts_stopped.set()
+
+    async def _talk(self, ws, turns: int, receiver: asyncio.Task) -> None:
+        frame_s = self.audio.frame_duration_ms / 1000.0
+        loop = asyncio.get_running_loop()
+        next_send = loop.time()
+
+        async def send_frame(packet: bytes) -> None:
+            nonlocal next_send
+            if receiver.done():
+                # 接收端已结束：连接已关闭，由 run() 统一处理
+                receiver.result()
+                raise ConnectionError("connection closed by server")
+            await ws.send(packet)
+            next_send += frame_s
+            await asyncio.sleep(max(0.0, next_send - loop.time()))
+
+        for _ in range(turns):
+            self._first_audio = None
+            self._tts_stopped.clear()
+            for packet in self.audio.speech:
+                await send_frame(packet)
+            speech_end = time.perf_counter()
+
+            # 持续上行静音（服务端据此判定一句话结束），直到本轮回复播放完毕
+            deadline = loop.time() + self.turn_timeout_s
+            while not self._tts_stopped.is_set():
+                if loop.time() > deadline:
+                    self.result.timeouts += 1
+                    break
+                await send_frame(self.audio.silence)
+            else:
+                self.result.turns += 1
+            if self._first_audio is not None:
+                self.result.ttfa_s.append(self._first_audio - speech_end)
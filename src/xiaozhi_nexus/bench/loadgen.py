@@ -0,0 +1,464 @@
+"""
+设备负载生成器：单进程以 asyncio 模拟大量按小智协议接入 /ws 的设备，用于容量规划
+
+每个会话握手（hello）后循环执行收音周期，直到压测时长结束：
+
+    listen start → 说一句话 → 上行静音直到回复播放完毕（tts stop）→ listen stop → 停顿
+
+回复播放途中按概率再说一句话（打断），服务端 VAD 检测到后中止播放并回复 tts stop（interrupted），
+随后按新的一句话继续对话。上行音频取自语料（WAV 文件或目录，预先编码为 Opus，所有会话共享），
+按实时速度发送。
+
+每个会话统计：
+
+- 下行音频包：到达间隔抖动（RFC 3550，以下行帧时长为标称间隔）、断流（同一段回复内包间隔
+  超过 gap_ms）、迟到包（按设备抖动缓冲 jitter_buffer_ms 推算的播放时刻之后才到达，迟到后
+  按设备重新缓冲处理）
+- 控制消息延迟：hello → hello 回复、说完 → stt、说完 → tts start、开始打断 → tts stop
+  （从开始发送打断语音算起，包含语料的前导静音）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from xiaozhi_nexus.api.admission import CLOSE_TRY_AGAIN_LATER
+from xiaozhi_nexus.bench.device import (
+    EncodedUtterance,
+    device_headers,
+    encode_utterance,
+    hello_message,
+)
+from xiaozhi_nexus.bench.runner import percentile
+from xiaozhi_nexus.observability.loop import LoopLagMonitor
+
+logger = logging.getLogger(__name__)
+
+# 控制消息延迟的种类
+LATENCY_KINDS = ("hello", "stt", "tts_start", "interrupt")
+
+
+def load_corpus(
+    paths: Sequence[Path], sample_rate: int = 16000, frame_duration_ms: int = 60
+) -> List[EncodedUtterance]:
+    """
+    读取语料并编码为 Opus（需要 libopus）
+
+    每个 WAV 文件为一句话；目录按文件名顺序读取其中所有 .wav 文件。
+    多声道取平均，采样率不同时重采样到 sample_rate。
+    """
+    from xiaozhi_nexus.audio.resample import StreamingResampler
+    from xiaozhi_nexus.audio.wav import StreamingWavDecoder
+
+    files: List[Path] = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(path.glob("*.wav")))
+        else:
+            files.append(path)
+    if not files:
+        raise ValueError(f"No WAV files found in corpus: {', '.join(map(str, paths))}")
+
+    corpus: List[EncodedUtterance] = []
+    for file in files:
+        decoder = StreamingWavDecoder()
+        pcm = decoder.feed(file.read_bytes())
+        if decoder.sample_rate is None or not pcm.size:
+            raise ValueError(f"Not a valid WAV file: {file}")
+        if decoder.sample_rate != sample_rate:
+            resampler = StreamingResampler(decoder.sample_rate, sample_rate)
+            pcm = np.concatenate([resampler.process(pcm), resampler.flush()])
+        corpus.append(encode_utterance(pcm, sample_rate, frame_duration_ms))
+    return corpus
+
+
+def raise_nofile_limit(wanted: int) -> int:
+    """尽量把打开文件数软上限提高到 wanted（每个会话占用一个 socket），返回生效的上限"""
+    try:
+        import resource
+    except ImportError:
+        return wanted
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = wanted if hard == resource.RLIM_INFINITY else min(wanted, hard)
+    if soft < target:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+        soft = target
+    return soft
+
+
+@dataclass
+class LoadgenOptions:
+    """负载生成参数"""
+
+    sessions: int = 100
+    duration_s: float = 60.0
+    connect_rate: float = 50.0  # 每秒新建的连接数
+    think_time_s: float = 2.0  # 两个收音周期之间的平均停顿
+    barge_in_prob: float = 0.2  # 每个周期在回复播放中打断的概率
+    barge_in_delay_ms: float = 500.0  # 回复开始后多久打断（在 0.5~1.5 倍之间随机）
+    turn_timeout_s: float = 30.0
+    downlink_frame_ms: int = 20  # 服务端下行 Opus 帧时长
+    gap_ms: float = 200.0
+    jitter_buffer_ms: float = 60.0
+    device_prefix: str = "loadgen"
+
+
+@dataclass
+class SessionStats:
+    """单个会话的统计"""
+
+    device_id: str
+    connected: bool = False  # 已完成握手（收到 hello 回复）
+    rejected: bool = False
+    error: Optional[str] = None
+    cycles: int = 0  # 完成的收音周期数
+    turns: int = 0  # 完成（收到非打断的 tts stop）的回复数
+    barge_ins: int = 0
+    timeouts: int = 0
+    packets: int = 0
+    gaps: int = 0
+    max_gap_s: float = 0.0
+    late_packets: int = 0
+    jitter_s: float = 0.0  # RFC 3550 平滑抖动（会话结束时的值）
+    latencies: Dict[str, List[float]] = field(
+        default_factory=lambda: {kind: [] for kind in LATENCY_KINDS}
+    )
+
+
+class _DownlinkMeter:
+    """一段回复（tts start 到 tts stop）内的下行音频包到达统计"""
+
+    def __init__(self, stats: SessionStats, options: LoadgenOptions) -> None:
+        self.stats = stats
+        self.frame_s = options.downlink_frame_ms / 1000.0
+        self.gap_s = options.gap_ms / 1000.0
+        self.buffer_s = options.jitter_buffer_ms / 1000.0
+        self._base: Optional[float] = None  # 第 0 个包的到达时刻（重新缓冲后平移）
+        self._last = 0.0
+        self._index = 0
+
+    def start(self) -> None:
+        self._base = None
+
+    def packet(self, now: float) -> None:
+        stats = self.stats
+        stats.packets += 1
+        if self._base is None:
+            self._base, self._last, self._index = now, now, 1
+            return
+        interval = now - self._last
+        stats.jitter_s += (abs(interval - self.frame_s) - stats.jitter_s) / 16.0
+        if interval > self.gap_s:
+            stats.gaps += 1
+        stats.max_gap_s = max(stats.max_gap_s, interval)
+        if now > self._base + self.buffer_s + self._index * self.frame_s:
+            # 播放缓冲已空：设备停顿后从当前包重新开始缓冲
+            stats.late_packets += 1
+            self._base = now - self._index * self.frame_s
+        self._last = now
+        self._index += 1
+
+
+class LoadgenSession:
+    """
+    单个模拟会话
+
+    Args:
+        url: 服务端 WebSocket 地址
+        device_id: 设备标识
+        corpus: 上行语料（随机选取一句）
+        options: 负载参数
+    """
+
+    def __init__(
+        self,
+        url: str,
+        device_id: str,
+        corpus: Sequence[EncodedUtterance],
+        options: LoadgenOptions,
+    ) -> None:
+        self.url = url
+        self.corpus = corpus
+        self.options = options
+        self.stats = SessionStats(device_id=device_id)
+        self.active = False
+        self._meter = _DownlinkMeter(self.stats, options)
+        self._rng = random.Random(device_id)
+        self._hello_sent: Optional[float] = None
+        self._hello = asyncio.Event()
+        self._speech_end: Optional[float] = None  # 最近一句话的最后一帧发出时刻
+        self._barge_at: Optional[float] = None
+        self._playing_since: Optional[float] = None
+        self._turn_done = asyncio.Event()
+        self._receiver: Optional[asyncio.Task[None]] = None
+        self._next_send = 0.0
+        self._frame_s = corpus[0].frame_duration_ms / 1000.0
+
+    async def run(self, deadline: float) -> SessionStats:
+        """运行到 deadline（事件循环时间）后结束当前周期并断开"""
+        from websockets.asyncio.client import connect
+        from websockets.exceptions import ConnectionClosed
+
+        loop = asyncio.get_running_loop()
+        audio = self.corpus[0]
+        try:
+            async with connect(
+                self.url,
+                additional_headers=device_headers(self.stats.device_id),
+                max_size=None,
+                open_timeout=30,
+            ) as ws:
+                self._receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    self._hello_sent = time.perf_counter()
+                    await ws.send(json.dumps(hello_message(audio)))
+                    await self._wait_hello()
+                    self.stats.connected = True
+                    self.active = True
+                    while loop.time() < deadline:
+                        await self._cycle(ws)
+                        think_s = self.options.think_time_s * self._rng.uniform(0.5, 1.5)
+                        await asyncio.sleep(min(think_s, max(0.0, deadline - loop.time())))
+                finally:
+                    self._receiver.cancel()
+                    try:
+                        await self._receiver
+                    except (asyncio.CancelledError, ConnectionClosed):
+                        pass
+        except ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == CLOSE_TRY_AGAIN_LATER:
+                self.stats.rejected = True
+            else:
+                self.stats.error = f"connection closed: {e}"
+        except asyncio.TimeoutError:
+            self.stats.error = "timed out waiting for hello"
+        except Exception as e:
+            self.stats.error = f"{type(e).__name__}: {e}"
+        finally:
+            self.active = False
+        return self.stats
+
+    async def _wait_hello(self) -> None:
+        """等待 hello 回复；期间连接被关闭（如准入拒绝）时抛出对应异常"""
+        assert self._receiver is not None
+        hello = asyncio.ensure_future(self._hello.wait())
+        try:
+            await asyncio.wait(
+                {hello, self._receiver},
+                timeout=self.options.turn_timeout_s,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            hello.cancel()
+        if self._hello.is_set():
+            return
+        if self._receiver.done():
+            self._receiver.result()
+            raise ConnectionError("connection closed by server")
+        raise asyncio.TimeoutError
+
+    def _latency(self, kind: str, since: Optional[float], now: float) -> None:
+        if since is not None:
+            self.stats.latencies[kind].append(now - since)
+
+    async def _receive(self, ws) -> None:
+        async for message in ws:
+            now = time.perf_counter()
+            if isinstance(message, bytes):
+                self._meter.packet(now)
+                continue
+            try:
+                payload = json.loads(message)
+            except json.JSONDecodeError:
+                continue
+            typ = payload.get("type")
+            if typ == "hello":
+                self._latency("hello", self._hello_sent, now)
+                self._hello.set()
+            elif typ == "stt":
+                self._latency("stt", self._speech_end, now)
+            elif typ == "tts" and payload.get("state") == "start":
+                self._latency("tts_start", self._speech_end, now)
+                self._speech_end = None
+                self._playing_since = now
+                self._meter.start()
+            elif typ == "tts" and payload.get("state") == "stop":
+                self._playing_since = None
+                if payload.get("interrupted"):
+                    self._latency("interrupt", self._barge_at, now)
+                    self._barge_at = None
+                else:
+                    self._turn_done.set()
+
+    async def _send_frame(self, ws, packet: bytes) -> None:
+        assert self._receiver is not None
+        if self._receiver.done():
+            # 接收端已结束：连接已关闭，由 run() 统一处理
+            self._receiver.result()
+            raise ConnectionError("connection closed by server")
+        await ws.send(packet)
+        loop = asyncio.get_running_loop()
+        self._next_send += self._frame_s
+        await asyncio.sleep(max(0.0, self._next_send - loop.time()))
+
+    async def _speak(self, ws, audio: EncodedUtterance) -> None:
+        for packet in audio.speech:
+            await self._send_frame(ws, packet)
+        self._speech_end = time.perf_counter()
+
+    async def _cycle(self, ws) -> None:
+        loop = asyncio.get_running_loop()
+        audio = self._rng.choice(self.corpus)
+        self._frame_s = audio.frame_duration_ms / 1000.0
+        self._next_send = loop.time()
+        self._turn_done.clear()
+        self._barge_at = None
+        await ws.send(json.dumps({"type": "listen", "state": "start", "mode": "realtime"}))
+        await self._speak(ws, audio)
+
+        barge_in = self._rng.random() < self.options.barge_in_prob
+        barge_delay_s = self.options.barge_in_delay_ms / 1000.0 * self._rng.uniform(0.5, 1.5)
+        turn_deadline = loop.time() + self.options.turn_timeout_s
+        while not self._turn_done.is_set():
+            if loop.time() > turn_deadline:
+                self.stats.timeouts += 1
+                break
+            playing_since = self._playing_since
+            if (
+                barge_in
+                and playing_since is not None
+                and time.perf_counter() - playing_since >= barge_delay_s
+            ):
+                # 回复播放中再说一句话：服务端中止播放，并按这句话开始新的一轮
+                barge_in = False
+                self.stats.barge_ins += 1
+                self._barge_at = time.perf_counter()
+                await self._speak(ws, self._rng.choice(self.corpus))
+                self._turn_done.clear()
+                turn_deadline = loop.time() + self.options.turn_timeout_s
+                continue
+            await self._send_frame(ws, audio.silence)
+        else:
+            self.stats.turns += 1
+
+        await ws.send(json.dumps({"type": "listen", "state": "stop"}))
+        self.stats.cycles += 1
+
+
+@dataclass
+class LoadgenReport:
+    """所有会话的汇总"""
+
+    sessions: List[SessionStats]
+    wall_s: float
+    # 生成器自身的事件循环延迟：偏高时发送节奏和到达时间戳失真，测得的抖动与延迟偏大
+    loop_lag_max_s: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        stats = self.sessions
+        connected = [s for s in stats if s.connected]
+        jitters = [s.jitter_s for s in connected if s.packets > 1]
+        result: Dict[str, Any] = {
+            "sessions": len(stats),
+            "connected": len(connected),
+            "rejected": sum(s.rejected for s in stats),
+            "errors": sum(s.error is not None for s in stats),
+            "cycles": sum(s.cycles for s in stats),
+            "turns": sum(s.turns for s in stats),
+            "barge_ins": sum(s.barge_ins for s in stats),
+            "timeouts": sum(s.timeouts for s in stats),
+            "packets": sum(s.packets for s in stats),
+            "gaps": sum(s.gaps for s in stats),
+            "late_packets": sum(s.late_packets for s in stats),
+            "max_gap_ms": _ms(max((s.max_gap_s for s in stats), default=0.0)),
+            "jitter_p50_ms": _ms(percentile(jitters, 50)),
+            "jitter_p99_ms": _ms(percentile(jitters, 99)),
+            "wall_s": round(self.wall_s, 1),
+            "loadgen_loop_lag_max_ms": _ms(self.loop_lag_max_s),
+        }
+        for kind in LATENCY_KINDS:
+            values = [v for s in stats for v in s.latencies[kind]]
+            result[f"{kind}_p50_ms"] = _ms(percentile(values, 50))
+            result[f"{kind}_p99_ms"] = _ms(percentile(values, 99))
+            result[f"{kind}_max_ms"] = _ms(max(values) if values else None)
+        return result
+
+    def error_samples(self, limit: int = 5) -> List[str]:
+        return [f"{s.device_id}: {s.error}" for s in self.sessions if s.error is not None][:limit]
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000.0, 1) if value is not None else None
+
+
+async def run_loadgen(
+    url: str,
+    corpus: Sequence[EncodedUtterance],
+    options: LoadgenOptions,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    progress_interval_s: float = 5.0,
+) -> LoadgenReport:
+    """
+    按 connect_rate 逐个建立 sessions 个会话，运行 duration_s 秒（从第一个连接算起）
+
+    Args:
+        on_progress: 定期回调当前进度（活跃会话数、已完成周期数等）
+    """
+    if not corpus:
+        raise ValueError("Empty corpus")
+    limit = raise_nofile_limit(options.sessions + 256)
+    if limit < options.sessions + 64:
+        logger.warning(f"Open file limit {limit} may be too low for {options.sessions} sessions")
+
+    loop = asyncio.get_running_loop()
+    monitor = LoopLagMonitor(interval_s=0.1)
+    monitor.start()
+    start = loop.time()
+    deadline = start + options.duration_s
+    sessions = [
+        LoadgenSession(url, f"{options.device_prefix}-{i}", corpus, options)
+        for i in range(options.sessions)
+    ]
+
+    async def launch(index: int, session: LoadgenSession) -> SessionStats:
+        if options.connect_rate > 0:
+            await asyncio.sleep(index / options.connect_rate)
+        return await session.run(deadline)
+
+    async def report_progress() -> None:
+        while True:
+            await asyncio.sleep(progress_interval_s)
+            assert on_progress is not None
+            on_progress(
+                {
+                    "elapsed_s": int(loop.time() - start),
+                    "active": sum(s.active for s in sessions),
+                    "rejected": sum(s.stats.rejected for s in sessions),
+                    "errors": sum(s.stats.error is not None for s in sessions),
+                    "turns": sum(s.stats.turns for s in sessions),
+                    "barge_ins": sum(s.stats.barge_ins for s in sessions),
+                    "loop_lag_ms": int(monitor.lag_s * 1000),
+                }
+            )
+
+    progress = asyncio.create_task(report_progress()) if on_progress is not None else None
+    try:
+        results = await asyncio.gather(*(launch(i, s) for i, s in enumerate(sessions)))
+    finally:
+        if progress is not None:
+            progress.cancel()
+        await monitor.stop()
+    return LoadgenReport(
+        sessions=list(results),
+        wall_s=loop.time() - start,
+        loop_lag_max_s=monitor.max_lag_s,
+    )
@@ -0,0 +1,332 @@
+"""
+离线压测：启动本地假上游和 xiaozhi-nexus 服务，按递增的并发档位驱动模拟设备
+
+每一档同时启动 N 个设备，各自完成若干轮对话，统计：
+
+- 首音频延迟（用户说完到收到第一个下行音频帧）的 p50 / p99
+- 每个会话占用的服务进程 CPU（服务进程 CPU 时间增量 / 墙钟时间 / 会话数，以单核百分比表示）
+- 错误、拒绝与超时
+
+某一档没有错误、拒绝和超时且 p99 不超过 SLO 即视为可持续；从低到高逐档测试，
+遇到第一个不可持续的档位即停止，最后一个可持续档位为最大可持续并发。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from omegaconf import OmegaConf
+
+from xiaozhi_nexus.bench.device import (
+    DeviceResult,
+    EncodedUtterance,
+    SimulatedDevice,
+    encode_utterance,
+    synthetic_utterance,
+)
+from xiaozhi_nexus.bench.upstream import FakeUpstreamOptions, run_upstream
+from xiaozhi_nexus.config import AppConfig
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+
+
+@dataclass
+class BenchOptions:
+    """压测参数"""
+
+    levels: Sequence[int] = DEFAULT_LEVELS  # 递增的并发档位
+    turns: int = 3  # 每个设备的对话轮数
+    slo_ms: float = 1500.0  # 首音频延迟 p99 上限
+    turn_timeout_s: float = 30.0
+    ramp_s: float = 1.0  # 同一档位的设备在该时间内陆续接入，避免同步发送
+    upstream: FakeUpstreamOptions = field(default_factory=FakeUpstreamOptions)
+    tts_format: str = "wav"
+
+
+@dataclass
+class LevelResult:
+    """一个并发档位的结果"""
+
+    sessions: int
+    turns: int = 0
+    errors: int = 0
+    rejected: int = 0
+    timeouts: int = 0
+    ttfa_p50_s: Optional[float] = None
+    ttfa_p99_s: Optional[float] = None
+    cpu_per_session: Optional[float] = None  # 单核占比（0.05 表示 5% 个核）
+    sustainable: bool = False
+    error_samples: List[str] = field(default_factory=list)
+
+
+@dataclass
+class BenchReport:
+    levels: List[LevelResult] = field(default_factory=list)
+
+    @property
+    def max_sustainable(self) -> int:
+        sustainable = [level.sessions for level in self.levels if level.sustainable]
+        return max(sustainable) if sustainable else 0
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """最近秩百分位（q 为 0~100）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((host, 0))
+        return int(sock.getsockname()[1])
+
+
+def _wait_for_http(url: str, timeout_s: float) -> bool:
+    """轮询直到 url 有 HTTP 响应（任意状态码）"""
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=0.5):
+                return True
+        except urllib.error.HTTPError:
+            return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+class ProcessCPU:
+    """读取进程累计 CPU 时间（Linux /proc），其他平台不可用"""
+
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        try:
+            self._ticks = float(os.sysconf("SC_CLK_TCK"))
+        except (AttributeError, ValueError, OSError):
+            self._ticks = 0.0
+
+    def seconds(self) -> Optional[float]:
+        if not self._ticks:
+            return None
+        try:
+            with open(f"/proc/{self.pid}/stat", "rb") as f:
+                stat = f.read().decode()
+        except OSError:
+            return None
+        # 进程名可能含空格，从最后一个 ')' 之后开始按字段切分：utime / stime 为第 14 / 15 个字段
+        fields = stat[stat.rfind(")") + 2 :].split()
+        return (int(fields[11]) + int(fields[12])) / self._ticks
+
+
+def build_bench_config(
+    base: Optional[Path], upstream_url: str, port: int, tts_format: str
+) -> Dict[str, Any]:
+    """
+    在用户配置（或默认配置）基础上生成压测配置
+
+    上游全部指向假服务；服务只监听本机随机端口并以单 worker 运行（CPU 只统计一个进程）。
+    """
+    merged = OmegaConf.structured(AppConfig)
+    if base is not None:
+        merged = OmegaConf.merge(merged, OmegaConf.load(base))
+    overrides = {
+        "openai": {"base_url": upstream_url, "api_key": "bench"},
+        "tts": {"base_url": None, "api_key": None, "response_format": tts_format},
+        "asr": {"base_url": None, "api_key": None},
+        "server": {"host": "127.0.0.1", "port": port, "workers": 1},
+    }
+    merged = OmegaConf.merge(merged, overrides)
+    return OmegaConf.to_container(merged, resolve=True)  # type: ignore[return-value]
+
+
+class BenchServers:
+    """
+    压测期间运行的假上游进程和 xiaozhi-nexus 服务进程
+
+    两者都在独立进程中运行：服务进程的 CPU 可单独统计，也不与设备模拟争用事件循环。
+    """
+
+    def __init__(self, config_path: Optional[Path], options: BenchOptions) -> None:
+        self.config_path = config_path
+        self.options = options
+        self.upstream_port = _free_port()
+        self.server_port = _free_port()
+        self._upstream: Optional[multiprocessing.Process] = None
+        self._server: Optional[subprocess.Popen[bytes]] = None
+        self._tmpdir = tempfile.TemporaryDirectory(prefix="xiaozhi-bench-")
+        self.log_path = Path(self._tmpdir.name) / "server.log"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self.server_port}/ws"
+
+    @property
+    def server_pid(self) -> Optional[int]:
+        return self._server.pid if self._server is not None else None
+
+    def start(self, timeout_s: float = 30.0) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        self._upstream = ctx.Process(
+            target=run_upstream,
+            args=("127.0.0.1", self.upstream_port, self.options.upstream),
+            name="bench-upstream",
+            daemon=True,
+        )
+        self._upstream.start()
+        deadline = time.monotonic() + timeout_s
+        while not _wait_for_http(f"http://127.0.0.1:{self.upstream_port}/", 0.5):
+            if not self._upstream.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Fake upstream did not start")
+
+        config = build_bench_config(
+            self.config_path,
+            f"http://127.0.0.1:{self.upstream_port}/v1",
+            self.server_port,
+            self.options.tts_format,
+        )
+        config_path = Path(self._tmpdir.name) / "config.yaml"
+        config_path.write_text(OmegaConf.to_yaml(config), encoding="utf-8")
+        with self.log_path.open("wb") as log:
+            self._server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "xiaozhi_nexus.commands.app",
+                    "serve",
+                    "-c",
+                    str(config_path),
+                ],
+                stdout=log,
+                stderr=subprocess.STDOUT,
+            )
+        deadline = time.monotonic() + timeout_s
+        while not _wait_for_http(f"http://127.0.0.1:{self.server_port}/metrics", 0.5):
+            if self._server.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"Server did not start:\n{self.log_tail()}")
+
+    def log_tail(self, lines: int = 20) -> str:
+        try:
+            return "\n".join(self.log_path.read_text(errors="replace").splitlines()[-lines:])
+        except OSError:
+            return ""
+
+    def stop(self) -> None:
+        server, self._server = self._server, None
+        if server is not None and server.poll() is None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+                server.wait()
+        upstream, self._upstream = self._upstream, None
+        if upstream is not None and upstream.is_alive():
+            upstream.terminate()
+            upstream.join(timeout=5)
+        self._tmpdir.cleanup()
+
+    def __enter__(self) -> "BenchServers":
+        try:
+            self.start()
+        except BaseException:
+            self.stop()
+            raise
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+async def run_level(
+    url: str,
+    sessions: int,
+    audio: EncodedUtterance,
+    options: BenchOptions,
+    server_pid: Optional[int] = None,
+) -> LevelResult:
+    """以 sessions 个并发设备运行一档"""
+    cpu = ProcessCPU(server_pid) if server_pid is not None else None
+    cpu_start = cpu.seconds() if cpu is not None else None
+    wall_start = time.perf_counter()
+
+    async def device(index: int) -> DeviceResult:
+        await asyncio.sleep(options.ramp_s * index / sessions)
+        return await SimulatedDevice(
+            url, f"bench-{sessions}-{index}", audio, options.turn_timeout_s
+        ).run(options.turns)
+
+    results = await asyncio.gather(*(device(i) for i in range(sessions)))
+    wall_s = time.perf_counter() - wall_start
+    cpu_end = cpu.seconds() if cpu is not None else None
+
+    level = LevelResult(sessions=sessions)
+    ttfa: List[float] = []
+    for result in results:
+        level.turns += result.turns
+        level.timeouts += result.timeouts
+        level.rejected += int(result.rejected)
+        if result.error is not None:
+            level.errors += 1
+            if len(level.error_samples) < 3:
+                level.error_samples.append(f"{result.device_id}: {result.error}")
+        ttfa.extend(result.ttfa_s)
+    level.ttfa_p50_s = percentile(ttfa, 50)
+    level.ttfa_p99_s = percentile(ttfa, 99)
+    if cpu_start is not None and cpu_end is not None and wall_s > 0:
+        level.cpu_per_session = (cpu_end - cpu_start) / wall_s / sessions
+    level.sustainable = (
+        level.errors == 0
+        and level.rejected == 0
+        and level.timeouts == 0
+        and level.ttfa_p99_s is not None
+        and level.ttfa_p99_s * 1000.0 <= options.slo_ms
+    )
+    return level
+
+
+async def run_bench(
+    url: str,
+    options: BenchOptions,
+    server_pid: Optional[int] = None,
+    on_level: Any = None,
+    audio: Optional[EncodedUtterance] = None,
+) -> BenchReport:
+    """
+    逐档运行压测，遇到第一个不可持续的档位即停止
+
+    Args:
+        url: 服务端 WebSocket 地址
+        server_pid: 服务进程 PID，用于统计 CPU（压测外部服务时为 None）
+        on_level: 每档完成后的回调 on_level(LevelResult)
+        audio: 设备上行的音频，None 时使用合成语音
+    """
+    if audio is None:
+        audio = encode_utterance(synthetic_utterance())
+    report = BenchReport()
+    for sessions in options.levels:
+        level = await run_level(url, sessions, audio, options, server_pid)
+        report.levels.append(level)
+        if on_level is not None:
+            on_level(level)
+        if not level.sustainable:
+            break
+    return report
@@ -0,0 +1,217 @@
+"""
+本地假上游：OpenAI 兼容的 chat completions / audio speech / realtime 转录服务
+
+压测时代替真实 API，只模拟时序（首包延迟、token 速率、音频产出速度），不做任何推理，
+使测得的吞吐只反映 xiaozhi-nexus 自身的开销。三个接口挂在同一个 FastAPI 应用上：
+
+- POST /v1/chat/completions：SSE 流式输出固定回复，首 token 延迟后按 tokens_per_s 逐字发送
+- POST /v1/audio/speech：按文本长度生成正弦波音频（wav 或裸 pcm），首字节延迟后以
+  realtime_factor 倍实时速度分块发送
+- WS /v1/realtime：每次提交的音频缓冲返回一段固定转录（一个 delta + done 事件）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import itertools
+import json
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Set
+
+import numpy as np
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+
+
+@dataclass(frozen=True)
+class FakeUpstreamOptions:
+    """假上游的时序参数"""
+
+    # chat completions
+    chat_first_token_ms: float = 300.0
+    chat_tokens_per_s: float = 30.0  # 每个字（token）一个 SSE 事件
+    chat_reply: str = "今天天气晴朗，气温二十度左右。适合出门散步，记得带上水。"
+
+    # audio speech
+    speech_first_byte_ms: float = 200.0
+    speech_realtime_factor: float = 5.0  # 音频产出速度为实时播放速度的倍数
+    speech_sample_rate: int = 24000
+    speech_s_per_char: float = 0.2  # 每个字对应的音频时长
+    speech_chunk_ms: int = 100
+
+    # realtime 转录
+    transcript: str = "今天天气怎么样"
+    transcript_delay_ms: float = 150.0
+
+
+_ids = itertools.count(1)
+
+
+def _sse(data: Any) -> bytes:
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _wav_header(sample_rate: int) -> bytes:
+    """流式 WAV 头：数据长度未知，RIFF/data 大小写 0xFFFFFFFF"""
+    byte_rate = sample_rate * 2
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVE"
+        + b"fmt "
+        + struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, byte_rate, 2, 16)
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+def _tone(sample_rate: int, seconds: float) -> bytes:
+    t = np.arange(int(sample_rate * seconds), dtype=np.float32) / sample_rate
+    pcm = (0.3 * np.sin(2 * np.pi * 440.0 * t) * 32767).astype("<i2")
+    return pcm.tobytes()
+
+
+def create_upstream_app(options: FakeUpstreamOptions = FakeUpstreamOptions()) -> FastAPI:
+    app = FastAPI(title="xiaozhi-nexus fake upstream")
+    # 一秒的正弦波，按需要的时长循环切片
+    tone = _tone(options.speech_sample_rate, 1.0)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> StreamingResponse:
+        body = await request.json()
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{next(_ids)}"
+
+        def chunk(delta: Dict[str, Any], finish_reason: Any = None) -> bytes:
+            return _sse(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+            )
+
+        async def stream() -> AsyncIterator[bytes]:
+            await asyncio.sleep(options.chat_first_token_ms / 1000.0)
+            yield chunk({"role": "assistant", "content": ""})
+            interval = 1.0 / options.chat_tokens_per_s if options.chat_tokens_per_s > 0 else 0.0
+            for char in options.chat_reply:
+                yield chunk({"content": char})
+                if interval:
+                    await asyncio.sleep(interval)
+            yield chunk({}, "stop")
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.post("/v1/audio/speech")
+    async def speech(request: Request) -> StreamingResponse:
+        body = await request.json()
+        text = str(body.get("input", ""))
+        fmt = str(body.get("response_format", "wav")).lower()
+        sample_rate = options.speech_sample_rate
+        total = int(len(text) * options.speech_s_per_char * sample_rate) * 2
+        chunk_bytes = int(sample_rate * options.speech_chunk_ms / 1000) * 2
+        chunk_s = options.speech_chunk_ms / 1000.0 / max(options.speech_realtime_factor, 1e-6)
+
+        async def stream() -> AsyncIterator[bytes]:
+            await asyncio.sleep(options.speech_first_byte_ms / 1000.0)
+            if fmt == "wav":
+                yield _wav_header(sample_rate)
+            sent = 0
+            while sent < total:
+                size = min(chunk_bytes, total - sent)
+                offset = sent % len(tone)
+                yield tone[offset : offset + size] if offset + size <= len(tone) else (
+                    tone[offset:] + tone[: offset + size - len(tone)]
+                )
+                sent += size
+                await asyncio.sleep(chunk_s)
+
+        media_type = "audio/wav" if fmt == "wav" else "audio/pcm"
+        return StreamingResponse(stream(), media_type=media_type)
+
+    @app.websocket("/v1/realtime")
+    async def realtime(websocket: WebSocket) -> None:
+        await websocket.accept()
+        # 已提交但还没有 response.create 对应的音频缓冲数 / 等待提交的 response.create
+        committed = 0
+        requested: Deque[str] = deque()
+        send_lock = asyncio.Lock()
+
+        async def send(event: Dict[str, Any]) -> None:
+            event.setdefault("event_id", f"event_{next(_ids)}")
+            async with send_lock:
+                await websocket.send_text(json.dumps(event, ensure_ascii=False))
+
+        async def respond(response_id: str) -> None:
+            await asyncio.sleep(options.transcript_delay_ms / 1000.0)
+            item_id = f"item_{next(_ids)}"
+            common = {
+                "response_id": response_id,
+                "item_id": item_id,
+                "output_index": 0,
+                "content_index": 0,
+            }
+            text = options.transcript
+            await send({"type": "response.audio_transcript.delta", "delta": text, **common})
+            await send({"type": "response.audio_transcript.done", "transcript": text, **common})
+            await send(
+                {
+                    "type": "response.done",
+                    "response": {
+                        "id": response_id,
+                        "object": "realtime.response",
+                        "status": "completed",
+                        "output": [],
+                    },
+                }
+            )
+
+        await send(
+            {
+                "type": "session.created",
+                "session": {"id": f"sess_{next(_ids)}", "object": "realtime.session"},
+            }
+        )
+        tasks: Set[asyncio.Task[None]] = set()
+        try:
+            while True:
+                event = json.loads(await websocket.receive_text())
+                event_type = event.get("type")
+                if event_type == "input_audio_buffer.append":
+                    # 只校验负载可解码，不做识别
+                    base64.b64decode(event.get("audio", ""))
+                    continue
+                if event_type == "input_audio_buffer.commit":
+                    committed += 1
+                elif event_type == "response.create":
+                    requested.append(f"resp_{next(_ids)}")
+                else:
+                    continue
+                # 每个 response.create 对应其后的一次提交
+                while committed and requested:
+                    committed -= 1
+                    task = asyncio.create_task(respond(requested.popleft()))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return app
+
+
+def run_upstream(host: str, port: int, options: FakeUpstreamOptions) -> None:
+    """在当前进程中运行假上游（压测时以独立进程启动，不与设备模拟争用 CPU）"""
+    import uvicorn
+
+    uvicorn.run(create_upstream_app(options), host=host, port=port, log_level="warning")
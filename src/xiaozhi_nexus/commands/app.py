@@ -77,6 +77,12 @@ def serve(
         "-r",
         help="开发模式：代码变更时自动重载",
     ),
+    workers: Optional[int] = typer.Option(
+        None,
+        "--workers",
+        "-w",
+        help="worker 进程数 (覆盖配置文件中的 server.workers)，>1 时以 SO_REUSEPORT 共享端口",
+    ),
 ) -> None:
     """启动 xiaozhi-nexus WebSocket 服务"""
     import uvicorn
@@ -92,20 +98,274 @@ def serve(
     # 命令行参数覆盖配置文件
     bind_host = host if host is not None else cfg.server.host
     bind_port = port if port is not None else cfg.server.port
+    worker_count = workers if workers is not None else cfg.server.workers
+
+    from xiaozhi_nexus.api.workers import (
+        APP_FACTORY,
+        DrainingServer,
+        WorkerSupervisor,
+        reuseport_supported,
+    )
+
+    if worker_count < 1:
+        typer.secho("错误: --workers 必须 >= 1", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+    if worker_count > 1 and reload:
+        typer.secho("错误: --reload 不能与多 worker 同时使用", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+    if worker_count > 1 and not reuseport_supported():
+        typer.secho("错误: 当前平台不支持 SO_REUSEPORT，无法启用多 worker", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
 
     typer.secho(
-        f"启动服务: http://{bind_host}:{bind_port}",
+        f"启动服务: http://{bind_host}:{bind_port}"
+        + (f" ({worker_count} workers)" if worker_count > 1 else ""),
         fg=typer.colors.GREEN,
     )
 
-    uvicorn.run(
-        "xiaozhi_nexus.api.app:create_app",
-        factory=True,
-        host=bind_host,
-        port=bind_port,
-        reload=reload,
-        log_level="info",
+    if reload:
+        uvicorn.run(
+            APP_FACTORY,
+            factory=True,
+            host=bind_host,
+            port=bind_port,
+            reload=True,
+            log_level="info",
+        )
+    elif worker_count > 1:
+        WorkerSupervisor(
+            worker_count,
+            bind_host,
+            bind_port,
+            config_path=config,
+            drain_timeout_s=cfg.server.drain_timeout_s,
+        ).run()
+    else:
+        server = DrainingServer(
+            uvicorn.Config(
+                APP_FACTORY,
+                factory=True,
+                host=bind_host,
+                port=bind_port,
+                log_level="info",
+            ),
+            drain_timeout_s=cfg.server.drain_timeout_s,
+        )
+        server.run()
+
+
+@app.command()
+def bench(
+    config: Optional[Path] = typer.Option(
+        None,
+        "--config",
+        "-c",
+        envvar=CONFIG_ENV_VAR,
+        help="作为压测基础的配置文件（上游地址、端口和 worker 数会被覆盖）",
+    ),
+    levels: str = typer.Option(
+        "1,2,4,8,16,32,64",
+        "--levels",
+        "-n",
+        help="递增的并发设备数，逗号分隔",
+    ),
+    turns: int = typer.Option(3, "--turns", help="每个设备的对话轮数"),
+    slo_ms: float = typer.Option(1500.0, "--slo-ms", help="首音频延迟 p99 上限（毫秒）"),
+    tokens_per_s: float = typer.Option(30.0, "--tokens-per-s", help="假 LLM 的输出速率"),
+    llm_first_token_ms: float = typer.Option(
+        300.0, "--llm-first-token-ms", help="假 LLM 的首 token 延迟（毫秒）"
+    ),
+    tts_first_byte_ms: float = typer.Option(
+        200.0, "--tts-first-byte-ms", help="假 TTS 的首字节延迟（毫秒）"
+    ),
+    tts_format: str = typer.Option("wav", "--tts-format", help="假 TTS 的音频格式：wav 或 pcm"),
+    url: Optional[str] = typer.Option(
+        None,
+        "--url",
+        help="压测已运行的服务（如 ws://host:8000/ws），不启动本地假上游，也不统计 CPU",
+    ),
+) -> None:
+    """离线压测：本地假上游 + 模拟设备，报告首音频延迟、单会话 CPU 和最大可持续并发"""
+    import asyncio
+
+    from xiaozhi_nexus.bench import (
+        BenchOptions,
+        BenchServers,
+        FakeUpstreamOptions,
+        LevelResult,
+        encode_utterance,
+        run_bench,
+        synthetic_utterance,
+    )
+
+    try:
+        level_list = sorted({int(x) for x in levels.split(",") if x.strip()})
+    except ValueError:
+        typer.secho(f"错误: --levels 格式无效: {levels}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+    if not level_list or level_list[0] < 1:
+        typer.secho("错误: --levels 必须为正整数", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+    if tts_format not in ("wav", "pcm"):
+        typer.secho("错误: --tts-format 必须为 wav 或 pcm", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    options = BenchOptions(
+        levels=level_list,
+        turns=turns,
+        slo_ms=slo_ms,
+        tts_format=tts_format,
+        upstream=FakeUpstreamOptions(
+            chat_first_token_ms=llm_first_token_ms,
+            chat_tokens_per_s=tokens_per_s,
+            speech_first_byte_ms=tts_first_byte_ms,
+        ),
+    )
+
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1000:.0f}" if value is not None else "-"
+
+    def header() -> None:
+        typer.echo(
+            f"{'sessions':>8} {'turns':>6} {'errors':>6} {'reject':>6} {'timeout':>7} "
+            f"{'p50_ms':>7} {'p99_ms':>7} {'cpu/sess':>8}"
+        )
+
+    def on_level(level: LevelResult) -> None:
+        cpu = f"{level.cpu_per_session * 100:.1f}%" if level.cpu_per_session is not None else "-"
+        typer.secho(
+            f"{level.sessions:>8} {level.turns:>6} {level.errors:>6} {level.rejected:>6} "
+            f"{level.timeouts:>7} {ms(level.ttfa_p50_s):>7} {ms(level.ttfa_p99_s):>7} {cpu:>8}",
+            fg=typer.colors.GREEN if level.sustainable else typer.colors.YELLOW,
+        )
+        for sample in level.error_samples:
+            typer.echo(f"         {sample}")
+
+    try:
+        # 先编码上行音频：缺少 libopus 时在启动服务前失败
+        audio = encode_utterance(synthetic_utterance())
+        if url is not None:
+            header()
+            report = asyncio.run(run_bench(url, options, on_level=on_level, audio=audio))
+        else:
+            with BenchServers(config, options) as servers:
+                header()
+                report = asyncio.run(
+                    run_bench(
+                        servers.ws_url,
+                        options,
+                        servers.server_pid,
+                        on_level=on_level,
+                        audio=audio,
+                    )
+                )
+    except RuntimeError as e:
+        typer.secho(f"压测失败: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    typer.secho(
+        f"最大可持续并发: {report.max_sustainable} (p99 <= {slo_ms:.0f} ms，无错误/拒绝/超时)",
+        fg=typer.colors.GREEN,
+    )
+
+
+@app.command()
+def loadgen(
+    url: str = typer.Option("ws://127.0.0.1:8000/ws", "--url", help="服务端 WebSocket 地址"),
+    sessions: int = typer.Option(100, "--sessions", "-n", help="并发会话数"),
+    duration_s: float = typer.Option(60.0, "--duration", "-d", help="运行时长（秒）"),
+    connect_rate: float = typer.Option(50.0, "--connect-rate", help="每秒新建的连接数"),
+    corpus: Optional[list[Path]] = typer.Option(
+        None,
+        "--corpus",
+        help="上行语料：WAV 文件或目录（可重复指定），缺省时使用合成语音",
+    ),
+    think_time_s: float = typer.Option(2.0, "--think-time", help="两个收音周期之间的平均停顿（秒）"),
+    barge_in: float = typer.Option(0.2, "--barge-in", help="每个周期在回复播放中打断的概率"),
+    jitter_buffer_ms: float = typer.Option(
+        60.0, "--jitter-buffer-ms", help="设备播放缓冲，用于判定下行迟到包"
+    ),
+    gap_ms: float = typer.Option(200.0, "--gap-ms", help="同一段回复内超过该间隔计为一次断流"),
+) -> None:
+    """设备负载生成：大量模拟设备按小智协议接入，统计下行抖动/断流与控制消息延迟"""
+    import asyncio
+
+    from xiaozhi_nexus.bench import (
+        LoadgenOptions,
+        encode_utterance,
+        load_corpus,
+        run_loadgen,
+        synthetic_utterance,
+    )
+
+    if sessions < 1:
+        typer.secho("错误: --sessions 必须 >= 1", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+    if not 0.0 <= barge_in <= 1.0:
+        typer.secho("错误: --barge-in 必须在 0~1 之间", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    options = LoadgenOptions(
+        sessions=sessions,
+        duration_s=duration_s,
+        connect_rate=connect_rate,
+        think_time_s=think_time_s,
+        barge_in_prob=barge_in,
+        jitter_buffer_ms=jitter_buffer_ms,
+        gap_ms=gap_ms,
+    )
+
+    def on_progress(progress: dict[str, int]) -> None:
+        typer.echo(
+            f"[{progress['elapsed_s']:>4}s] active={progress['active']} "
+            f"turns={progress['turns']} barge_ins={progress['barge_ins']} "
+            f"rejected={progress['rejected']} errors={progress['errors']} "
+            f"loop_lag={progress['loop_lag_ms']}ms"
+        )
+
+    try:
+        utterances = (
+            load_corpus(corpus) if corpus else [encode_utterance(synthetic_utterance())]
+        )
+        report = asyncio.run(run_loadgen(url, utterances, options, on_progress=on_progress))
+    except (RuntimeError, ValueError, OSError) as e:
+        typer.secho(f"负载生成失败: {e}", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+    summary = report.summary()
+
+    def value(key: str) -> str:
+        v = summary[key]
+        return "-" if v is None else f"{v:.1f}" if isinstance(v, float) else str(v)
+
+    typer.echo(
+        f"\n会话: {summary['sessions']} 已连接: {summary['connected']} "
+        f"拒绝: {summary['rejected']} 错误: {summary['errors']} 用时: {summary['wall_s']:.0f}s"
+    )
+    typer.echo(
+        f"周期: {summary['cycles']} 回复: {summary['turns']} "
+        f"打断: {summary['barge_ins']} 超时: {summary['timeouts']}"
+    )
+    typer.echo(
+        f"下行: 包 {summary['packets']} 断流 {summary['gaps']} 迟到 {summary['late_packets']} "
+        f"最大间隔 {value('max_gap_ms')} ms 抖动 p50/p99 "
+        f"{value('jitter_p50_ms')}/{value('jitter_p99_ms')} ms"
     )
+    typer.echo(f"{'latency':>10} {'p50_ms':>8} {'p99_ms':>8} {'max_ms':>8}")
+    for kind in ("hello", "stt", "tts_start", "interrupt"):
+        typer.echo(
+            f"{kind:>10} {value(f'{kind}_p50_ms'):>8} "
+            f"{value(f'{kind}_p99_ms'):>8} {value(f'{kind}_max_ms'):>8}"
+        )
+    for sample in report.error_samples():
+        typer.secho(f"  {sample}", fg=typer.colors.YELLOW)
+    lag_ms = summary["loadgen_loop_lag_max_ms"]
+    if lag_ms is not None and lag_ms > gap_ms / 2:
+        typer.secho(
+            f"警告: 生成器事件循环最大延迟 {lag_ms:.0f} ms，结果可能受生成器自身负载影响，"
+            "请减少会话数或分多个进程运行",
+            fg=typer.colors.YELLOW,
+        )
 
 
 # @app.command()
@@ -10,8 +10,10 @@ from .schema import (
     LLMConfig,
     TTSConfig,
     ASRConfig,
+    VADConfig,
     SystemConfig,
     ServerConfig,
+    TracingConfig,
 )
 from .loader import (
     load_config,
@@ -29,8 +31,10 @@ __all__ = [
     "LLMConfig",
     "TTSConfig",
     "ASRConfig",
+    "VADConfig",
     "SystemConfig",
     "ServerConfig",
+    "TracingConfig",
     # Loader
     "load_config",
     "get_config",
@@ -13,6 +13,8 @@ from typing import Optional
 from omegaconf import OmegaConf, DictConfig
 
 from .schema import AppConfig
+from xiaozhi_nexus.audio.resample import RESAMPLE_QUALITY_PRESETS
+from xiaozhi_nexus.observability.tracing import TRACE_FORMATS
 
 
 # 全局配置单例
@@ -134,6 +136,112 @@ def validate_config(config: AppConfig) -> list[str]:
     if config.asr.api_key is None and not config.openai.api_key:
         errors.append("asr.api_key 未配置且无法回退到 openai.api_key")
 
+    # 验证重采样质量预设
+    if config.tts.resample_quality not in RESAMPLE_QUALITY_PRESETS:
+        errors.append(
+            f"tts.resample_quality 必须为 {'/'.join(RESAMPLE_QUALITY_PRESETS)}: "
+            f"{config.tts.resample_quality}"
+        )
+
+    # 验证端点检测参数
+    if config.asr.endpoint_silence_ms <= 0:
+        errors.append(
+            f"asr.endpoint_silence_ms 必须为正数: {config.asr.endpoint_silence_ms}"
+        )
+
+    # 验证 Realtime 连接池参数
+    if config.asr.pool_max_connections < 0:
+        errors.append(
+            f"asr.pool_max_connections 不能为负数: {config.asr.pool_max_connections}"
+        )
+    if config.asr.pool_min_idle < 0:
+        errors.append(f"asr.pool_min_idle 不能为负数: {config.asr.pool_min_idle}")
+    if config.asr.pool_acquire_timeout_s < 0:
+        errors.append(
+            f"asr.pool_acquire_timeout_s 不能为负数: {config.asr.pool_acquire_timeout_s}"
+        )
+
+    # 验证播放调度参数
+    if config.tts.playout_burst_ms < 0:
+        errors.append(f"tts.playout_burst_ms 不能为负数: {config.tts.playout_burst_ms}")
+    if config.tts.playout_max_buffer_ms <= config.tts.playout_burst_ms:
+        errors.append(
+            "tts.playout_max_buffer_ms 必须大于 tts.playout_burst_ms: "
+            f"{config.tts.playout_max_buffer_ms}"
+        )
+
+    # 验证会话运行模式
+    if config.system.session_mode not in ("async", "thread"):
+        errors.append(
+            f"system.session_mode 必须为 async 或 thread: {config.system.session_mode}"
+        )
+
+    # 验证音频计算池
+    if config.system.audio_thread_workers < 0:
+        errors.append(
+            f"system.audio_thread_workers 不能为负数: {config.system.audio_thread_workers}"
+        )
+    if config.system.audio_process_workers < 0:
+        errors.append(
+            f"system.audio_process_workers 不能为负数: {config.system.audio_process_workers}"
+        )
+
+    # 验证下行音频队列溢出策略
+    if config.server.outgoing_audio_overflow not in ("drop_oldest", "drop_newest"):
+        errors.append(
+            "server.outgoing_audio_overflow 必须为 drop_oldest 或 drop_newest: "
+            f"{config.server.outgoing_audio_overflow}"
+        )
+
+    # 验证二进制协议版本
+    if config.server.max_binary_protocol_version not in (1, 2, 3):
+        errors.append(
+            "server.max_binary_protocol_version 必须为 1/2/3: "
+            f"{config.server.max_binary_protocol_version}"
+        )
+
+    # 验证多 worker 设置
+    if config.server.workers < 1:
+        errors.append(f"server.workers 必须 >= 1: {config.server.workers}")
+    if config.server.drain_timeout_s < 0:
+        errors.append(f"server.drain_timeout_s 不能为负数: {config.server.drain_timeout_s}")
+
+    # 验证准入控制阈值
+    admission = config.server.admission
+    for name in (
+        "max_sessions",
+        "max_loop_lag_ms",
+        "max_upstream_inflight",
+        "queue_timeout_s",
+        "max_queued",
+        "retry_after_s",
+    ):
+        value = getattr(admission, name)
+        if value < 0:
+            errors.append(f"server.admission.{name} 不能为负数: {value}")
+
+    # 验证事件循环监测配置
+    loop_monitor = config.server.loop_monitor
+    if loop_monitor.interval_ms <= 0:
+        errors.append(f"server.loop_monitor.interval_ms 必须 > 0: {loop_monitor.interval_ms}")
+    for name in ("stall_threshold_ms", "stack_log_interval_s"):
+        value = getattr(loop_monitor, name)
+        if value < 0:
+            errors.append(f"server.loop_monitor.{name} 不能为负数: {value}")
+
+    # 验证追踪配置
+    tracing = config.tracing
+    if not 0.0 <= tracing.sample_rate <= 1.0:
+        errors.append(f"tracing.sample_rate 必须在 0~1 之间: {tracing.sample_rate}")
+    if tracing.slow_turn_ms < 0:
+        errors.append(f"tracing.slow_turn_ms 不能为负数: {tracing.slow_turn_ms}")
+    if tracing.ring_size < 1:
+        errors.append(f"tracing.ring_size 必须 >= 1: {tracing.ring_size}")
+    if tracing.file_format not in TRACE_FORMATS:
+        errors.append(
+            f"tracing.file_format 必须为 {' / '.join(TRACE_FORMATS)}: {tracing.file_format}"
+        )
+
     # 验证 system prompt 文件路径
     if config.system.prompt_file:
         prompt_path = Path(config.system.prompt_file)
@@ -19,6 +19,11 @@ class OpenAIConfig:
     model: str = "gpt-4o"
     verify_ssl: bool = True
 
+    # HTTP 连接池配置（进程内按 base_url/api_key/verify_ssl 共享客户端，对 LLM/TTS/ASR 后端均生效）
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0  # 空闲长连接保持时间（秒）
+
 
 @dataclass
 class LLMConfig:
@@ -37,17 +42,29 @@ class TTSConfig:
     api_key: Optional[str] = None  # None 表示回退到 OpenAI 配置
     model: str = "fnlp/MOSS-TTSD-v0.5"
     voice: str = "fnlp/MOSS-TTSD-v0.5:anna"
-    response_format: str = "wav"
+    response_format: str = "wav"  # wav 或 pcm（裸 16-bit 小端单声道，无需容器）
+    pcm_sample_rate: int = 24000  # response_format 为 pcm 时服务端音频的采样率
     output_sample_rate: Optional[int] = None
     chunk_duration_ms: int = 100
     verify_ssl: bool = True
 
-    # 音频包发送延时（毫秒），用于控制发送速度接近实时播放，0 表示不延时
-    audio_send_delay_ms: float = 15.0
+    # 重采样质量预设: fast / medium / high（流式多相滤波，质量越高 CPU 开销越大）
+    resample_quality: str = "medium"
+
+    # 已废弃：音频改由播放调度器按截止时间发送，该值不再生效
+    audio_send_delay_ms: Optional[float] = None
+
+    # 播放调度：开始播放时立即发送的音频时长（填充设备抖动缓冲），之后按实时速度发送
+    playout_burst_ms: int = 240
+    # 每个会话待发送音频的上限，超过后暂停编码等待（背压）
+    playout_max_buffer_ms: int = 1000
 
     # 是否按标点符号分段进行 TTS 合成（分段可以加快首包响应，但可能影响语音连贯性）
     split_by_punctuation: bool = True
 
+    # 前瞻合成的句子数：当前句播放时最多并发合成后续 N 句，0 表示逐句串行合成
+    lookahead_sentences: int = 2
+
 
 @dataclass
 class ASRConfig:
@@ -59,6 +76,29 @@ class ASRConfig:
     sample_rate: int = 16000
     chunk_duration_ms: int = 100
     verify_ssl: bool = True
+    endpointing: bool = True  # 本地 VAD 端点检测：一句话结束即提交转录，不等待音频流结束
+    endpoint_silence_ms: int = 500  # 尾部静音达到该时长判定一句话结束
+    endpoint_min_speech_ms: int = 200  # 有效语音短于该时长时不提交（过滤短促噪声）
+
+    # Realtime 预热连接池（仅 async 会话模式生效）
+    pool_enabled: bool = True
+    pool_min_idle: int = 2  # 保持的预热空闲连接数
+    pool_max_connections: int = 0  # 进程内 Realtime 连接总数上限（含使用中的连接），0 表示不限制
+    pool_max_idle_s: float = 60.0  # 空闲连接最长保留时间（秒），超时后重建
+    pool_health_check_interval_s: float = 15.0  # 空闲连接健康检查间隔（秒）
+    pool_acquire_timeout_s: float = 10.0  # 连接数达到上限时等待可用名额的最长时间（秒）
+
+
+@dataclass
+class VADConfig:
+    """语音活动检测配置（用于用户打断）"""
+
+    energy_threshold_db: float = -45.0  # 绝对能量门限（dBFS），低于此值一律视为静音
+    snr_threshold_db: float = 10.0  # 帧能量需高于自适应噪声底的 dB 数
+    zcr_threshold: float = 0.35  # 过零率上限，高于此值视为噪声
+    noise_adapt_rate: float = 0.05  # 噪声底跟踪速率 (0~1)
+    speech_start_ms: int = 60  # 连续语音达到该时长才判定开始说话
+    hangover_ms: int = 300  # 连续静音达到该时长才判定停止说话
 
 
 @dataclass
@@ -75,6 +115,36 @@ class SystemConfig:
     # 是否允许用户打断（当用户开始新的语音输入时，中断当前的 LLM 生成和 TTS 播放）
     allow_interrupt: bool = True
 
+    # 会话运行模式: async（在服务端事件循环上以协程运行，默认）或 thread（每会话独立线程，回退方案）
+    session_mode: str = "async"
+
+    # 音频计算池：Opus 编解码、TTS 解码/重采样提交到线程池（0 表示在事件循环上内联执行）
+    audio_thread_workers: int = 4
+    # 大于 0 时 TTS 重采样改在独立进程池中执行
+    audio_process_workers: int = 0
+
+
+@dataclass
+class AdmissionConfig:
+    """新连接准入控制（超过任一阈值时新连接排队或被拒绝，0 表示不限制该项）"""
+
+    max_sessions: int = 0  # 每个 worker 的并发连接数上限
+    max_loop_lag_ms: float = 0.0  # 事件循环延迟（平滑值）上限
+    max_upstream_inflight: int = 0  # 进行中的上游 HTTP 请求（LLM/TTS）上限
+    queue_timeout_s: float = 0.0  # 超限时新连接排队等待的最长时间，0 表示直接拒绝
+    max_queued: int = 100  # 同时排队的连接数上限
+    retry_after_s: int = 5  # 拒绝时建议设备的重连等待时间（写入关闭原因）
+
+
+@dataclass
+class LoopMonitorConfig:
+    """事件循环监测（延迟探测与卡顿时的调用栈采样）"""
+
+    interval_ms: int = 100  # 延迟探测间隔
+    # 事件循环阻塞超过该时长时记录其线程调用栈，0 表示不采样
+    stall_threshold_ms: int = 500
+    stack_log_interval_s: float = 10.0  # 两次调用栈日志的最小间隔
+
 
 @dataclass
 class ServerConfig:
@@ -83,6 +153,37 @@ class ServerConfig:
     host: str = "127.0.0.1"
     port: int = 8000
 
+    # 每个连接的下行队列：控制消息优先发送，音频队列满时按策略丢弃
+    outgoing_audio_maxsize: int = 2000
+    outgoing_control_maxsize: int = 500
+    outgoing_audio_overflow: str = "drop_oldest"  # drop_oldest 或 drop_newest
+
+    # 允许协商的最高二进制协议版本（1: 裸 Opus；2/3: 带类型、时间戳/长度头部）
+    max_binary_protocol_version: int = 3
+
+    # worker 进程数：大于 1 时各 worker 以 SO_REUSEPORT 共享端口，连接由内核分配
+    workers: int = 1
+    # worker 退出（停止 / 滚动重启）前等待已有连接空闲关闭的最长时间
+    drain_timeout_s: float = 30.0
+
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    loop_monitor: LoopMonitorConfig = field(default_factory=LoopMonitorConfig)
+
+
+@dataclass
+class TracingConfig:
+    """单轮对话时间线追踪（span 树），用于排查个别慢轮次"""
+
+    sample_rate: float = 0.0  # 采样比例（0~1），0 表示关闭
+    # 大于 0 时所有轮次都记录，回复延迟超过该值（毫秒）的轮次即使未被采样也保留
+    slow_turn_ms: float = 0.0
+    ring_size: int = 200  # 每个 worker 内存中保留的最近轮次数
+    # 追加写入的追踪文件，None 表示只保存在内存中；路径中的 {pid} 替换为进程号（多 worker 时各写各的）
+    file: Optional[str] = None
+    file_format: str = "jsonl"  # jsonl（每轮一行）或 chrome（Chrome trace 事件格式）
+    # 是否开放 GET /debug/traces 调试接口
+    debug_endpoint: bool = False
+
 
 @dataclass
 class AppConfig:
@@ -92,5 +193,7 @@ class AppConfig:
     llm: LLMConfig = field(default_factory=LLMConfig)
     tts: TTSConfig = field(default_factory=TTSConfig)
     asr: ASRConfig = field(default_factory=ASRConfig)
+    vad: VADConfig = field(default_factory=VADConfig)
     system: SystemConfig = field(default_factory=SystemConfig)
     server: ServerConfig = field(default_factory=ServerConfig)
+    tracing: TracingConfig = field(default_factory=TracingConfig)
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Iterator, AsyncIterator, Optional, List, Dict
+from typing import Callable, Iterator, AsyncIterator, Optional, List, Dict
 
-import httpx
 from openai import OpenAI, AsyncOpenAI
 
+from xiaozhi_nexus.inferencers.clients import (
+    get_async_openai_client,
+    get_openai_client,
+)
+from xiaozhi_nexus.observability.latency import UpstreamTimer
+
 # pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
 
 
@@ -37,30 +42,20 @@ class OpenAIChatInferencer:
     # SSL 配置
     verify_ssl: bool = True
 
+    # 链路计时回调：发出请求时 "llm_request"，首个 token 到达时 "llm_first_token"，
+    # 响应结束时 "llm_done"
+    on_stage: Optional[Callable[[str], None]] = None
+
     # 内部状态
     _client: Optional[OpenAI] = field(default=None, init=False, repr=False)
     _async_client: Optional[AsyncOpenAI] = field(default=None, init=False, repr=False)
     _messages: List[Dict[str, str]] = field(default_factory=list, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        """初始化 OpenAI 客户端"""
-        http_client = None
-        async_http_client = None
-
-        if not self.verify_ssl:
-            http_client = httpx.Client(verify=False)
-            async_http_client = httpx.AsyncClient(verify=False)
-
-        self._client = OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            http_client=http_client,
-        )
-
-        self._async_client = AsyncOpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            http_client=async_http_client,
+        """获取进程级共享的 OpenAI 客户端（连接池在所有会话间复用）"""
+        self._client = get_openai_client(self.base_url, self.api_key, self.verify_ssl)
+        self._async_client = get_async_openai_client(
+            self.base_url, self.api_key, self.verify_ssl
         )
 
         # 初始化对话历史
@@ -92,6 +87,10 @@ class OpenAIChatInferencer:
         """重置对话历史"""
         self._messages = []
 
+    def _stage(self, stage: str) -> None:
+        if self.on_stage is not None:
+            self.on_stage(stage)
+
     def __call__(self, text: str) -> Iterator[str]:
         """
         同步流式 LLM 推理
@@ -106,6 +105,8 @@ class OpenAIChatInferencer:
             raise RuntimeError("Client not initialized")
 
         messages = self._build_messages(text)
+        self._stage("llm_request")
+        timer = UpstreamTimer("llm", self.model)
 
         # 调用 OpenAI Chat Completions API（流式）
         stream = self._client.chat.completions.create(
@@ -119,11 +120,19 @@ class OpenAIChatInferencer:
         # 收集完整响应用于历史记录
         full_response = ""
 
-        for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                yield content
+        try:
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    full_response += content
+                    if timer.first():
+                        self._stage("llm_first_token")
+                    yield content
+        finally:
+            # 提前结束（如被打断）时及时释放连接回连接池
+            stream.close()
+        timer.done()
+        self._stage("llm_done")
 
         # 更新对话历史
         self._messages.append({"role": "user", "content": text})
@@ -144,6 +153,8 @@ class OpenAIChatInferencer:
             raise RuntimeError("Async client not initialized")
 
         messages = self._build_messages(text)
+        self._stage("llm_request")
+        timer = UpstreamTimer("llm", self.model)
 
         # 调用 OpenAI Chat Completions API（异步流式）
         stream = await self._async_client.chat.completions.create(
@@ -157,11 +168,18 @@ class OpenAIChatInferencer:
         # 收集完整响应用于历史记录
         full_response = ""
 
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                yield content
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    full_response += content
+                    if timer.first():
+                        self._stage("llm_first_token")
+                    yield content
+        finally:
+            await stream.close()
+        timer.done()
+        self._stage("llm_done")
 
         # 更新对话历史
         self._messages.append({"role": "user", "content": text})
@@ -198,16 +216,9 @@ class OpenAIChatInferencerAsync:
     _messages: List[Dict[str, str]] = field(default_factory=list, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        """初始化异步 OpenAI 客户端"""
-        async_http_client = None
-
-        if not self.verify_ssl:
-            async_http_client = httpx.AsyncClient(verify=False)
-
-        self._client = AsyncOpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            http_client=async_http_client,
+        """获取进程级共享的异步 OpenAI 客户端"""
+        self._client = get_async_openai_client(
+            self.base_url, self.api_key, self.verify_ssl
         )
 
         self._messages = []
@@ -258,11 +269,14 @@ class OpenAIChatInferencerAsync:
 
         full_response = ""
 
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                yield content
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    content = chunk.choices[0].delta.content
+                    full_response += content
+                    yield content
+        finally:
+            await stream.close()
 
         self._messages.append({"role": "user", "content": text})
         self._messages.append({"role": "assistant", "content": full_response})
@@ -0,0 +1,218 @@
+"""
+进程级共享的 OpenAI 客户端注册表
+
+按 (base_url, api_key, verify_ssl) 复用 OpenAI/AsyncOpenAI 客户端及其底层 httpx 连接池，
+避免每个会话都新建连接池、重复 TCP+TLS 握手。推理器只保存对共享客户端的引用和各自的对话状态。
+
+所有经由共享客户端的 HTTP 请求（LLM / TTS）都计入进行中的上游请求数：从发出请求到响应体
+读完或关闭为止（流式响应在整个流期间都算进行中），供准入控制判断上游是否已饱和。
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from xiaozhi_nexus.observability import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+_ClientKey = Tuple[str, str, bool]
+
+
+@dataclass(frozen=True)
+class ClientPoolLimits:
+    """httpx 连接池限制（对每个共享客户端生效）"""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+
+    def to_httpx(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+
+class _InflightCounter:
+    """进行中的上游请求数（同步客户端在会话线程中使用，需加锁）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self) -> None:
+        with self._lock:
+            self.value += 1
+
+    def dec(self) -> None:
+        with self._lock:
+            self.value -= 1
+
+
+_inflight = _InflightCounter()
+
+REGISTRY.gauge(
+    "xiaozhi_upstream_inflight_requests",
+    "Upstream HTTP requests (LLM/TTS) in flight, including open response streams",
+    fn=lambda: _inflight.value,
+)
+
+
+def upstream_inflight() -> int:
+    """当前进程进行中的上游 HTTP 请求数"""
+    return _inflight.value
+
+
+class _CountedAsyncStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream) -> None:
+        self._stream = stream
+        self._done = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._done:
+                self._done = True
+                _inflight.dec()
+
+
+class _CountedSyncStream(httpx.SyncByteStream):
+    def __init__(self, stream: httpx.SyncByteStream) -> None:
+        self._stream = stream
+        self._done = False
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._done:
+                self._done = True
+                _inflight.dec()
+
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        _inflight.inc()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            _inflight.dec()
+            raise
+        response.stream = _CountedAsyncStream(response.stream)
+        return response
+
+
+class _CountingSyncTransport(httpx.HTTPTransport):
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        _inflight.inc()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            _inflight.dec()
+            raise
+        response.stream = _CountedSyncStream(response.stream)
+        return response
+
+
+_lock = threading.Lock()
+_limits = ClientPoolLimits()
+_clients: Dict[_ClientKey, OpenAI] = {}
+_async_clients: Dict[_ClientKey, AsyncOpenAI] = {}
+
+
+def configure_client_pool(limits: ClientPoolLimits) -> None:
+    """
+    设置连接池限制
+
+    只影响之后新建的客户端，应在服务启动、创建任何会话之前调用。
+    """
+    global _limits
+    with _lock:
+        _limits = limits
+
+
+def get_openai_client(base_url: str, api_key: str, verify_ssl: bool = True) -> OpenAI:
+    """获取共享的同步 OpenAI 客户端"""
+    key = (base_url, api_key, bool(verify_ssl))
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            http_client = httpx.Client(
+                transport=_CountingSyncTransport(
+                    verify=verify_ssl, limits=_limits.to_httpx()
+                )
+            )
+            client = OpenAI(base_url=base_url, api_key=api_key, http_client=http_client)
+            _clients[key] = client
+            logger.info(f"Created shared OpenAI client for {base_url}")
+        return client
+
+
+def _websocket_base_url(base_url: str) -> Optional[str]:
+    """
+    http:// 上游的 Realtime WebSocket 地址（ws://）
+
+    SDK 的 beta Realtime 接口总是把 base_url 换成 wss://，本地或内网的明文服务需显式指定。
+    """
+    if base_url.startswith("http://"):
+        return "ws://" + base_url[len("http://") :]
+    return None
+
+
+def get_async_openai_client(
+    base_url: str, api_key: str, verify_ssl: bool = True
+) -> AsyncOpenAI:
+    """
+    获取共享的异步 OpenAI 客户端
+
+    底层 httpx.AsyncClient 的连接绑定在首次使用它的事件循环上，
+    HTTP 请求只应在服务端主事件循环中发起（Realtime 的 WebSocket 连接不受此限制）。
+    """
+    key = (base_url, api_key, bool(verify_ssl))
+    with _lock:
+        client = _async_clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(
+                transport=_CountingAsyncTransport(
+                    verify=verify_ssl, limits=_limits.to_httpx()
+                )
+            )
+            client = AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                http_client=http_client,
+                websocket_base_url=_websocket_base_url(base_url),
+            )
+            _async_clients[key] = client
+            logger.info(f"Created shared AsyncOpenAI client for {base_url}")
+        return client
+
+
+async def aclose_clients() -> None:
+    """关闭并清空所有共享客户端（服务关闭时调用）"""
+    with _lock:
+        clients = list(_clients.values())
+        async_clients = list(_async_clients.values())
+        _clients.clear()
+        _async_clients.clear()
+
+    for client in clients:
+        client.close()
+    for async_client in async_clients:
+        await async_client.close()
@@ -4,10 +4,26 @@ from .inferencer import (
     StreamASRInferencer,
     AsyncStreamASRInferencer,
 )
+from .pool import (
+    RealtimeConnectionPool,
+    RealtimeLease,
+    RealtimePoolLimits,
+    RealtimeTarget,
+    aclose_realtime_pool,
+    configure_realtime_pool,
+    get_realtime_pool,
+)
 
 __all__ = [
     "OpenAIRealtimeASRInferencer",
     "OpenAIRealtimeASRInferencerAsync",
     "StreamASRInferencer",
     "AsyncStreamASRInferencer",
+    "RealtimeConnectionPool",
+    "RealtimeLease",
+    "RealtimePoolLimits",
+    "RealtimeTarget",
+    "aclose_realtime_pool",
+    "configure_realtime_pool",
+    "get_realtime_pool",
 ]
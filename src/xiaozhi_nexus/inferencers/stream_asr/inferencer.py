@@ -4,16 +4,126 @@ import ssl
 import base64
 import asyncio
 import threading
+import contextlib
 from queue import Queue, Empty
 from dataclasses import dataclass, field
-from typing import Iterator, AsyncIterator, Optional
+from typing import Any, Callable, Iterator, AsyncIterator, Optional, Set
 
 import numpy as np
 from openai import AsyncOpenAI
 from openai.resources.realtime.realtime import AsyncRealtimeConnection
 
+from xiaozhi_nexus.audio.vad import Endpointer
+from xiaozhi_nexus.inferencers.clients import get_async_openai_client
+from xiaozhi_nexus.inferencers.stream_asr.pool import (
+    RealtimeConnectionPool,
+    RealtimeTarget,
+)
+
 # pyright: reportUnknownMemberType=false, reportUnknownVariableType=false, reportUnknownArgumentType=false
 
+_DONE_EVENTS = (
+    "response.audio_transcript.done",
+    "response.text.done",
+    "response.done",
+)
+
+
+@dataclass
+class _ResponseTracker:
+    """同一连接上已请求/已完成的转录响应计数（本地端点检测时一个音频流对应多个响应）"""
+
+    requested: int = 0
+    sender_done: bool = False
+    completed: Set[str] = field(default_factory=set)
+    _anonymous: int = 0
+
+    def mark_done(self, event) -> None:
+        response_id = getattr(event, "response_id", None)
+        if response_id is None:
+            response_id = getattr(getattr(event, "response", None), "id", None)
+        if response_id is None:
+            # 没有 response_id 时无法把转录/文本的 .done 与 response.done 对应起来，
+            # 只按 response.done 计数，避免同一响应被算两次
+            if getattr(event, "type", None) != "response.done":
+                return
+            self._anonymous += 1
+            response_id = f"anonymous-{self._anonymous}"
+        self.completed.add(response_id)
+
+    @property
+    def finished(self) -> bool:
+        return self.sender_done and len(self.completed) >= self.requested
+
+
+def _as_pcm(chunk: Any) -> np.ndarray:
+    """
+    规范化输入音频块为一维数组
+
+    int16（ndarray 或 memoryview）原样返回视图，不做换算；其余按 [-1, 1] 的 float32 处理。
+    """
+    if isinstance(chunk, memoryview):
+        return np.frombuffer(chunk, dtype=np.int16)
+    arr = np.asarray(chunk)
+    if arr.dtype == np.int16:
+        return arr.reshape(-1)
+    return arr.astype(np.float32, copy=False).reshape(-1)
+
+
+class _PCM16Uploader:
+    """
+    音频上传缓冲
+
+    将任意长度的 int16（或 float32）帧合并写入预分配的 int16 缓冲区，凑满 chunk_size 个采样点
+    才做一次 base64 编码并发送一条 input_audio_buffer.append；提交前 flush() 发出不足一块的剩余样本。
+    发送不做人为限速，积压后的追赶速度只受网络限制。
+    """
+
+    def __init__(self, connection: AsyncRealtimeConnection, chunk_size: int) -> None:
+        self._connection = connection
+        size = max(1, int(chunk_size))
+        self._buf = np.empty(size, dtype=np.int16)
+        self._scratch = np.empty(size, dtype=np.float32)
+        self._fill = 0
+
+    @property
+    def pending(self) -> bool:
+        """缓冲区中是否有尚未发送的样本"""
+        return self._fill > 0
+
+    async def push(self, pcm: np.ndarray) -> None:
+        size = self._buf.shape[0]
+        offset = 0
+        total = pcm.shape[0]
+        is_int16 = pcm.dtype == np.int16
+        while offset < total:
+            n = min(size - self._fill, total - offset)
+            if is_int16:
+                # 解码器输出的 int16 直接拷入缓冲区
+                self._buf[self._fill : self._fill + n] = pcm[offset : offset + n]
+            else:
+                # float32 [-1.0, 1.0] 转换为 int16，直接写入缓冲区
+                scratch = self._scratch[:n]
+                np.multiply(pcm[offset : offset + n], 32767.0, out=scratch)
+                np.clip(scratch, -32768, 32767, out=scratch)
+                self._buf[self._fill : self._fill + n] = scratch
+            self._fill += n
+            offset += n
+            if self._fill == size:
+                await self._send()
+
+    async def flush(self) -> None:
+        if self._fill:
+            await self._send()
+
+    async def _send(self) -> None:
+        audio_base64 = base64.b64encode(memoryview(self._buf[: self._fill])).decode("ascii")
+        self._fill = 0
+        await self._connection.send({
+            "type": "input_audio_buffer.append",
+            "audio": audio_base64,
+        })
+
 
 @dataclass
 class OpenAIRealtimeASRInferencer:
@@ -21,7 +131,7 @@ class OpenAIRealtimeASRInferencer:
     基于 OpenAI Realtime API 的流式 ASR 推理器
 
     接口设计参考 stubs/asr.py:
-    - input: iterator of PCM float32 (mono)
+    - input: iterator of PCM int16 or float32 (mono)
     - output: iterator of incremental transcripts
 
     支持同步 (__call__) 和异步 (astream) 两种调用方式
@@ -36,94 +146,181 @@ class OpenAIRealtimeASRInferencer:
     sample_rate: int = 16000
     chunk_duration_ms: int = 100  # 每个块的时长（毫秒）
 
+    # 本地端点检测：检测到一句话结束即提交并请求转录，None 表示仅在音频流结束时提交
+    endpointer_factory: Optional[Callable[[], Endpointer]] = None
+
+    # 链路计时回调：建立连接 "asr_connect" / "asr_connected"，开始说话 "speech_start"，
+    # 提交一句话的音频时 "speech_end"，之后首个转录增量 "asr_first_delta"，转录完成 "asr_final"
+    on_stage: Optional[Callable[[str], None]] = None
+
     # SSL 配置
     verify_ssl: bool = True
 
+    # 预热连接池（仅能在连接池所属的事件循环中使用，其他情况回退为现场建连）
+    connection_pool: Optional[RealtimeConnectionPool] = None
+
     # 内部状态
     _client: Optional[AsyncOpenAI] = field(default=None, init=False, repr=False)
     _ssl_context: Optional[ssl.SSLContext] = field(default=None, init=False, repr=False)
 
     def __post_init__(self):
-        """初始化 OpenAI 客户端和 SSL 上下文"""
-        self._client = AsyncOpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
+        """获取共享的 OpenAI 客户端并初始化 SSL 上下文"""
+        self._client = get_async_openai_client(
+            self.base_url, self.api_key, self.verify_ssl
         )
 
-        if not self.verify_ssl:
+        # http:// 上游走明文 ws://，websockets 不接受 ssl 参数
+        if not self.verify_ssl and not self.base_url.startswith("http://"):
             self._ssl_context = ssl.create_default_context()
             self._ssl_context.check_hostname = False
             self._ssl_context.verify_mode = ssl.CERT_NONE
 
+    @property
+    def target(self) -> RealtimeTarget:
+        """连接池中对应的连接目标"""
+        return RealtimeTarget(
+            base_url=self.base_url,
+            api_key=self.api_key,
+            model=self.model,
+            verify_ssl=self.verify_ssl,
+        )
+
+    @contextlib.asynccontextmanager
+    async def _connect(self) -> AsyncIterator[AsyncRealtimeConnection]:
+        """建立 Realtime 连接：优先从连接池租用预热连接"""
+        self._stage("asr_connect")
+        pool = self.connection_pool
+        if pool is not None and pool.usable():
+            lease = await pool.acquire(self.target)
+            self._stage("asr_connected")
+            try:
+                yield lease.connection
+            finally:
+                await lease.release()
+            return
+
+        assert self._client is not None
+        websocket_options = {}
+        if self._ssl_context is not None:
+            websocket_options["ssl"] = self._ssl_context
+
+        async with self._client.beta.realtime.connect(
+            model=self.model,
+            websocket_connection_options=websocket_options,
+        ) as connection:
+            self._stage("asr_connected")
+            yield connection
+
     @property
     def chunk_size(self) -> int:
         """每个块的采样点数"""
         return int(self.sample_rate * self.chunk_duration_ms / 1000)
 
-    def _float32_to_pcm16(self, audio_float32: np.ndarray) -> bytes:
-        """将 float32 音频数据转换为 PCM16 字节"""
-        # float32 范围 [-1.0, 1.0] 转换为 int16 范围 [-32768, 32767]
-        audio_int16 = np.clip(audio_float32 * 32767, -32768, 32767).astype(np.int16)
-        return audio_int16.tobytes()
-
-    def _pcm16_to_base64(self, pcm16_data: bytes) -> str:
-        """将 PCM16 字节转换为 base64 编码"""
-        return base64.b64encode(pcm16_data).decode("utf-8")
+    def _stage(self, stage: str) -> None:
+        if self.on_stage is not None:
+            self.on_stage(stage)
 
     async def _send_audio_stream(
         self,
         connection: AsyncRealtimeConnection,
         audio_iter: AsyncIterator[np.ndarray],
+        tracker: Optional[_ResponseTracker] = None,
     ):
-        """异步发送音频流到 OpenAI Realtime API"""
-        # 启动流式转录
-        await connection.send({"type": "response.create", "response": {}})
-
-        async for chunk in audio_iter:
-            chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
-            if chunk.size == 0:
-                continue
-
-            # 转换为 PCM16 并编码
-            pcm16_data = self._float32_to_pcm16(chunk)
-            audio_base64 = self._pcm16_to_base64(pcm16_data)
-
-            await connection.send({
-                "type": "input_audio_buffer.append",
-                "audio": audio_base64,
-            })
+        """
+        异步发送音频流到 OpenAI Realtime API
 
-            # 小延迟模拟实时音频流，避免发送过快
-            await asyncio.sleep(0.01)
+        启用本地端点检测时，每检测到一句话结束（尾部静音足够长且语音足够长）
+        就在同一连接上提交音频缓冲区并请求一次新的转录，无需等待音频流结束。
+        """
+        endpointer = self.endpointer_factory() if self.endpointer_factory else None
+        uploader = _PCM16Uploader(connection, self.chunk_size)
 
-        # 发送结束标记
-        await connection.send({"type": "input_audio_buffer.commit"})
+        # 启动流式转录
+        await connection.send({"type": "response.create", "response": {}})
+        if tracker is not None:
+            tracker.requested += 1
+
+        # 自上次提交以来是否追加过音频
+        has_pending_audio = False
+        try:
+            async for chunk in audio_iter:
+                chunk = _as_pcm(chunk)
+                if chunk.size == 0:
+                    continue
+                if endpointer is None and not has_pending_audio:
+                    # 无端点检测时以一句话的第一块音频作为开始说话
+                    self._stage("speech_start")
+                has_pending_audio = True
+
+                # 合并为 chunk_duration_ms 的块后再编码发送
+                await uploader.push(chunk)
+
+                if endpointer is None:
+                    continue
+                was_speaking = endpointer.speaking
+                ended = endpointer.process(chunk)
+                if endpointer.speaking and not was_speaking:
+                    self._stage("speech_start")
+                if ended:
+                    # 一句话结束：发出缓冲区剩余样本，提交并请求转录
+                    self._stage("speech_end")
+                    await uploader.flush()
+                    await connection.send({"type": "input_audio_buffer.commit"})
+                    await connection.send({"type": "response.create", "response": {}})
+                    has_pending_audio = False
+                    if tracker is not None:
+                        tracker.requested += 1
+
+            if endpointer is not None and not has_pending_audio:
+                # 最后一句已在端点处提交，不再提交空缓冲区，也不等待最后这次空响应
+                if tracker is not None:
+                    tracker.requested -= 1
+                    tracker.sender_done = True
+                    if tracker.finished:
+                        # 所有响应都已完成，接收端不会再收到事件，关闭连接使其结束
+                        await connection.close()
+                return
+
+            # 发送剩余样本和结束标记
+            self._stage("speech_end")
+            await uploader.flush()
+            await connection.send({"type": "input_audio_buffer.commit"})
+        finally:
+            if tracker is not None:
+                tracker.sender_done = True
 
     async def _receive_transcripts(
         self,
         connection: AsyncRealtimeConnection,
+        tracker: Optional[_ResponseTracker] = None,
     ) -> AsyncIterator[str]:
-        """异步接收转录结果"""
+        """
+        异步接收转录结果
+
+        未启用端点检测时，首个响应完成即结束；启用时持续接收，
+        直到音频流已结束且所有已请求的响应都已完成。
+        """
         async for event in connection:
             event_type = event.type
 
             if event_type == "response.audio_transcript.delta":
                 # 每次返回独立的文本块
+                self._stage("asr_first_delta")
                 yield event.delta
 
-            elif event_type == "response.audio_transcript.done":
-                # 转录完成
-                break
-
             elif event_type == "response.text.delta":
                 # 文本响应（备用）
+                self._stage("asr_first_delta")
                 yield event.delta
 
-            elif event_type == "response.text.done":
-                break
-
-            elif event_type == "response.done":
-                break
+            elif event_type in _DONE_EVENTS:
+                # 转录完成
+                self._stage("asr_final")
+                if tracker is None:
+                    break
+                tracker.mark_done(event)
+                if tracker.finished:
+                    break
 
             elif event_type == "error":
                 raise RuntimeError(f"OpenAI Realtime API error: {event}")
@@ -133,7 +330,7 @@ class OpenAIRealtimeASRInferencer:
         异步流式 ASR 推理
 
         Args:
-            audio_iter: 异步音频数据迭代器，每个元素为 float32 numpy 数组
+            audio_iter: 异步音频数据迭代器，每个元素为 int16 或 float32 numpy 数组
 
         Yields:
             增量转录文本（累积形式）
@@ -141,22 +338,17 @@ class OpenAIRealtimeASRInferencer:
         if self._client is None:
             raise RuntimeError("Client not initialized")
 
-        websocket_options = {}
-        if self._ssl_context is not None:
-            websocket_options["ssl"] = self._ssl_context
+        async with self._connect() as connection:
+            tracker = _ResponseTracker() if self.endpointer_factory else None
 
-        async with self._client.beta.realtime.connect(
-            model=self.model,
-            websocket_connection_options=websocket_options,
-        ) as connection:
             # 创建发送任务
             send_task = asyncio.create_task(
-                self._send_audio_stream(connection, audio_iter)
+                self._send_audio_stream(connection, audio_iter, tracker)
             )
 
             try:
                 # 接收并 yield 转录结果
-                async for transcript in self._receive_transcripts(connection):
+                async for transcript in self._receive_transcripts(connection, tracker):
                     yield transcript
             finally:
                 send_task.cancel()
@@ -170,7 +362,7 @@ class OpenAIRealtimeASRInferencer:
         同步流式 ASR 推理（兼容 stubs/asr.py 接口）
 
         Args:
-            audio_iter: 同步音频数据迭代器，每个元素为 float32 numpy 数组
+            audio_iter: 同步音频数据迭代器，每个元素为 int16 或 float32 numpy 数组
 
         Yields:
             增量转录文本（累积形式）
@@ -203,7 +395,7 @@ class OpenAIRealtimeASRInferencer:
                 loop.close()
 
         # 启动异步处理线程
-        thread = threading.Thread(target=_run_async, daemon=True)
+        thread = threading.Thread(target=_run_async, name="asr-realtime", daemon=True)
         thread.start()
 
         # 从队列中读取结果
@@ -236,6 +428,7 @@ class OpenAIRealtimeASRInferencerAsync:
 
     # 音频配置
     sample_rate: int = 16000
+    chunk_duration_ms: int = 100  # 每个块的时长（毫秒）
 
     # SSL 配置
     verify_ssl: bool = True
@@ -245,20 +438,20 @@ class OpenAIRealtimeASRInferencerAsync:
     _ssl_context: Optional[ssl.SSLContext] = field(default=None, init=False, repr=False)
 
     def __post_init__(self):
-        self._client = AsyncOpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
+        self._client = get_async_openai_client(
+            self.base_url, self.api_key, self.verify_ssl
         )
 
-        if not self.verify_ssl:
+        # http:// 上游走明文 ws://，websockets 不接受 ssl 参数
+        if not self.verify_ssl and not self.base_url.startswith("http://"):
             self._ssl_context = ssl.create_default_context()
             self._ssl_context.check_hostname = False
             self._ssl_context.verify_mode = ssl.CERT_NONE
 
-    def _float32_to_pcm16_base64(self, audio_float32: np.ndarray) -> str:
-        """将 float32 音频转换为 base64 编码的 PCM16"""
-        audio_int16 = np.clip(audio_float32 * 32767, -32768, 32767).astype(np.int16)
-        return base64.b64encode(audio_int16.tobytes()).decode("utf-8")
+    @property
+    def chunk_size(self) -> int:
+        """每个块的采样点数"""
+        return int(self.sample_rate * self.chunk_duration_ms / 1000)
 
     async def transcribe(
         self,
@@ -268,7 +461,7 @@ class OpenAIRealtimeASRInferencerAsync:
         流式转录音频
 
         Args:
-            audio_iter: 异步音频迭代器，float32 格式
+            audio_iter: 异步音频迭代器，int16 或 float32 格式
 
         Yields:
             转录文本块（每次返回独立的文本块）
@@ -290,16 +483,13 @@ class OpenAIRealtimeASRInferencerAsync:
             audio_done = asyncio.Event()
 
             async def send_audio():
+                uploader = _PCM16Uploader(connection, self.chunk_size)
                 async for chunk in audio_iter:
-                    chunk = np.asarray(chunk, dtype=np.float32).reshape(-1)
+                    chunk = _as_pcm(chunk)
                     if chunk.size == 0:
                         continue
-                    audio_base64 = self._float32_to_pcm16_base64(chunk)
-                    await connection.send({
-                        "type": "input_audio_buffer.append",
-                        "audio": audio_base64,
-                    })
-                    await asyncio.sleep(0.01)
+                    await uploader.push(chunk)
+                await uploader.flush()
                 await connection.send({"type": "input_audio_buffer.commit"})
                 audio_done.set()
 
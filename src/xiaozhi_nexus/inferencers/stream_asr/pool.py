@@ -0,0 +1,388 @@
+"""
+预热的 Realtime 连接池
+
+每个 ASR 运行都需要一条 Realtime WebSocket 连接，新建连接要经历 TCP+TLS 握手和会话初始化，
+这部分耗时会直接计入首个转录结果的延迟。连接池按 (base_url, api_key, verify_ssl, model)
+在后台维持若干条空闲的预热连接，会话在 listen start 时租用一条，用完归还。
+
+Realtime 连接带有会话状态（对话条目、音频缓冲区），为避免不同设备之间串话，
+归还的连接不会再次租出，而是直接关闭，由后台任务补足预热数量。
+
+连接池绑定在首次使用它的事件循环上，只能在服务端主事件循环中使用（异步会话模式）。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import ssl
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Optional, Set
+
+from openai.resources.realtime.realtime import AsyncRealtimeConnection
+
+from xiaozhi_nexus.inferencers.clients import get_async_openai_client
+
+# pyright: reportUnknownMemberType=false, reportUnknownVariableType=false, reportUnknownArgumentType=false
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RealtimeTarget:
+    """连接池的键：同一目标的连接可以互相替代"""
+
+    base_url: str
+    api_key: str
+    model: str
+    verify_ssl: bool = True
+
+    def websocket_options(self) -> Dict[str, Any]:
+        # http:// 上游走明文 ws://，websockets 不接受 ssl 参数
+        if self.verify_ssl or self.base_url.startswith("http://"):
+            return {}
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        return {"ssl": ssl_context}
+
+
+@dataclass(frozen=True)
+class RealtimePoolLimits:
+    """Realtime 连接池限制"""
+
+    min_idle: int = 2  # 每个目标保持的预热空闲连接数
+    max_connections: int = 0  # 进程内 Realtime 连接总数上限（含已租出的连接），0 表示不限制
+    max_idle_s: float = 60.0  # 空闲连接的最长保留时间，超时后关闭并重新预热
+    health_check_interval_s: float = 15.0  # 健康检查（ping）间隔
+    acquire_timeout_s: float = 10.0  # 达到上限时等待可用名额的最长时间
+
+
+@dataclass
+class _IdleConnection:
+    connection: AsyncRealtimeConnection
+    idle_since: float
+
+
+@dataclass
+class RealtimeLease:
+    """一次租用；release() 关闭连接并归还名额"""
+
+    pool: "RealtimeConnectionPool"
+    target: RealtimeTarget
+    connection: AsyncRealtimeConnection
+    _released: bool = field(default=False, init=False, repr=False)
+
+    async def release(self) -> None:
+        if self._released:
+            return
+        self._released = True
+        await self.pool._release(self)
+
+
+async def _close_quietly(connection: AsyncRealtimeConnection) -> None:
+    try:
+        await connection.close()
+    except Exception:
+        pass
+
+
+def _is_open(connection: AsyncRealtimeConnection) -> bool:
+    ws = connection._connection
+    return getattr(ws, "close_code", None) is None
+
+
+class RealtimeConnectionPool:
+    """
+    按目标分组的预热 Realtime 连接池
+
+    - acquire(): 优先取出空闲连接（跳过已断开的），没有则现场建连
+    - 后台维护任务：按 health_check_interval_s 对空闲连接发 ping，关闭超过 max_idle_s 的连接，
+      并把每个已登记目标的空闲连接补足到 min_idle
+    - max_connections 大于 0 时限制进程内连接总数；达到上限时优先关闭其他目标的空闲连接腾出名额，
+      在 acquire_timeout_s 内仍无名额则抛出 RuntimeError
+    """
+
+    def __init__(self, limits: Optional[RealtimePoolLimits] = None) -> None:
+        self.limits = limits or RealtimePoolLimits()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Dict[RealtimeTarget, Deque[_IdleConnection]] = {}
+        self._targets: Set[RealtimeTarget] = set()
+        self._leased = 0
+        self._connecting = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._refill_tasks: Set[asyncio.Task] = set()
+        # 每个目标最多一个补足任务，避免并发补足各自按同一个空闲数判断而超出 min_idle
+        self._refilling: Dict[RealtimeTarget, asyncio.Task] = {}
+        self._closed = False
+
+    # ---- 统计 ----
+
+    @property
+    def idle_count(self) -> int:
+        return sum(len(q) for q in self._idle.values())
+
+    @property
+    def leased_count(self) -> int:
+        return self._leased
+
+    @property
+    def total_count(self) -> int:
+        return self.idle_count + self._leased + self._connecting
+
+    @property
+    def at_capacity(self) -> bool:
+        limit = self.limits.max_connections
+        return limit > 0 and self.total_count >= limit
+
+    def usable(self) -> bool:
+        """当前事件循环能否使用该连接池（连接不能跨事件循环使用）"""
+        if self._closed:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        return self._loop is None or self._loop is loop
+
+    # ---- 公共接口 ----
+
+    def prewarm(self, target: RealtimeTarget) -> None:
+        """登记目标并开始在后台预热连接（需在事件循环中调用）"""
+        self._bind()
+        self._targets.add(target)
+        self._schedule_refill(target)
+
+    async def acquire(self, target: RealtimeTarget) -> RealtimeLease:
+        """租用一条连接；空闲连接不足时现场建连"""
+        self._bind()
+        assert self._cond is not None
+        self._targets.add(target)
+        deadline = time.monotonic() + self.limits.acquire_timeout_s
+
+        while True:
+            connection = self._pop_idle(target)
+            if connection is not None:
+                self._leased += 1
+                self._schedule_refill(target)
+                return RealtimeLease(pool=self, target=target, connection=connection)
+
+            async with self._cond:
+                if self.at_capacity:
+                    if not self._evict_one_idle():
+                        remaining = deadline - time.monotonic()
+                        try:
+                            if remaining <= 0:
+                                raise asyncio.TimeoutError
+                            await asyncio.wait_for(self._cond.wait(), remaining)
+                        except asyncio.TimeoutError:
+                            raise RuntimeError(
+                                "Realtime connection pool exhausted "
+                                f"({self.limits.max_connections} connections)"
+                            ) from None
+                        continue
+                self._connecting += 1
+
+            try:
+                connection = await self._connect(target)
+            finally:
+                self._connecting -= 1
+            self._leased += 1
+            self._schedule_refill(target)
+            return RealtimeLease(pool=self, target=target, connection=connection)
+
+    async def aclose(self) -> None:
+        """关闭所有空闲连接并停止后台任务（服务关闭时调用）"""
+        self._closed = True
+        tasks = list(self._refill_tasks)
+        if self._maintenance_task is not None:
+            tasks.append(self._maintenance_task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._refill_tasks.clear()
+        self._refilling.clear()
+        self._maintenance_task = None
+
+        idle = [item for q in self._idle.values() for item in q]
+        self._idle.clear()
+        await asyncio.gather(
+            *(_close_quietly(item.connection) for item in idle), return_exceptions=True
+        )
+
+    # ---- 内部实现 ----
+
+    def _bind(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+            self._cond = asyncio.Condition()
+            self._maintenance_task = loop.create_task(self._maintain())
+        elif self._loop is not loop:
+            raise RuntimeError("RealtimeConnectionPool used from a different event loop")
+
+    async def _connect(self, target: RealtimeTarget) -> AsyncRealtimeConnection:
+        client = get_async_openai_client(
+            target.base_url, target.api_key, target.verify_ssl
+        )
+        manager = client.beta.realtime.connect(
+            model=target.model,
+            websocket_connection_options=target.websocket_options(),
+        )
+        return await manager.enter()
+
+    def _pop_idle(self, target: RealtimeTarget) -> Optional[AsyncRealtimeConnection]:
+        queue = self._idle.get(target)
+        while queue:
+            # 取最新预热的连接（LIFO），最旧的留给维护任务按 max_idle_s 回收
+            item = queue.pop()
+            if _is_open(item.connection):
+                return item.connection
+            self._spawn(_close_quietly(item.connection))
+        return None
+
+    def _evict_one_idle(self) -> bool:
+        """关闭一条最旧的空闲连接以腾出名额"""
+        oldest: Optional[Deque[_IdleConnection]] = None
+        for queue in self._idle.values():
+            if queue and (oldest is None or queue[0].idle_since < oldest[0].idle_since):
+                oldest = queue
+        if oldest is None:
+            return False
+        item = oldest.popleft()
+        self._spawn(_close_quietly(item.connection))
+        return True
+
+    async def _release(self, lease: RealtimeLease) -> None:
+        # 连接上残留上一个会话的对话状态，不再复用
+        self._leased -= 1
+        await _close_quietly(lease.connection)
+        await self._notify()
+        if not self._closed:
+            self._schedule_refill(lease.target)
+
+    async def _notify(self) -> None:
+        if self._cond is None:
+            return
+        async with self._cond:
+            self._cond.notify_all()
+
+    def _spawn(self, coro) -> None:
+        assert self._loop is not None
+        task = self._loop.create_task(coro)
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    def _schedule_refill(self, target: RealtimeTarget) -> None:
+        if self._closed or self.limits.min_idle <= 0:
+            return
+        running = self._refilling.get(target)
+        if running is not None and not running.done():
+            # 进行中的补足任务每建一条连接都会重新检查数量
+            return
+        assert self._loop is not None
+        task = self._loop.create_task(self._refill(target))
+        self._refilling[target] = task
+        self._refill_tasks.add(task)
+        task.add_done_callback(self._refill_tasks.discard)
+
+    async def _refill(self, target: RealtimeTarget) -> None:
+        """把目标的空闲连接补足到 min_idle（受 max_connections 限制）"""
+        queue = self._idle.setdefault(target, deque())
+        while (
+            not self._closed
+            and len(queue) < self.limits.min_idle
+            and not self.at_capacity
+        ):
+            self._connecting += 1
+            try:
+                connection = await self._connect(target)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Realtime prewarm failed for {target.model}: {e}")
+                return
+            finally:
+                self._connecting -= 1
+            if self._closed:
+                await _close_quietly(connection)
+                return
+            queue.append(_IdleConnection(connection, time.monotonic()))
+            await self._notify()
+
+    async def _maintain(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.limits.health_check_interval_s)
+            try:
+                await self._check_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Realtime pool maintenance failed")
+
+    async def _check_idle(self) -> None:
+        """
+        回收过期或已断开的空闲连接，并发 ping 其余连接
+
+        检查期间连接留在队列中，acquire() 仍可租用，也仍计入 total_count；
+        ping 失败时若连接仍在队列中（未被租出）才移除并关闭。
+        """
+        now = time.monotonic()
+        checks = []
+        for queue in list(self._idle.values()):
+            for item in list(queue):
+                if now - item.idle_since > self.limits.max_idle_s or not _is_open(
+                    item.connection
+                ):
+                    queue.remove(item)
+                    self._spawn(_close_quietly(item.connection))
+                else:
+                    checks.append((queue, item))
+
+        results = await asyncio.gather(*(self._ping(item.connection) for _, item in checks))
+        for (queue, item), alive in zip(checks, results):
+            if not alive and item in queue:
+                queue.remove(item)
+                self._spawn(_close_quietly(item.connection))
+
+        for target in self._targets:
+            self._schedule_refill(target)
+        await self._notify()
+
+    async def _ping(self, connection: AsyncRealtimeConnection) -> bool:
+        try:
+            pong = await connection._connection.ping()
+            await asyncio.wait_for(pong, timeout=5.0)
+            return True
+        except Exception:
+            return False
+
+
+_pool: Optional[RealtimeConnectionPool] = None
+_limits = RealtimePoolLimits()
+
+
+def configure_realtime_pool(limits: RealtimePoolLimits) -> None:
+    """设置连接池限制，应在服务启动、创建任何会话之前调用"""
+    global _limits, _pool
+    _limits = limits
+    _pool = None
+
+
+def get_realtime_pool() -> RealtimeConnectionPool:
+    """获取进程级共享的 Realtime 连接池"""
+    global _pool
+    if _pool is None:
+        _pool = RealtimeConnectionPool(_limits)
+    return _pool
+
+
+async def aclose_realtime_pool() -> None:
+    """关闭进程级连接池（服务关闭时调用）"""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.aclose()
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
-import io
-import wave
+import time
 from dataclasses import dataclass, field
-from typing import Iterator, Optional
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
 
 import numpy as np
-import httpx
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from xiaozhi_nexus.audio.executor import AudioLane, get_audio_executor
+from xiaozhi_nexus.audio.resample import StreamingResampler, process_detached
+from xiaozhi_nexus.audio.wav import PCMChunker, StreamingWavDecoder
+
+from xiaozhi_nexus.inferencers.clients import (
+    get_async_openai_client,
+    get_openai_client,
+)
+from xiaozhi_nexus.observability.latency import UpstreamTimer
 
 # pyright: reportUnknownMemberType=false, reportUnknownVariableType=false
 
@@ -20,6 +28,8 @@ class OpenAITTSInferencer:
     接口设计:
     - input: str (要合成的文本)
     - output: Iterator[np.ndarray] (float32 PCM 音频片段)
+
+    支持同步 (synthesize) 和异步 (asynthesize) 两种调用方式
     """
 
     # OpenAI 配置
@@ -27,33 +37,39 @@ class OpenAITTSInferencer:
     api_key: str = "no-key"
     model: str = "fnlp/MOSS-TTSD-v0.5"
     voice: str = "fnlp/MOSS-TTSD-v0.5:anna"
-    response_format: str = "wav"
+    response_format: str = "wav"  # wav 或 pcm（裸 16-bit 小端单声道）
+    pcm_sample_rate: int = 24000  # response_format 为 pcm 时服务端音频的采样率
 
     # 音频输出配置
     output_sample_rate: Optional[int] = None
     chunk_duration_ms: int = 100
+    resample_quality: str = "medium"  # 重采样质量预设: fast / medium / high
 
     # SSL 配置
     verify_ssl: bool = True
 
+    # 链路计时回调：每次请求收到首个音频字节时 "tts_first_byte"
+    on_stage: Optional[Callable[[str], None]] = None
+    # 轮次追踪回调：每次合成结束时以 (name, start, end, parent, **attrs) 上报 "tts.synthesize"
+    on_span: Optional[Callable[..., None]] = None
+
     # 内部状态
     _client: Optional[OpenAI] = field(default=None, init=False, repr=False)
+    _async_client: Optional[AsyncOpenAI] = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        http_client = None
-        if not self.verify_ssl:
-            http_client = httpx.Client(verify=False)
-
-        self._client = OpenAI(
-            base_url=self.base_url,
-            api_key=self.api_key,
-            http_client=http_client,
+        self._client = get_openai_client(self.base_url, self.api_key, self.verify_ssl)
+        self._async_client = get_async_openai_client(
+            self.base_url, self.api_key, self.verify_ssl
         )
 
     def synthesize(self, text: str) -> Iterator[np.ndarray]:
         """
         同步 TTS 推理
 
+        边下载边解码：每收到一段响应字节即解析并产出已完整的音频块，
+        首包延迟不再等于整句合成时间。
+
         Args:
             text: 要合成的文本
 
@@ -66,86 +82,192 @@ class OpenAITTSInferencer:
         if not text:
             return
 
-        if self.response_format.lower() != "wav":
-            raise ValueError("Only wav response_format is supported")
+        stream = _SynthesisStream(self)
+        timer = UpstreamTimer("tts", self.model)
+        try:
+            with self._client.audio.speech.with_streaming_response.create(
+                model=self.model,
+                voice=self.voice,
+                input=str(text),
+                response_format=self.response_format.lower(),
+            ) as response:
+                for data in response.iter_bytes():
+                    if timer.first():
+                        stream.first_byte_at = time.perf_counter()
+                        self._first_byte()
+                    yield from stream.feed(data)
+            timer.done()
 
-        with self._client.audio.speech.with_streaming_response.create(
-            model=self.model,
-            voice=self.voice,
-            input=str(text),
-            response_format=self.response_format,
-        ) as response:
-            wav_bytes = b"".join(response.iter_bytes())
+            yield from stream.finish()
+            stream.completed = True
+        finally:
+            self._report_span(stream, text)
 
-        pcm, sample_rate = self._decode_wav_bytes(wav_bytes)
+    async def asynthesize(self, text: str) -> AsyncIterator[np.ndarray]:
+        """
+        异步 TTS 推理
 
-        target_rate = self.output_sample_rate or sample_rate
-        if target_rate != sample_rate:
-            pcm = self._resample_audio(pcm, sample_rate, target_rate)
-            sample_rate = target_rate
-
-        for chunk in self._chunk_audio(pcm, sample_rate):
-            yield chunk
-
-    def _decode_wav_bytes(self, data: bytes) -> tuple[np.ndarray, int]:
-        with wave.open(io.BytesIO(data), "rb") as wf:
-            channels = wf.getnchannels()
-            sample_rate = wf.getframerate()
-            sample_width = wf.getsampwidth()
-            frames = wf.readframes(wf.getnframes())
-
-        pcm = self._pcm_bytes_to_float32(frames, sample_width)
-        if channels > 1:
-            pcm = pcm.reshape(-1, channels).mean(axis=1)
-
-        return pcm.astype(np.float32), int(sample_rate)
-
-    def _pcm_bytes_to_float32(self, data: bytes, sample_width: int) -> np.ndarray:
-        if sample_width == 1:
-            pcm_u8 = np.frombuffer(data, dtype=np.uint8)
-            return (pcm_u8.astype(np.float32) - 128.0) / 128.0
-        if sample_width == 2:
-            pcm_i16 = np.frombuffer(data, dtype="<i2")
-            return pcm_i16.astype(np.float32) / 32768.0
-        if sample_width == 3:
-            raw = np.frombuffer(data, dtype=np.uint8)
-            if raw.size % 3:
-                raw = raw[: raw.size - (raw.size % 3)]
-            raw = raw.reshape(-1, 3)
-            pcm_i32 = (
-                raw[:, 0].astype(np.int32)
-                | (raw[:, 1].astype(np.int32) << 8)
-                | (raw[:, 2].astype(np.int32) << 16)
-            )
-            sign_bit = 1 << 23
-            pcm_i32 = (pcm_i32 ^ sign_bit) - sign_bit
-            return pcm_i32.astype(np.float32) / float(1 << 23)
-        if sample_width == 4:
-            pcm_i32 = np.frombuffer(data, dtype="<i4")
-            return pcm_i32.astype(np.float32) / float(1 << 31)
-        raise ValueError(f"Unsupported sample width: {sample_width}")
-
-    def _resample_audio(
-        self, audio: np.ndarray, orig_sr: int, target_sr: int
-    ) -> np.ndarray:
-        if audio.size == 0:
-            return audio.astype(np.float32)
-        import librosa
-
-        resampled = librosa.resample(
-            audio.astype(np.float32), orig_sr=orig_sr, target_sr=target_sr
-        )
-        return resampled.astype(np.float32)
+        Args:
+            text: 要合成的文本
+
+        Yields:
+            float32 PCM 片段（单声道）
+        """
+        if self._async_client is None:
+            raise RuntimeError("Async client not initialized")
 
-    def _chunk_audio(self, audio: np.ndarray, sample_rate: int) -> Iterator[np.ndarray]:
-        if audio.size == 0:
+        if not text:
             return
-        chunk_size = int(sample_rate * (self.chunk_duration_ms / 1000.0))
-        if chunk_size <= 0:
-            yield audio.astype(np.float32)
+
+        # 解码与重采样在音频计算池中按顺序执行，不占用事件循环
+        stream = _SynthesisStream(self, lane=get_audio_executor().lane("thread"))
+        timer = UpstreamTimer("tts", self.model)
+        try:
+            async with self._async_client.audio.speech.with_streaming_response.create(
+                model=self.model,
+                voice=self.voice,
+                input=str(text),
+                response_format=self.response_format.lower(),
+            ) as response:
+                async for data in response.iter_bytes():
+                    if timer.first():
+                        stream.first_byte_at = time.perf_counter()
+                        self._first_byte()
+                    for chunk in await stream.afeed(data):
+                        yield chunk
+            timer.done()
+
+            for chunk in await stream.afinish():
+                yield chunk
+            stream.completed = True
+        finally:
+            self._report_span(stream, text)
+
+    def _first_byte(self) -> None:
+        if self.on_stage is not None:
+            self.on_stage("tts_first_byte")
+
+    def _report_span(self, stream: "_SynthesisStream", text: str) -> None:
+        if self.on_span is None:
             return
-        for idx in range(0, int(audio.shape[0]), chunk_size):
-            yield audio[idx : idx + chunk_size].astype(np.float32)
+        attrs: Dict[str, Any] = {
+            "chars": len(text),
+            "bytes": stream.bytes_in,
+            "resample_ms": round(stream.resample_s * 1000.0, 3),
+        }
+        if stream.first_byte_at is not None:
+            attrs["first_byte_ms"] = round((stream.first_byte_at - stream.started_at) * 1000.0, 3)
+        if not stream.completed:
+            # 被打断或请求失败
+            attrs["incomplete"] = True
+        self.on_span(
+            "tts.synthesize", stream.started_at, time.perf_counter(), "tts", **attrs
+        )
+
+    def _create_decoder(self) -> StreamingWavDecoder:
+        fmt = self.response_format.lower()
+        if fmt not in ("wav", "pcm"):
+            raise ValueError("Only wav/pcm response_format is supported")
+        if fmt == "pcm":
+            return StreamingWavDecoder(raw=True, sample_rate=self.pcm_sample_rate)
+        return StreamingWavDecoder()
+
+
+class _SynthesisStream:
+    """
+    单次合成的流式处理状态：字节 → float32 样本 →（流式重采样）→ 固定时长的音频块
+
+    异步接口（afeed/afinish）把解码提交到 lane，重采样提交到计算池的重采样 lane
+    （配置了进程池时在子进程中执行，重采样器随任务往返）。
+    同时累计输入字节数和重采样耗时（异步时含排队时间），供轮次追踪使用。
+    """
+
+    def __init__(
+        self, inferencer: OpenAITTSInferencer, lane: Optional[AudioLane] = None
+    ) -> None:
+        self._inferencer = inferencer
+        self._decoder = inferencer._create_decoder()
+        self._resampler: Optional[StreamingResampler] = None
+        self._chunker: Optional[PCMChunker] = None
+        self._lane = lane
+        self._resample_lane: Optional[AudioLane] = None
+        if lane is not None:
+            executor = get_audio_executor()
+            self._resample_lane = executor.lane(executor.resample_kind)
+        self.started_at = time.perf_counter()
+        self.first_byte_at: Optional[float] = None
+        self.bytes_in = 0
+        self.resample_s = 0.0
+        self.completed = False
+
+    def _setup(self) -> None:
+        """音频格式确定后创建重采样器与分块器"""
+        sample_rate = self._decoder.sample_rate
+        assert sample_rate is not None
+        target_rate = int(self._inferencer.output_sample_rate or sample_rate)
+        if target_rate != sample_rate:
+            self._resampler = StreamingResampler(
+                sample_rate, target_rate, self._inferencer.resample_quality
+            )
+        chunk_size = int(target_rate * (self._inferencer.chunk_duration_ms / 1000.0))
+        self._chunker = PCMChunker(chunk_size)
+
+    def feed(self, data: bytes) -> List[np.ndarray]:
+        self.bytes_in += len(data)
+        pcm = self._decoder.feed(data)
+        if pcm.size == 0:
+            return []
+        if self._chunker is None:
+            self._setup()
+        assert self._chunker is not None
+        if self._resampler is not None:
+            start = time.perf_counter()
+            pcm = self._resampler.process(pcm)
+            self.resample_s += time.perf_counter() - start
+        return self._chunker.push(pcm)
+
+    def finish(self) -> List[np.ndarray]:
+        if self._chunker is None:
+            return []
+        chunks: List[np.ndarray] = []
+        if self._resampler is not None:
+            start = time.perf_counter()
+            tail = self._resampler.flush()
+            self.resample_s += time.perf_counter() - start
+            chunks.extend(self._chunker.push(tail))
+        chunks.extend(self._chunker.flush())
+        return chunks
+
+    async def afeed(self, data: bytes) -> List[np.ndarray]:
+        assert self._lane is not None and self._resample_lane is not None
+        self.bytes_in += len(data)
+        pcm = await self._lane.run(self._decoder.feed, data)
+        if pcm.size == 0:
+            return []
+        if self._chunker is None:
+            self._setup()
+        assert self._chunker is not None
+        if self._resampler is not None:
+            pcm = await self._resample(pcm)
+        return self._chunker.push(pcm)
+
+    async def afinish(self) -> List[np.ndarray]:
+        if self._chunker is None:
+            return []
+        chunks: List[np.ndarray] = []
+        if self._resampler is not None:
+            chunks.extend(self._chunker.push(await self._resample(None)))
+        chunks.extend(self._chunker.flush())
+        return chunks
+
+    async def _resample(self, pcm: Optional[np.ndarray]) -> np.ndarray:
+        assert self._resampler is not None and self._resample_lane is not None
+        start = time.perf_counter()
+        self._resampler, out = await self._resample_lane.run(
+            process_detached, self._resampler, pcm
+        )
+        self.resample_s += time.perf_counter() - start
+        return out
 
 
 TTSInferencer = OpenAITTSInferencer
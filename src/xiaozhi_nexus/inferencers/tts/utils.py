@@ -70,3 +70,55 @@ def split_text_by_punctuation(text: str) -> List[str]:
         sentences.append(current)
 
     return sentences
+
+
+class StreamingSentenceSplitter:
+    """
+    增量式标点切句器
+
+    与 split_text_by_punctuation 的切分规则一致，但输入为 LLM 的流式文本块：
+    每当句末标点到达（且其后已有后续文本，确认连续标点已结束）时立即吐出该句，
+    剩余不完整的文本留在缓冲区，最后由 flush() 输出。
+    """
+
+    _pattern = re.compile(r"[。？！；.?!;]+")
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> List[str]:
+        """
+        输入一个文本块
+
+        Args:
+            chunk: LLM 流式输出的增量文本
+
+        Returns:
+            本次已完整的句子列表（可能为空）
+        """
+        if not chunk:
+            return []
+        self._buffer += chunk
+
+        sentences: List[str] = []
+        start = 0
+        for match in self._pattern.finditer(self._buffer):
+            # 标点位于缓冲区末尾时可能还有后续标点（如 "..." 被拆到两个块中），暂不切分
+            if match.end() == len(self._buffer):
+                break
+            sentence = self._buffer[start : match.end()]
+            if sentence.strip():
+                sentences.append(sentence)
+            start = match.end()
+
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """输出缓冲区中剩余的文本（流结束时调用）"""
+        rest, self._buffer = self._buffer, ""
+        return split_text_by_punctuation(rest)
+
+    def reset(self) -> None:
+        """丢弃缓冲区内容"""
+        self._buffer = ""
@@ -0,0 +1,35 @@
+from xiaozhi_nexus.observability.metrics import (
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    merge_snapshots,
+    render_snapshots,
+)
+from xiaozhi_nexus.observability.loop import (
+    LoopLagMonitor,
+    call_soon_threadsafe,
+    configure_loop_monitor,
+    get_loop_monitor,
+)
+from xiaozhi_nexus.observability.multiprocess import render_metrics
+from xiaozhi_nexus.observability.tracing import Tracer, TurnTrace, get_tracer
+
+__all__ = [
+    "REGISTRY",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "LoopLagMonitor",
+    "MetricsRegistry",
+    "Tracer",
+    "TurnTrace",
+    "call_soon_threadsafe",
+    "configure_loop_monitor",
+    "get_loop_monitor",
+    "get_tracer",
+    "merge_snapshots",
+    "render_metrics",
+    "render_snapshots",
+]
@@ -0,0 +1,211 @@
+"""
+对话链路延迟
+
+每个会话一个 TurnTimer：以用户一句话说完（ASR 提交音频）为起点，记录本轮各固定阶段
+第一次到达的耗时，按阶段和负责该阶段的模型导出到直方图 xiaozhi_turn_stage_seconds：
+
+    speech_end → asr_first_delta → asr_final → llm_first_token → llm_done
+               → tts_first_byte → first_packet_sent → last_packet_sent
+
+各推理器通过 on_stage 回调上报自己负责的阶段，音频包的发出时刻由播放队列回调。
+仅用于追踪的阶段（如 llm_request、tts_start、turn_end）不计入直方图。
+另外 LLM / TTS 每次请求自身的首包和总耗时记录在 xiaozhi_upstream_* 直方图中，
+用于区分是上游慢还是排队慢。每次记录只有一次加锁和一次直方图累加，可在生产环境常开。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from xiaozhi_nexus.observability.metrics import REGISTRY
+from xiaozhi_nexus.observability.tracing import Tracer, TurnTrace
+
+SPEECH_END = "speech_end"
+TURN_END = "turn_end"
+SPEECH_START = "speech_start"
+# 只在会话开始时出现一次的阶段，计入下一轮的追踪
+_PRE_TURN_STAGES = ("asr_connect", "asr_connected")
+
+# 阶段 → 负责该阶段的组件
+TURN_STAGES: Dict[str, str] = {
+    "asr_first_delta": "asr",
+    "asr_final": "asr",
+    "llm_first_token": "llm",
+    "llm_done": "llm",
+    "tts_first_byte": "tts",
+    "first_packet_sent": "tts",
+    "last_packet_sent": "tts",
+}
+
+_TURN_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0)
+
+_turn_stage_seconds = REGISTRY.histogram(
+    "xiaozhi_turn_stage_seconds",
+    "Time from end of user speech to each stage of the reply",
+    labelnames=("stage", "model"),
+    buckets=_TURN_BUCKETS,
+)
+_upstream_first_byte_seconds = REGISTRY.histogram(
+    "xiaozhi_upstream_first_byte_seconds",
+    "Upstream request time to first token (LLM) or first audio byte (TTS)",
+    labelnames=("backend", "model"),
+)
+_upstream_request_seconds = REGISTRY.histogram(
+    "xiaozhi_upstream_request_seconds",
+    "Upstream request time until the response stream ends",
+    labelnames=("backend", "model"),
+    buckets=_TURN_BUCKETS,
+)
+
+
+class TurnTimer:
+    """
+    单个会话的轮次计时（可在事件循环、会话线程和 TTS 合成线程中调用）
+
+    配置了 tracer 时同时记录被采样轮次的时间线（见 observability.tracing）：
+    连接阶段（asr_connect / asr_connected）之后的第一个阶段开启一轮追踪，turn_end 结束。
+    回复期间用户又开始说话（speech_start）属于下一轮，暂存到下一轮开启时再记录。
+
+    Args:
+        models: 组件（asr / llm / tts）→ 模型名，作为直方图的 model 标签
+        tracer: 轮次追踪收集器，None 表示不追踪
+        device_id/session_id: 追踪记录中的设备与会话标识
+    """
+
+    def __init__(
+        self,
+        models: Optional[Dict[str, str]] = None,
+        tracer: Optional[Tracer] = None,
+        device_id: str = "",
+        session_id: str = "",
+    ) -> None:
+        self.models = dict(models or {})
+        self.device_id = device_id
+        self.session_id = session_id
+        self._tracer = tracer if tracer is not None and tracer.enabled else None
+        self._lock = threading.Lock()
+        self._start: Optional[float] = None
+        self._seen: Set[str] = set()
+        self._trace: Optional[TurnTrace] = None
+        self._trace_decided = False  # 本轮是否已做过采样决定（未采样时不再重复决定）
+        self._pending: Dict[str, float] = {}  # 属于下一轮、尚未开启追踪的阶段
+        self._replying = False  # 已过 speech_end、尚未 turn_end
+
+    @property
+    def tracing(self) -> bool:
+        """当前轮次是否在追踪（调用方据此跳过仅用于追踪的计算）"""
+        return self._trace is not None
+
+    def mark(self, stage: str) -> None:
+        """记录阶段到达；speech_end 开始新的一轮，其他阶段每轮只记录第一次"""
+        now = time.perf_counter()
+        finished: Optional[TurnTrace] = None
+        with self._lock:
+            if self._tracer is not None:
+                finished = self._trace_mark(stage, now)
+            if stage == SPEECH_END:
+                self._start = now
+                self._seen.clear()
+                stage = ""
+            elif self._start is None or stage in self._seen or stage not in TURN_STAGES:
+                stage = ""
+            else:
+                self._seen.add(stage)
+                elapsed = now - self._start
+        if finished is not None and self._tracer is not None:
+            self._tracer.finish(finished)
+        if stage:
+            _turn_stage_seconds.observe(
+                elapsed, stage=stage, model=self.models.get(TURN_STAGES[stage], "")
+            )
+
+    def span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        parent: Optional[str] = None,
+        **attrs: Any,
+    ) -> None:
+        """向当前追踪轮次添加一个 span（时间为 time.perf_counter() 秒）"""
+        if self._trace is None:
+            return
+        with self._lock:
+            if self._trace is not None:
+                self._trace.add_span(name, start, end, parent, **attrs)
+
+    def event(self, name: str, **attrs: Any) -> None:
+        """向当前追踪轮次添加一个瞬时事件（如 interrupt）"""
+        if self._trace is None:
+            return
+        now = time.perf_counter()
+        with self._lock:
+            if self._trace is not None:
+                self._trace.add_event(name, now, **attrs)
+
+    def _trace_mark(self, stage: str, now: float) -> Optional[TurnTrace]:
+        """更新追踪状态，返回需要结束的轮次（在锁外交给 tracer）"""
+        assert self._tracer is not None
+        if stage in _PRE_TURN_STAGES or (stage == SPEECH_START and self._replying):
+            if stage in _PRE_TURN_STAGES and self._trace is not None:
+                self._trace.mark(stage, now)
+            else:
+                self._pending.setdefault(stage, now)
+            return None
+        if stage == SPEECH_END:
+            self._replying = True
+        elif stage == TURN_END:
+            self._replying = False
+
+        finished: Optional[TurnTrace] = None
+        if stage == TURN_END or (
+            stage == SPEECH_END and self._trace is not None and self._trace.has(SPEECH_END)
+        ):
+            # 本轮结束；上一轮还没结束就又说完一句话（打断）时同样结束上一轮
+            finished, self._trace = self._trace, None
+            self._trace_decided = False
+            if stage == TURN_END:
+                return finished
+
+        if not self._trace_decided:
+            self._trace_decided = True
+            self._trace = self._tracer.begin(self.device_id, self.session_id)
+            if self._trace is not None and self._pending:
+                origin = min(self._pending.values())
+                self._trace.wall_time -= self._trace.origin - origin
+                self._trace.origin = origin
+                for pending_stage, at in self._pending.items():
+                    self._trace.mark(pending_stage, at)
+            self._pending.clear()
+        if self._trace is not None:
+            self._trace.mark(stage, now)
+        return finished
+
+
+class UpstreamTimer:
+    """一次上游请求（LLM / TTS）的首包与总耗时"""
+
+    __slots__ = ("backend", "model", "_start", "_first")
+
+    def __init__(self, backend: str, model: str) -> None:
+        self.backend = backend
+        self.model = model
+        self._start = time.perf_counter()
+        self._first = False
+
+    def first(self) -> bool:
+        """标记首个结果到达；返回是否为本次请求的第一次"""
+        if self._first:
+            return False
+        self._first = True
+        _upstream_first_byte_seconds.observe(
+            time.perf_counter() - self._start, backend=self.backend, model=self.model
+        )
+        return True
+
+    def done(self) -> None:
+        _upstream_request_seconds.observe(
+            time.perf_counter() - self._start, backend=self.backend, model=self.model
+        )
@@ -0,0 +1,234 @@
+"""
+事件循环延迟与线程监测
+
+后台任务每隔 interval_s 睡眠一次，实际醒来时间比预期晚的部分即为事件循环延迟：
+所有会话、收发和上游请求共用一个事件循环，延迟升高说明循环已被占满（CPU 饱和或有阻塞调用）。
+
+延迟只能在循环恢复后才测得，看不出是谁占住了循环。设置 stall_threshold_s 时另起一个
+看门狗线程：探测任务超过阈值仍未醒来，就抓取事件循环线程当前的调用栈写入日志。
+
+另外导出：
+
+- 其他线程经 call_soon_threadsafe 投递到事件循环的回调数（线程模式会话的每条下行消息、
+  音频计算池完成通知等都会占用一次循环调度）
+- 按用途分组的存活线程数（会话线程、TTS 合成线程、音频计算池等）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+from xiaozhi_nexus.observability.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# 线程名前缀 → 分组（线程由各模块按这些前缀命名）
+THREAD_KINDS: Dict[str, str] = {
+    "session-": "session",
+    "tts-": "tts",
+    "asr-": "asr",
+    "audio": "audio",
+}
+
+_lag_seconds = REGISTRY.histogram(
+    "xiaozhi_event_loop_lag_probe_seconds",
+    "Event loop scheduling lag measured by each probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+_stalls = REGISTRY.counter(
+    "xiaozhi_event_loop_stalls_total",
+    "Times the event loop was blocked longer than the stall threshold",
+)
+_threadsafe_calls = REGISTRY.counter(
+    "xiaozhi_event_loop_threadsafe_callbacks_total",
+    "Callbacks scheduled onto the event loop from other threads",
+)
+_threads = REGISTRY.gauge(
+    "xiaozhi_threads",
+    "Live threads by purpose",
+    labelnames=("kind",),
+)
+
+
+def call_soon_threadsafe(
+    loop: asyncio.AbstractEventLoop, fn: Callable[..., Any], *args: Any
+) -> None:
+    """loop.call_soon_threadsafe 并计数（事件循环已关闭时抛出 RuntimeError，与原方法一致）"""
+    _threadsafe_calls.inc()
+    loop.call_soon_threadsafe(fn, *args)
+
+
+def thread_counts() -> Dict[str, int]:
+    """按用途分组的存活线程数"""
+    counts = {kind: 0 for kind in THREAD_KINDS.values()}
+    counts["other"] = 0
+    for thread in threading.enumerate():
+        for prefix, kind in THREAD_KINDS.items():
+            if thread.name.startswith(prefix):
+                counts[kind] += 1
+                break
+        else:
+            counts["other"] += 1
+    return counts
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟探针
+
+    Args:
+        interval_s: 探测间隔
+        smoothing: 平滑系数（0~1），越大越偏向最近一次测量
+        stall_threshold_s: 事件循环阻塞超过该时长时记录其调用栈，0 表示不启用看门狗
+        stack_log_interval_s: 两次调用栈日志的最小间隔（持续卡顿时避免刷屏）
+    """
+
+    def __init__(
+        self,
+        interval_s: float = 0.1,
+        smoothing: float = 0.3,
+        stall_threshold_s: float = 0.0,
+        stack_log_interval_s: float = 10.0,
+    ) -> None:
+        self.interval_s = interval_s
+        self.smoothing = smoothing
+        self.stall_threshold_s = stall_threshold_s
+        self.stack_log_interval_s = stack_log_interval_s
+        self.last_lag_s = 0.0
+        self.lag_s = 0.0  # 平滑后的延迟
+        self.max_lag_s = 0.0
+        self.stalls = 0
+        self.threadsafe_rate = 0.0  # 最近一秒左右的跨线程回调速率（次/秒）
+        self._task: Optional[asyncio.Task[None]] = None
+        self._loop_thread_id: Optional[int] = None
+        # 探测任务最近一次醒来的时刻（time.monotonic()），看门狗据此判断循环是否卡住
+        self._heartbeat = 0.0
+        self._watchdog: Optional[threading.Thread] = None
+        self._watchdog_stop = threading.Event()
+        self._last_stack_log = 0.0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._heartbeat = time.monotonic()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        if self.stall_threshold_s > 0 and self._watchdog is None:
+            self._watchdog_stop.clear()
+            self._watchdog = threading.Thread(
+                target=self._watch, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        watchdog, self._watchdog = self._watchdog, None
+        if watchdog is not None:
+            self._watchdog_stop.set()
+            watchdog.join(timeout=1.0)
+        task, self._task = self._task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    def record(self, lag_s: float) -> None:
+        lag_s = max(0.0, lag_s)
+        self.last_lag_s = lag_s
+        self.max_lag_s = max(self.max_lag_s, lag_s)
+        self.lag_s += self.smoothing * (lag_s - self.lag_s)
+        _lag_seconds.observe(lag_s)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        rate_start = loop.time()
+        rate_calls = _threadsafe_calls.value()
+        while True:
+            expected = loop.time() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            now = loop.time()
+            self._heartbeat = time.monotonic()
+            self.record(now - expected)
+            if now - rate_start >= 1.0:
+                # 约每秒一次：更新跨线程回调速率和线程数
+                calls = _threadsafe_calls.value()
+                self.threadsafe_rate = (calls - rate_calls) / (now - rate_start)
+                rate_start, rate_calls = now, calls
+                for kind, count in thread_counts().items():
+                    _threads.set(count, kind=kind)
+
+    def _watch(self) -> None:
+        """看门狗线程：探测任务迟迟不醒时抓取事件循环线程的调用栈（每次卡顿只记录一次）"""
+        check_s = max(0.01, min(self.stall_threshold_s / 4, 0.05))
+        reported = 0.0  # 已记录过的卡顿对应的心跳
+        while not self._watchdog_stop.wait(check_s):
+            heartbeat = self._heartbeat
+            stalled_s = time.monotonic() - heartbeat - self.interval_s
+            if stalled_s < self.stall_threshold_s or heartbeat == reported:
+                continue
+            reported = heartbeat
+            self.stalls += 1
+            _stalls.inc()
+            now = time.monotonic()
+            if now - self._last_stack_log < self.stack_log_interval_s:
+                continue
+            self._last_stack_log = now
+            self._log_stack(stalled_s)
+
+    def _log_stack(self, stalled_s: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        logger.warning(
+            f"Event loop blocked for {stalled_s * 1000:.0f} ms "
+            f"(threadsafe callbacks {self.threadsafe_rate:.0f}/s, threads {thread_counts()}), "
+            f"loop thread stack:\n{stack}"
+        )
+
+
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def configure_loop_monitor(
+    interval_s: float = 0.1,
+    stall_threshold_s: float = 0.0,
+    stack_log_interval_s: float = 10.0,
+) -> LoopLagMonitor:
+    """按配置创建当前进程的事件循环探针（服务启动时调用，之后在事件循环中 start()）"""
+    global _monitor
+    _monitor = LoopLagMonitor(
+        interval_s=interval_s,
+        stall_threshold_s=stall_threshold_s,
+        stack_log_interval_s=stack_log_interval_s,
+    )
+    return _monitor
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """获取当前进程的事件循环延迟探针（需在事件循环中 start()）"""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
+
+
+REGISTRY.gauge(
+    "xiaozhi_event_loop_lag_seconds",
+    "Smoothed event loop scheduling lag",
+    fn=lambda: _monitor.lag_s if _monitor is not None else 0.0,
+    merge="max",
+)
+REGISTRY.gauge(
+    "xiaozhi_event_loop_threadsafe_callbacks_per_second",
+    "Recent rate of callbacks scheduled onto the event loop from other threads",
+    fn=lambda: _monitor.threadsafe_rate if _monitor is not None else 0.0,
+    merge="max",
+)
@@ -0,0 +1,348 @@
+"""
+进程内指标注册表
+
+提供计数器（Counter）、仪表（Gauge）和直方图（Histogram），可按标签区分，
+并以 Prometheus 文本格式导出。指标对象线程安全，可在事件循环和会话线程中直接更新。
+
+多 worker 部署时每个进程各自维护注册表，snapshot() 导出可 JSON 序列化的快照，
+render_snapshots() 把多个进程的快照按指标名和标签求和后统一导出。
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_LabelValues = Tuple[str, ...]
+_LabelPairs = Tuple[Tuple[str, str], ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: _LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(value)}"' for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_pairs(pairs: _LabelPairs) -> str:
+    return _format_labels(tuple(k for k, _ in pairs), tuple(v for _, v in pairs))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[_LabelValues, float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> _LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self) -> List[Tuple[str, _LabelValues, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def labeled_samples(self) -> List[Tuple[str, _LabelPairs, float]]:
+        """所有样本：(样本名, ((标签名, 标签值), ...), 值)"""
+        return [
+            (name, tuple(zip(self.labelnames, key)), value)
+            for name, key, value in self.samples()
+        ]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        for name, pairs, value in self.labeled_samples():
+            lines.append(f"{name}{_format_pairs(pairs)} {_format_value(value)}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Any]:
+        """可 JSON 序列化的快照"""
+        return {
+            "name": self.name,
+            "type": self.type_name,
+            "help": self.help,
+            "samples": [
+                [name, [list(pair) for pair in pairs], value]
+                for name, pairs, value in self.labeled_samples()
+            ],
+        }
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+
+GAUGE_MERGE_MODES = ("sum", "max")
+
+
+class Gauge(_Metric):
+    """
+    仪表：可直接 set/inc/dec，也可绑定一个采集时调用的函数
+
+    绑定函数的仪表没有标签，采集时返回函数的当前值（用于队列深度等由对象自身维护的状态）。
+
+    merge 决定多 worker 汇总时的合并方式：sum（连接数、进行中请求数等总量）或
+    max（事件循环延迟等每个进程各自的状态，求和没有意义，取最差的一个）。
+    """
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+        merge: str = "sum",
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        if fn is not None and self.labelnames:
+            raise ValueError("Function gauges cannot have labels")
+        if merge not in GAUGE_MERGE_MODES:
+            raise ValueError(f"Unknown gauge merge mode: {merge}")
+        self._fn = fn
+        self.merge = merge
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["merge"] = self.merge
+        return snapshot
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        if self._fn is not None:
+            return float(self._fn())
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, _LabelValues, float]]:
+        if self._fn is not None:
+            return [(self.name, (), float(self._fn()))]
+        return super().samples()
+
+
+# 默认桶（秒），覆盖从几毫秒到十秒的对话链路延迟
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0,
+)
+
+
+class Histogram(_Metric):
+    """
+    直方图：按桶累计观测值的分布，导出 _bucket / _sum / _count 样本
+
+    observe() 只做一次二分查找和加锁累加，可在每轮对话的热路径上常开。
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        if not self.buckets:
+            raise ValueError("Histogram needs at least one bucket")
+        # 每组标签：[各桶计数（非累计，最后一个为 +Inf）..., 总和]
+        self._data: Dict[_LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [0.0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+
+    def count(self, **labels: str) -> float:
+        with self._lock:
+            data = self._data.get(self._key(labels))
+            return sum(data[:-1]) if data else 0.0
+
+    def labeled_samples(self) -> List[Tuple[str, _LabelPairs, float]]:
+        with self._lock:
+            items = [(key, list(data)) for key, data in self._data.items()]
+        samples: List[Tuple[str, _LabelPairs, float]] = []
+        bounds = [_format_value(b) for b in self.buckets] + ["+Inf"]
+        for key, data in items:
+            pairs = tuple(zip(self.labelnames, key))
+            cumulative = 0.0
+            for bound, count in zip(bounds, data[:-1]):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", pairs + (("le", bound),), cumulative))
+            samples.append((f"{self.name}_sum", pairs, data[-1]))
+            samples.append((f"{self.name}_count", pairs, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """指标注册表；同名指标重复注册时返回已有对象"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"Metric {metric.name} already registered as {existing.type_name}")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        metric = self._register(Counter(name, help, labelnames))
+        assert isinstance(metric, Counter)
+        return metric
+
+    def gauge(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        fn: Optional[Callable[[], float]] = None,
+        merge: str = "sum",
+    ) -> Gauge:
+        metric = self._register(Gauge(name, help, labelnames, fn, merge))
+        assert isinstance(metric, Gauge)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = self._register(Histogram(name, help, labelnames, buckets))
+        assert isinstance(metric, Histogram)
+        return metric
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        lines: List[str] = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """导出所有指标的快照（供其他进程合并）"""
+        return [metric.snapshot() for metric in self.metrics()]
+
+
+def merge_snapshots(snapshots: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    合并多个进程的指标快照，结果仍为快照格式
+
+    同名指标中标签完全相同的样本按进程累加（计数器、直方图的各桶、merge=sum 的仪表），
+    merge=max 的仪表取各进程中的最大值。
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for metric in snapshot:
+            entry = merged.setdefault(
+                metric["name"],
+                {
+                    "type": metric["type"],
+                    "help": metric["help"],
+                    "merge": metric.get("merge"),
+                    "samples": {},
+                },
+            )
+            samples: Dict[Tuple[str, _LabelPairs], float] = entry["samples"]
+            use_max = metric.get("merge") == "max"
+            for name, pairs, value in metric["samples"]:
+                key = (name, tuple((str(k), str(v)) for k, v in pairs))
+                if key not in samples:
+                    samples[key] = float(value)
+                elif use_max:
+                    samples[key] = max(samples[key], float(value))
+                else:
+                    samples[key] += float(value)
+
+    result: List[Dict[str, Any]] = []
+    for name, entry in merged.items():
+        metric = {
+            "name": name,
+            "type": entry["type"],
+            "help": entry["help"],
+            "samples": [
+                [sample_name, [list(pair) for pair in pairs], value]
+                for (sample_name, pairs), value in entry["samples"].items()
+            ],
+        }
+        if entry["merge"] is not None:
+            metric["merge"] = entry["merge"]
+        result.append(metric)
+    return result
+
+
+def render_snapshots(snapshots: Iterable[List[Dict[str, Any]]]) -> str:
+    """合并多个进程的指标快照（见 merge_snapshots）并导出 Prometheus 文本格式"""
+    lines: List[str] = []
+    for metric in merge_snapshots(snapshots):
+        lines.append(f"# HELP {metric['name']} {metric['help']}")
+        lines.append(f"# TYPE {metric['name']} {metric['type']}")
+        for sample_name, pairs, value in metric["samples"]:
+            pairs = tuple((k, v) for k, v in pairs)
+            lines.append(f"{sample_name}{_format_pairs(pairs)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# 进程级默认注册表
+REGISTRY = MetricsRegistry()
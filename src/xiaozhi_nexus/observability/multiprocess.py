@@ -0,0 +1,129 @@
+"""
+多 worker 指标聚合
+
+设置了环境变量 XIAOZHI_METRICS_DIR 时（由 serve --workers 的主进程设置），每个 worker
+定期把自己的指标快照写入该目录下的 worker-<pid>.json；任意 worker 处理 /metrics 时
+合并自身的实时指标和其他 worker 的最新快照，抓取方看到的是整个服务的汇总值。
+
+worker 退出后由主进程把它最后的计数器和直方图累加进 retired.json（仪表是瞬时值，直接丢弃），
+汇总的 _total / _bucket 在滚动重启时保持单调，不会被 Prometheus 当成计数器重置。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from xiaozhi_nexus.observability.metrics import REGISTRY, merge_snapshots, render_snapshots
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR_ENV = "XIAOZHI_METRICS_DIR"
+
+_SNAPSHOT_PREFIX = "worker-"
+_RETIRED_FILE = "retired.json"
+# 退出后仍需累计的指标类型；仪表反映的是进程当前状态，进程退出后不再计入
+_RETIRED_TYPES = ("counter", "histogram")
+
+
+def metrics_dir() -> Optional[Path]:
+    """多 worker 模式下的快照目录；单进程模式返回 None"""
+    value = os.environ.get(METRICS_DIR_ENV)
+    return Path(value) if value else None
+
+
+def snapshot_path(directory: Path, pid: int) -> Path:
+    return directory / f"{_SNAPSHOT_PREFIX}{pid}.json"
+
+
+def _write_json(path: Path, data: Any) -> None:
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_snapshot(directory: Path) -> None:
+    """原子地写入当前进程的指标快照"""
+    _write_json(snapshot_path(directory, os.getpid()), REGISTRY.snapshot())
+
+
+def _read_retired(directory: Path) -> Dict[str, Any]:
+    try:
+        data = json.loads((directory / _RETIRED_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"pids": [], "metrics": []}
+    return data
+
+
+def retire_snapshot(directory: Path, pid: int) -> None:
+    """
+    worker 退出后（由主进程调用）：把它最后一次快照中的计数器和直方图累加进 retired.json，再删除快照
+
+    retired.json 中记录已并入的 pid，读取方据此跳过尚未删除的快照，避免重复计数。
+    """
+    path = snapshot_path(directory, pid)
+    try:
+        snapshot = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError):
+        logger.warning(f"Unreadable metrics snapshot of worker {pid}, dropping it")
+        snapshot = []
+
+    retired = _read_retired(directory)
+    # 只保留快照文件仍存在的 pid（文件删除后不再需要跳过）
+    pids = [p for p in retired["pids"] if snapshot_path(directory, p).exists()]
+    pids.append(pid)
+    kept = [metric for metric in snapshot if metric["type"] in _RETIRED_TYPES]
+    _write_json(
+        directory / _RETIRED_FILE,
+        {"pids": pids, "metrics": merge_snapshots([retired["metrics"], kept])},
+    )
+    path.unlink(missing_ok=True)
+
+
+def _read_other_snapshots(directory: Path) -> List[List[Dict[str, Any]]]:
+    retired = _read_retired(directory)
+    skip = {snapshot_path(directory, pid).name for pid in retired["pids"]}
+    skip.add(snapshot_path(directory, os.getpid()).name)
+    snapshots: List[List[Dict[str, Any]]] = [retired["metrics"]]
+    for path in directory.glob(f"{_SNAPSHOT_PREFIX}*.json"):
+        if path.name in skip:
+            continue
+        try:
+            snapshots.append(json.loads(path.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            # worker 刚退出或正在替换文件
+            continue
+    return snapshots
+
+
+def render_metrics() -> str:
+    """导出 Prometheus 文本：多 worker 模式下为全部 worker 的汇总"""
+    directory = metrics_dir()
+    if directory is None:
+        return REGISTRY.render()
+    return render_snapshots([REGISTRY.snapshot(), *_read_other_snapshots(directory)])
+
+
+async def run_snapshot_writer(interval_s: float = 2.0) -> None:
+    """后台任务：多 worker 模式下定期写入本进程的快照，退出时写入最终快照供主进程并入 retired.json"""
+    directory = metrics_dir()
+    if directory is None:
+        return
+    try:
+        while True:
+            try:
+                write_snapshot(directory)
+            except OSError:
+                logger.exception("Failed to write metrics snapshot")
+            await asyncio.sleep(interval_s)
+    finally:
+        try:
+            write_snapshot(directory)
+        except OSError:
+            logger.exception("Failed to write final metrics snapshot")
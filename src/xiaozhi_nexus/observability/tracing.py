@@ -0,0 +1,365 @@
+"""
+单轮对话的时间线追踪
+
+直方图只能看到整体分布，解释不了某一轮为什么慢。对被采样的轮次，会话的 TurnTimer
+把链路阶段和各句 TTS 的耗时记录成一棵紧凑的 span 树（TurnTrace），结束后交给 Tracer：
+
+- 保存在进程内有界的环形缓冲中，可按设备通过调试接口取回最近 N 轮
+- 可选追加写入文件：jsonl（每轮一行）或 chrome（Chrome trace 事件格式，可直接在
+  chrome://tracing / Perfetto 中打开）
+
+span 的起止时间由固定阶段推导：
+
+    asr.connect    asr_connect   → asr_connected
+    asr.upload     speech_start  → speech_end
+    asr.transcript speech_end    → asr_final
+    llm.chat       llm_request   → llm_done
+    tts            tts_start     → tts_end
+    playout        first_packet_sent → last_packet_sent
+
+再加上会话记录的每句 TTS（tts.sentence / tts.synthesize / tts.send）和打断等瞬时事件。
+未被采样的轮次不记录任何内容；设置 slow_turn_ms 时所有轮次都记录，但只保留被采样或
+耗时超过阈值的轮次。
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMATS = ("jsonl", "chrome")
+
+# (span 名, 起始阶段, 结束阶段)
+_STAGE_SPANS: Tuple[Tuple[str, str, str], ...] = (
+    ("asr.connect", "asr_connect", "asr_connected"),
+    ("asr.upload", "speech_start", "speech_end"),
+    ("asr.transcript", "speech_end", "asr_final"),
+    ("llm.chat", "llm_request", "llm_done"),
+    ("tts", "tts_start", "tts_end"),
+    ("playout", "first_packet_sent", "last_packet_sent"),
+)
+# 作为瞬时事件记录的阶段
+_STAGE_EVENTS = ("asr_first_delta", "llm_first_token", "tts_first_byte")
+
+_trace_ids = itertools.count(1)
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # time.perf_counter() 秒
+    end: float
+    parent: Optional[str] = None  # 父 span 名（None 表示挂在整轮下）
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class TurnTrace:
+    """
+    一轮对话的追踪记录（由 TurnTimer 填充，线程安全由 TurnTimer 的锁保证）
+
+    时间戳为 perf_counter 秒；导出时换算为相对本轮开始的毫秒数和墙钟时间。
+    """
+
+    device_id: str
+    session_id: str
+    sampled: bool = True
+    trace_id: int = field(default_factory=lambda: next(_trace_ids))
+    origin: float = field(default_factory=time.perf_counter)
+    wall_time: float = field(default_factory=time.time)
+    end: Optional[float] = None
+    stages: Dict[str, float] = field(default_factory=dict)
+    spans: List[Span] = field(default_factory=list)
+    events: List[Tuple[str, float, Dict[str, Any]]] = field(default_factory=list)
+
+    def mark(self, stage: str, at: float) -> None:
+        self.stages.setdefault(stage, at)
+
+    def has(self, stage: str) -> bool:
+        return stage in self.stages
+
+    def add_span(
+        self,
+        name: str,
+        start: float,
+        end: float,
+        parent: Optional[str] = None,
+        **attrs: Any,
+    ) -> None:
+        self.spans.append(Span(name, start, end, parent, attrs))
+
+    def add_event(self, name: str, at: float, **attrs: Any) -> None:
+        self.events.append((name, at, attrs))
+
+    def close(self, at: float) -> None:
+        if self.end is None:
+            self.end = at
+
+    @property
+    def duration_s(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.origin
+
+    @property
+    def reply_latency_s(self) -> Optional[float]:
+        """用户说完到首个音频包发出的时间"""
+        start = self.stages.get("speech_end")
+        first = self.stages.get("first_packet_sent")
+        if start is None or first is None:
+            return None
+        return first - start
+
+    def all_spans(self) -> List[Span]:
+        """阶段推导出的 span 与显式记录的 span"""
+        end = self.end if self.end is not None else time.perf_counter()
+        spans: List[Span] = []
+        for name, start_stage, end_stage in _STAGE_SPANS:
+            start = self.stages.get(start_stage)
+            if start is None:
+                continue
+            stop = self.stages.get(end_stage)
+            attrs: Dict[str, Any] = {}
+            if stop is None:
+                # 未完成（被打断或超时）：截止到本轮结束
+                stop = end
+                attrs["incomplete"] = True
+            spans.append(Span(name, start, stop, None, attrs))
+        spans.extend(self.spans)
+        spans.sort(key=lambda span: span.start)
+        return spans
+
+    def all_events(self) -> List[Tuple[str, float, Dict[str, Any]]]:
+        events = [(stage, self.stages[stage], {}) for stage in _STAGE_EVENTS if stage in self.stages]
+        events.extend(self.events)
+        events.sort(key=lambda event: event[1])
+        return events
+
+    def _ms(self, at: float) -> float:
+        return round((at - self.origin) * 1000.0, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latency = self.reply_latency_s
+        return {
+            "trace_id": self.trace_id,
+            "device_id": self.device_id,
+            "session_id": self.session_id,
+            "start_time": self.wall_time,
+            "duration_ms": round(self.duration_s * 1000.0, 3),
+            "reply_latency_ms": round(latency * 1000.0, 3) if latency is not None else None,
+            "spans": [
+                {
+                    "name": span.name,
+                    "parent": span.parent,
+                    "start_ms": self._ms(span.start),
+                    "duration_ms": round((span.end - span.start) * 1000.0, 3),
+                    **({"attrs": span.attrs} if span.attrs else {}),
+                }
+                for span in self.all_spans()
+            ],
+            "events": [
+                {"name": name, "at_ms": self._ms(at), **({"attrs": attrs} if attrs else {})}
+                for name, at, attrs in self.all_events()
+            ],
+        }
+
+    def to_chrome_events(self, tid: int) -> List[Dict[str, Any]]:
+        """Chrome trace 事件（"X" 完整事件 + "i" 瞬时事件），时间为墙钟微秒"""
+        base_us = self.wall_time * 1e6
+        pid = os.getpid()
+
+        def ts(at: float) -> float:
+            return round(base_us + (at - self.origin) * 1e6, 1)
+
+        events: List[Dict[str, Any]] = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": f"{self.device_id} ({self.session_id})"},
+            },
+            {
+                "name": "turn",
+                "ph": "X",
+                "pid": pid,
+                "tid": tid,
+                "ts": ts(self.origin),
+                "dur": round(self.duration_s * 1e6, 1),
+                "args": {"trace_id": self.trace_id, "device_id": self.device_id},
+            },
+        ]
+        for span in self.all_spans():
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "pid": pid,
+                    "tid": tid,
+                    "ts": ts(span.start),
+                    "dur": round((span.end - span.start) * 1e6, 1),
+                    "args": span.attrs,
+                }
+            )
+        for name, at, attrs in self.all_events():
+            events.append(
+                {"name": name, "ph": "i", "s": "t", "pid": pid, "tid": tid, "ts": ts(at), "args": attrs}
+            )
+        return events
+
+
+class _TraceWriter:
+    """后台线程追加写入追踪文件，不阻塞事件循环和会话线程"""
+
+    def __init__(self, path: Path, fmt: str) -> None:
+        self.path = path
+        self.fmt = fmt
+        self._queue: "queue.SimpleQueue[Optional[TurnTrace]]" = queue.SimpleQueue()
+        self._tids: Dict[str, int] = {}
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, trace: TurnTrace) -> None:
+        self._queue.put(trace)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        with self.path.open("a", encoding="utf-8") as f:
+            if self.fmt == "chrome" and new_file:
+                # Chrome trace 的 JSON 数组格式允许不闭合，可持续追加
+                f.write("[\n")
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    break
+                try:
+                    f.write(self._format(trace))
+                    f.flush()
+                except Exception:
+                    logger.exception("Failed to write trace")
+
+    def _format(self, trace: TurnTrace) -> str:
+        if self.fmt == "jsonl":
+            return json.dumps(trace.to_dict(), ensure_ascii=False) + "\n"
+        tid = self._tids.setdefault(trace.session_id, len(self._tids) + 1)
+        return "".join(
+            json.dumps(event, ensure_ascii=False) + ",\n"
+            for event in trace.to_chrome_events(tid)
+        )
+
+
+class Tracer:
+    """
+    进程级追踪收集
+
+    Args:
+        sample_rate: 轮次采样比例（0~1），0 表示关闭
+        slow_turn_ms: 大于 0 时所有轮次都记录，回复延迟超过该值的轮次即使未被采样也保留
+        ring_size: 内存中保留的最近轮次数
+        path: 追加写入的追踪文件，None 表示只保存在内存中
+        fmt: 文件格式，jsonl 或 chrome
+    """
+
+    def __init__(
+        self,
+        sample_rate: float = 0.0,
+        slow_turn_ms: float = 0.0,
+        ring_size: int = 200,
+        path: Optional[Path] = None,
+        fmt: str = "jsonl",
+    ) -> None:
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unsupported trace format: {fmt}")
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.slow_turn_ms = max(0.0, float(slow_turn_ms))
+        self._ring: Deque[TurnTrace] = deque(maxlen=max(1, int(ring_size)))
+        self._lock = threading.Lock()
+        self._writer = _TraceWriter(path, fmt) if path is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_turn_ms > 0
+
+    def begin(self, device_id: str, session_id: str) -> Optional[TurnTrace]:
+        """开始一轮；不记录时返回 None"""
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled and self.slow_turn_ms <= 0:
+            return None
+        return TurnTrace(device_id=device_id, session_id=session_id, sampled=sampled)
+
+    def finish(self, trace: TurnTrace) -> None:
+        trace.close(time.perf_counter())
+        if not trace.sampled:
+            latency = trace.reply_latency_s
+            if latency is None or latency * 1000.0 < self.slow_turn_ms:
+                return
+        with self._lock:
+            self._ring.append(trace)
+        if self._writer is not None:
+            self._writer.put(trace)
+
+    def recent(self, device_id: Optional[str] = None, limit: int = 20) -> List[TurnTrace]:
+        """最近的轮次（新的在前），可按设备过滤"""
+        with self._lock:
+            traces = list(self._ring)
+        if device_id is not None:
+            traces = [t for t in traces if t.device_id == device_id]
+        return traces[::-1][: max(0, limit)]
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+_tracer: Optional[Tracer] = None
+
+
+def configure_tracing(
+    sample_rate: float,
+    slow_turn_ms: float = 0.0,
+    ring_size: int = 200,
+    path: Optional[Path] = None,
+    fmt: str = "jsonl",
+) -> Tracer:
+    """按配置创建进程级 Tracer（服务启动时调用）"""
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+    _tracer = Tracer(sample_rate, slow_turn_ms, ring_size, path, fmt)
+    if _tracer.enabled:
+        logger.info(
+            f"Turn tracing: sample_rate={_tracer.sample_rate}, "
+            f"slow_turn_ms={_tracer.slow_turn_ms}, file={path or '-'}"
+        )
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    """获取进程级 Tracer；未配置时返回关闭状态的实例"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def shutdown_tracing() -> None:
+    global _tracer
+    if _tracer is not None:
+        _tracer.close()
+        _tracer = None
@@ -1,4 +1,5 @@
+from xiaozhi_nexus.runtime.async_session import AsyncStreamSession
+from xiaozhi_nexus.runtime.playout import PlayoutScheduler, PlayoutStream
 from xiaozhi_nexus.runtime.session import StreamSession
 
-__all__ = ["StreamSession"]
-
+__all__ = ["AsyncStreamSession", "PlayoutScheduler", "PlayoutStream", "StreamSession"]
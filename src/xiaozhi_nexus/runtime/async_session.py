@@ -0,0 +1,483 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+import numpy as np
+
+from xiaozhi_nexus.audio.executor import AudioLane
+from xiaozhi_nexus.audio.opus import OpusEncoder
+from xiaozhi_nexus.audio.ring import PCMRingBuffer
+from xiaozhi_nexus.audio.vad import StreamingVAD
+from xiaozhi_nexus.inferencers.stream_asr import OpenAIRealtimeASRInferencer
+from xiaozhi_nexus.inferencers.chat import OpenAIChatInferencer
+from xiaozhi_nexus.inferencers.tts import OpenAITTSInferencer
+from xiaozhi_nexus.inferencers.tts.utils import (
+    StreamingSentenceSplitter,
+    clean_text_for_tts,
+    split_text_by_punctuation,
+)
+from xiaozhi_nexus.observability.latency import TurnTimer
+from xiaozhi_nexus.observability.loop import call_soon_threadsafe
+from xiaozhi_nexus.runtime.playout import PlayoutStream
+from xiaozhi_nexus.runtime.session import LLMStreamError, SessionState
+from xiaozhi_nexus.runtime.tts_pipeline import AsyncTTSPipeline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class AsyncStreamSession:
+    """
+    基于 asyncio 的流式会话管理器
+
+    与 StreamSession 的工作流程和打断语义一致（语音输入 → ASR → LLM 对话 → TTS → 音频输出），
+    但 ASR/LLM/TTS 全部通过各推理器的异步接口运行在服务端事件循环上，
+    每个会话只是一个 asyncio.Task，不再占用独立线程和额外的事件循环。
+
+    所有方法都必须在事件循环线程中调用；publish_json/publish_bytes 直接入队，无需线程安全转发。
+    """
+
+    publish_json: Callable[[dict], None]
+    publish_bytes: Callable[[bytes], None]
+    asr_inferencer: OpenAIRealtimeASRInferencer
+    tts: OpenAITTSInferencer
+    encoder: OpusEncoder
+    chat_inferencer: Optional[OpenAIChatInferencer] = None
+    input_maxsize: int = 200  # 上行音频缓冲的帧数，超出时丢弃最旧的帧
+    input_frame_size: int = 320  # 上行音频每帧采样点数（与解码器 frame_size 一致）
+    allow_interrupt: bool = True  # 是否允许用户打断
+    audio_send_delay_ms: Optional[float] = None  # 已废弃：仅在未提供 playout 时作为每个音频包之后的发送延时（毫秒）
+    tts_split_by_punctuation: bool = True  # 是否按标点符号分段进行 TTS 合成
+    tts_lookahead: int = 2  # 当前句播放时并发预合成的后续句子数
+    clear_outgoing_bytes: Optional[Callable[[], None]] = None
+    vad: Optional[StreamingVAD] = None  # 语音活动检测（用于打断），None 时按 ASR 采样率使用默认参数
+    playout: Optional[PlayoutStream] = None  # 播放调度队列，TTS 音频和 tts 控制消息按截止时间发送
+    audio_lane: Optional[AudioLane] = None  # TTS 编码提交到音频计算池的有序通道，None 时内联编码
+    turn_timer: Optional[TurnTimer] = None  # 链路计时与轮次追踪，记录首包/末包音频的发出时刻
+
+    # 内部状态
+    audio_ring: PCMRingBuffer = field(init=False, repr=False)
+    _audio_ready: asyncio.Event = field(default_factory=asyncio.Event, init=False, repr=False)
+    _loop: Optional[asyncio.AbstractEventLoop] = field(default=None, init=False, repr=False)
+    _loop_thread_id: Optional[int] = field(default=None, init=False, repr=False)
+    _task: Optional[asyncio.Task] = field(default=None, init=False, repr=False)
+    _running: bool = field(default=False, init=False, repr=False)
+    _interrupted: bool = field(default=False, init=False, repr=False)
+    state: SessionState = field(default_factory=SessionState, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.audio_ring = self._new_ring()
+        if self.vad is None:
+            self.vad = StreamingVAD(sample_rate=self.asr_inferencer.sample_rate)
+
+    def start(self) -> None:
+        if self._task and not self._task.done():
+            return
+        self._running = True
+        self._interrupted = False
+        self.state.tts_active = False
+        self.state.user_speaking = False
+        if self.vad is not None:
+            self.vad.reset()
+        if self.audio_ring.closed:
+            self.audio_ring = self._new_ring()
+        else:
+            self.audio_ring.clear()
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._task = self._loop.create_task(self._worker())
+
+    def stop(self) -> None:
+        self._running = False
+        self._abort_generation()
+        self.audio_ring.close()
+        if self._task and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    def interrupt(self) -> None:
+        """
+        中断当前的 LLM 生成和 TTS 播放
+
+        用于用户打断场景：当检测到新的语音输入时调用
+        如果 allow_interrupt 为 False，则不执行中断
+        """
+        if not self.allow_interrupt:
+            return
+        logger.warning("Session interrupted by user")
+        if self.turn_timer is not None:
+            self.turn_timer.event("interrupt", source="device")
+        self._interrupted = True
+
+    def clear_interrupt(self) -> None:
+        """清除中断标志，准备处理新的输入"""
+        self._interrupted = False
+
+    def audio_input(self) -> Optional[PCMRingBuffer]:
+        """会话运行中时返回上行音频缓冲，解码器直接写入其中"""
+        return self.audio_ring if self._running else None
+
+    def push_audio(self, pcm: np.ndarray) -> None:
+        """写入已解码的 PCM（int16 或 float32），供不经过 Opus 解码器的调用方使用"""
+        if not self._running:
+            return
+        self.audio_ring.write(pcm)
+
+    def _new_ring(self) -> PCMRingBuffer:
+        return PCMRingBuffer(
+            frame_size=self.input_frame_size,
+            capacity=self.input_maxsize,
+            on_commit=self._notify_audio,
+        )
+
+    def _notify_audio(self) -> None:
+        # 解码可能在音频计算池的线程中完成，此时需线程安全地唤醒事件循环上的消费者
+        if self._loop is None or threading.get_ident() == self._loop_thread_id:
+            self._audio_ready.set()
+        else:
+            try:
+                call_soon_threadsafe(self._loop, self._audio_ready.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    async def _audio_iter(self) -> AsyncIterator[np.ndarray]:
+        ring = self.audio_ring
+        while self._running:
+            view = ring.pop()
+            if view is None:
+                if ring.closed:
+                    break
+                self._audio_ready.clear()
+                await self._audio_ready.wait()
+                continue
+            # 直接引用缓冲区中的 int16 数据，下游（VAD / 上传缓冲）立即消费
+            pcm = np.frombuffer(view, dtype=np.int16)
+            self._update_user_speaking(pcm)
+            yield pcm
+
+    def _is_interrupted(self) -> bool:
+        """检查是否被中断"""
+        return self._interrupted or not self._running
+
+    def _clear_audio_queue(self) -> None:
+        self.audio_ring.clear()
+
+    def _abort_generation(self) -> None:
+        if not self.allow_interrupt:
+            return
+        self._interrupted = True
+        self._clear_audio_queue()
+        if self.playout is not None:
+            self.playout.clear()
+        if self.clear_outgoing_bytes:
+            self.clear_outgoing_bytes()
+
+    def _update_user_speaking(self, pcm: np.ndarray) -> None:
+        assert self.vad is not None
+        is_speech = self.vad.process(pcm)
+        if is_speech is None:
+            return
+        prev_speaking = self.state.user_speaking
+        self.state.user_speaking = is_speech
+        if is_speech and not prev_speaking and self.state.tts_active:
+            logger.warning("Barge-in detected by VAD")
+            if self.turn_timer is not None:
+                self.turn_timer.event("interrupt", source="vad")
+            self._abort_generation()
+
+    async def _worker(self) -> None:
+        try:
+            async for user_text in self.asr_inferencer.astream(self._audio_iter()):
+                try:
+                    await self._handle_user_text(user_text)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception("Failed to handle user text")
+                    self._end_turn_with_error(e)
+                finally:
+                    self._mark("turn_end")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # ASR 连接失败（如连接池名额耗尽）或中途断开：通知设备，避免一直等待回复
+            logger.exception("Async session worker failed")
+            if self._running:
+                self.publish_json({"type": "stt", "state": "error", "error": str(e)})
+
+    async def _handle_user_text(self, user_text: str) -> None:
+        if self._is_interrupted():
+            self.clear_interrupt()
+            return
+
+        # 1. 发送 ASR 识别结果
+        self.publish_json({"type": "stt", "text": user_text})
+
+        # 2. 流式调用 LLM，按句切分，首句就绪后即开始 TTS（LLM 继续生成）
+        sentences = self._process_llm(user_text)
+        try:
+            first_sentence = await anext(sentences, None)
+            if first_sentence is None:
+                if self._is_interrupted():
+                    self.publish_json(
+                        {"type": "llm", "state": "stop", "interrupted": True}
+                    )
+                # 被中断、出错或无输出，跳过 TTS
+                self.clear_interrupt()
+                return
+
+            # 3. TTS 合成并发送音频
+            if self._is_interrupted():
+                self.clear_interrupt()
+                return
+
+            # 4. 发送情绪状态（在 TTS 之前，与官方服务保持一致）
+            self.publish_json({"type": "llm", "emotion": "neutral"})
+
+            await self._process_tts(self._prepend(first_sentence, sentences))
+        finally:
+            await sentences.aclose()
+
+    @staticmethod
+    async def _prepend(first: str, rest: AsyncIterator[str]) -> AsyncIterator[str]:
+        yield first
+        async for item in rest:
+            yield item
+
+    async def _process_llm(self, user_text: str) -> AsyncIterator[str]:
+        """
+        处理 LLM 推理，支持流式输出和中断
+
+        与 StreamSession._process_llm 相同：按句产出，被中断时静默结束；尚未产出句子时出错
+        直接发送 llm error，已产出句子后出错则抛出 LLMStreamError，由 TTS 按顺序发送。
+        """
+        if not self.chat_inferencer:
+            # 无 LLM 时直接回显用户输入（用于测试）
+            text = clean_text_for_tts(user_text)
+            if self.tts_split_by_punctuation:
+                for sentence in split_text_by_punctuation(text):
+                    yield sentence
+            elif text.strip():
+                yield text
+            return
+
+        splitter = StreamingSentenceSplitter()
+        full_response = ""
+        emitted = False
+        try:
+            async for chunk in self.chat_inferencer.astream(user_text):
+                if self._is_interrupted():
+                    return
+
+                chunk = clean_text_for_tts(chunk)
+                full_response += chunk
+                if self.tts_split_by_punctuation:
+                    for sentence in splitter.feed(chunk):
+                        emitted = True
+                        yield sentence
+        except Exception as e:
+            if emitted:
+                raise LLMStreamError(str(e)) from e
+            self.publish_json({"type": "llm", "state": "error", "error": str(e)})
+            return
+
+        if self.tts_split_by_punctuation:
+            for sentence in splitter.flush():
+                yield sentence
+        elif full_response.strip():
+            yield full_response
+
+    def _publish_tts(self, payload: dict) -> None:
+        """发送 tts 控制消息：有播放队列时与音频按顺序排队"""
+        if self.playout is not None:
+            self.playout.push_json(payload)
+        else:
+            self.publish_json(payload)
+
+    def _end_turn_with_error(self, error: Exception) -> None:
+        """本轮处理出错：通知设备 llm error 并结束 TTS，工作循环继续处理下一句"""
+        self._publish_tts({"type": "llm", "state": "error", "error": str(error)})
+        self._publish_tts({"type": "tts", "state": "stop", "interrupted": True})
+        self.clear_interrupt()
+
+    def _publish_tts_interrupted(self) -> None:
+        """丢弃未发出的音频并立即通知设备 TTS 被打断"""
+        if self.playout is not None:
+            self.playout.clear()
+        self.publish_json({"type": "tts", "state": "stop", "interrupted": True})
+
+    async def _run_audio(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        调用编码器方法；配置了 audio_lane 时在计算池中按顺序执行
+
+        编码器有状态，reset/encode/flush 都须经由同一通道，避免与尚未完成的编码任务并发。
+        """
+        if self.audio_lane is None:
+            return fn(*args)
+        return await self.audio_lane.run(fn, *args)
+
+    async def _send_packet(self, packet: bytes) -> None:
+        if self.playout is not None:
+            self.playout.push_audio(packet)
+            # 背压：播放队列积压过多时暂停编码
+            await self.playout.wait_writable()
+            return
+        self.publish_bytes(packet)
+        # 控制发送速度接近实时播放，同时让出事件循环
+        if self.audio_send_delay_ms:
+            await asyncio.sleep(self.audio_send_delay_ms / 1000.0)
+
+    def _mark(self, stage: str) -> None:
+        if self.turn_timer is not None:
+            self.turn_timer.mark(stage)
+
+    def _mark_sent(self, stage: str) -> None:
+        """在已写入的音频实际发出时记录链路阶段（有播放队列时排在这些音频之后）"""
+        if self.turn_timer is None:
+            return
+        if self.playout is not None:
+            self.playout.push_callback(functools.partial(self.turn_timer.mark, stage))
+        else:
+            self.turn_timer.mark(stage)
+
+    def _on_sent(self, fn: Callable[[float], None]) -> None:
+        """已写入的音频实际发出时以发出时刻调用 fn（有播放队列时排在这些音频之后）"""
+        if self.playout is not None:
+            self.playout.push_callback(lambda: fn(time.perf_counter()))
+        else:
+            fn(time.perf_counter())
+
+    def _trace_sentence(
+        self,
+        index: int,
+        text: str,
+        start: float,
+        packets: int,
+        encode_s: float,
+        sent_at: List[float],
+    ) -> None:
+        """
+        记录一句 TTS 的追踪 span：取音频与编码写入（tts.sentence），
+        以及从首个包到最后一个包实际发出（tts.send，在最后一个包发出时记录）
+        """
+        timer = self.turn_timer
+        if timer is None or not timer.tracing:
+            return
+        timer.span(
+            "tts.sentence",
+            start,
+            time.perf_counter(),
+            "tts",
+            index=index,
+            text=text[:40],
+            packets=packets,
+            encode_ms=round(encode_s * 1000.0, 3),
+        )
+
+        def sent(end: float) -> None:
+            if sent_at:
+                timer.span("tts.send", sent_at[0], end, "tts.sentence", index=index, packets=packets)
+
+        if packets:
+            self._on_sent(sent)
+
+    async def _process_tts(self, sentences: AsyncIterator[str]) -> None:
+        """
+        处理 TTS 合成，支持中断
+
+        通过 AsyncTTSPipeline 前瞻并发合成，按句子顺序写入播放队列，
+        等队列中的音频全部发出后才结束（期间仍视为 TTS 播放中，可被打断）。
+        """
+        logger.info("TTS start")
+        self.state.tts_active = True
+        self._mark("tts_start")
+        self._publish_tts({"type": "tts", "state": "start"})
+
+        pipeline = AsyncTTSPipeline(
+            synthesize=self.tts.asynthesize,
+            lookahead=self.tts_lookahead,
+        )
+        sentence_iter = pipeline.run(sentences)
+        first_sent = False
+
+        try:
+            # 上一轮被打断时编码器可能留有不足一帧的样本
+            await self._run_audio(self.encoder.reset)
+
+            async for sentence_idx, sentence, pcm_chunks in sentence_iter:
+                if self._is_interrupted():
+                    logger.warning(f"TTS interrupted before sentence: {sentence[:20]}...")
+                    self._publish_tts_interrupted()
+                    return
+
+                logger.info(f"TTS sentence[{sentence_idx}] start: {sentence}")
+                self._publish_tts({"type": "tts", "text": sentence})
+
+                tracing = self.turn_timer is not None and self.turn_timer.tracing
+                sentence_start = time.perf_counter()
+                sent_at: List[float] = []
+                encode_s = 0.0
+                packet_count = 0
+                async for pcm in pcm_chunks:
+                    if self._is_interrupted():
+                        self._publish_tts_interrupted()
+                        return
+
+                    encode_start = time.perf_counter()
+                    packets = await self._run_audio(self.encoder.encode_pcm_float32, pcm)
+                    encode_s += time.perf_counter() - encode_start
+                    for packet in packets:
+                        if self._is_interrupted():
+                            self._publish_tts_interrupted()
+                            return
+                        await self._send_packet(packet)
+                        packet_count += 1
+                        if tracing and packet_count == 1:
+                            self._on_sent(sent_at.append)
+                        if not first_sent:
+                            first_sent = True
+                            self._mark_sent("first_packet_sent")
+
+                if tracing:
+                    self._trace_sentence(
+                        sentence_idx, sentence, sentence_start, packet_count, encode_s, sent_at
+                    )
+                logger.info(f"TTS sentence[{sentence_idx}] end: {sentence} (sent {packet_count} packets)")
+
+            if self._is_interrupted():
+                logger.warning("TTS interrupted while waiting for LLM")
+                self._publish_tts_interrupted()
+                return
+
+            # 流结束：编码器中剩余的样本补零发出
+            for packet in await self._run_audio(self.encoder.flush):
+                await self._send_packet(packet)
+            self._mark_sent("last_packet_sent")
+
+            self._publish_tts({"type": "tts", "state": "stop"})
+            if self.playout is not None:
+                await self.playout.wait_drained()
+                if self._is_interrupted():
+                    logger.warning("TTS interrupted during playout")
+                    self._publish_tts_interrupted()
+                    return
+            logger.info("TTS stop (completed)")
+
+        except LLMStreamError as e:
+            # 已合成的句子照常播放，llm error 与本轮 TTS 的结束消息排在这些音频之后
+            logger.error(f"LLM failed during TTS: {e}")
+            self._publish_tts({"type": "llm", "state": "error", "error": str(e)})
+            self._publish_tts({"type": "tts", "state": "stop", "interrupted": True})
+        except Exception as e:
+            self._publish_tts({"type": "tts", "state": "error", "error": str(e)})
+        finally:
+            await sentence_iter.aclose()
+            self.state.tts_active = False
+            self._mark("tts_end")
@@ -0,0 +1,309 @@
+"""
+音频播放调度
+
+TTS 音频不再由会话在每个包之后 sleep 控速，而是写入会话的 PlayoutStream，
+由事件循环上唯一的 PlayoutScheduler 任务按单调时钟上的截止时间统一发送：
+
+- 每个流开始播放（或欠载后恢复）时以当前时间为锚点，前 burst_ms 的音频立即发出，
+  用于填充设备端的抖动缓冲；之后每个包的截止时间为 锚点 + (累计时长 - burst_ms)
+- tts 文本/停止等控制消息与音频包按写入顺序排队，在它前面的音频发出后才发送
+- 回调（如记录首包/末包发出时刻）同样按写入顺序排队，在它前面的内容发出时执行
+- 调度器用一个最小堆管理所有流的下一个截止时间，只在最早的截止时间到达时醒来
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, List, Optional, Tuple
+
+from xiaozhi_nexus.observability.loop import call_soon_threadsafe
+
+logger = logging.getLogger(__name__)
+
+
+class PlayoutStream:
+    """
+    单个会话的播放队列
+
+    push_audio/push_json/clear 可在任意线程调用；wait_* 的 async 版本只能在事件循环中使用，
+    *_blocking 版本供线程模式会话使用。
+    """
+
+    def __init__(
+        self,
+        scheduler: "PlayoutScheduler",
+        send_bytes: Callable[[bytes], None],
+        send_json: Callable[[dict], None],
+        frame_duration_ms: float = 20.0,
+        burst_ms: float = 240.0,
+        max_buffer_ms: float = 1000.0,
+    ) -> None:
+        self._scheduler = scheduler
+        self._send_bytes = send_bytes
+        self._send_json = send_json
+        self.frame_duration_ms = float(frame_duration_ms)
+        self.burst_ms = float(burst_ms)
+        self.max_buffer_ms = float(max_buffer_ms)
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._items: Deque[Tuple[bool, Any]] = deque()  # (是否为音频, 内容：音频包 / 控制消息 / 回调)
+        self._audio_count = 0
+        self._anchor: Optional[float] = None
+        self._position_ms = 0.0
+        self._scheduled = False
+        self._closed = False
+
+        # 事件循环侧的等待条件，只在事件循环线程中更新
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._drained = asyncio.Event()
+        self._drained.set()
+
+    # ---- 状态 ----
+
+    @property
+    def buffered_ms(self) -> float:
+        """尚未发出的音频时长"""
+        return self._audio_count * self.frame_duration_ms
+
+    @property
+    def busy(self) -> bool:
+        """是否还有未发出的音频或控制消息"""
+        return bool(self._items)
+
+    # ---- 写入 ----
+
+    def push_audio(self, packet: bytes) -> None:
+        self._push(True, packet)
+
+    def push_json(self, payload: dict) -> None:
+        self._push(False, payload)
+
+    def push_callback(self, fn: Callable[[], None]) -> None:
+        """排在已写入内容之后的回调：前面的内容全部发出时在事件循环中执行"""
+        self._push(False, fn)
+
+    def clear(self) -> None:
+        """丢弃所有未发出的内容（打断），下一次写入重新以突发开始"""
+        with self._lock:
+            self._items.clear()
+            self._audio_count = 0
+            self._anchor = None
+        self._scheduler._call(self._update_waiters)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self.clear()
+
+    # ---- 等待 ----
+
+    async def wait_writable(self) -> None:
+        """等待缓冲的音频低于 max_buffer_ms（生产者背压）"""
+        await self._writable.wait()
+
+    async def wait_drained(self) -> None:
+        """等待队列中的内容全部发出"""
+        await self._drained.wait()
+
+    def wait_writable_blocking(self, is_cancelled: Callable[[], bool]) -> None:
+        with self._cond:
+            while self._over_limit_locked() and not is_cancelled():
+                self._cond.wait(0.05)
+
+    def wait_drained_blocking(self, is_cancelled: Callable[[], bool]) -> None:
+        with self._cond:
+            while self._items and not is_cancelled():
+                self._cond.wait(0.05)
+
+    # ---- 内部实现 ----
+
+    def _over_limit_locked(self) -> bool:
+        return self._audio_count * self.frame_duration_ms >= self.max_buffer_ms
+
+    def _deadline_locked(self) -> float:
+        assert self._anchor is not None
+        return self._anchor + max(0.0, self._position_ms - self.burst_ms) / 1000.0
+
+    def _push(self, is_audio: bool, payload: Any) -> None:
+        deadline: Optional[float] = None
+        with self._lock:
+            if self._closed:
+                return
+            now = self._scheduler.now()
+            if not self._items and (
+                self._anchor is None or now > self._anchor + self._position_ms / 1000.0
+            ):
+                # 空闲或已欠载（设备已播完此前发出的全部音频）：重新锚定，恢复突发发送
+                self._anchor = now
+                self._position_ms = 0.0
+            self._items.append((is_audio, payload))
+            if is_audio:
+                self._audio_count += 1
+            if not self._scheduled:
+                self._scheduled = True
+                deadline = self._deadline_locked()
+        if deadline is not None:
+            self._scheduler._schedule(self, deadline)
+        self._scheduler._call(self._update_waiters)
+
+    def _release(self, now: float) -> Optional[float]:
+        """
+        发出所有已到期的内容（由调度器在事件循环中调用）
+
+        Returns:
+            下一个截止时间；队列已空时返回 None
+        """
+        due: List[Tuple[bool, Any]] = []
+        with self._lock:
+            while self._items and self._deadline_locked() <= now:
+                is_audio, payload = self._items.popleft()
+                if is_audio:
+                    self._audio_count -= 1
+                    self._position_ms += self.frame_duration_ms
+                due.append((is_audio, payload))
+            if self._items:
+                next_deadline: Optional[float] = self._deadline_locked()
+            else:
+                next_deadline = None
+                self._scheduled = False
+
+        for is_audio, payload in due:
+            if is_audio:
+                self._send_bytes(payload)
+            elif callable(payload):
+                payload()
+            else:
+                self._send_json(payload)
+        if due:
+            self._update_waiters()
+        return next_deadline
+
+    def _update_waiters(self) -> None:
+        with self._cond:
+            over_limit = self._over_limit_locked()
+            empty = not self._items
+            self._cond.notify_all()
+        if over_limit:
+            self._writable.clear()
+        else:
+            self._writable.set()
+        if empty:
+            self._drained.set()
+        else:
+            self._drained.clear()
+
+
+class PlayoutScheduler:
+    """
+    事件循环级的播放调度器
+
+    所有会话的 PlayoutStream 共享一个 asyncio 任务：最小堆按截止时间排序，
+    每次醒来只处理已到期的流，不再为每个会话占用一个 sleep 中的线程。
+    """
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        self._loop = loop or asyncio.get_running_loop()
+        self._heap: List[Tuple[float, int, PlayoutStream]] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def now(self) -> float:
+        return self._loop.time()
+
+    def open_stream(
+        self,
+        send_bytes: Callable[[bytes], None],
+        send_json: Callable[[dict], None],
+        frame_duration_ms: float = 20.0,
+        burst_ms: float = 240.0,
+        max_buffer_ms: float = 1000.0,
+    ) -> PlayoutStream:
+        """为一个连接创建播放队列（需在事件循环中调用）"""
+        if self._task is None or self._task.done():
+            self._loop_thread_id = threading.get_ident()
+            self._task = self._loop.create_task(self._run())
+        return PlayoutStream(
+            self,
+            send_bytes=send_bytes,
+            send_json=send_json,
+            frame_duration_ms=frame_duration_ms,
+            burst_ms=burst_ms,
+            max_buffer_ms=max_buffer_ms,
+        )
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._heap.clear()
+
+    def _call(self, fn: Callable[[], None]) -> None:
+        """在事件循环线程中执行 fn（已在事件循环线程时直接执行）"""
+        if threading.get_ident() == self._loop_thread_id:
+            fn()
+        else:
+            try:
+                call_soon_threadsafe(self._loop, fn)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _schedule(self, stream: PlayoutStream, deadline: float) -> None:
+        self._call(lambda: self._push_heap(stream, deadline))
+
+    def _push_heap(self, stream: PlayoutStream, deadline: float) -> None:
+        heapq.heappush(self._heap, (deadline, next(self._seq), stream))
+        if self._heap[0][2] is stream:
+            self._wake.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+
+            deadline = self._heap[0][0]
+            now = self._loop.time()
+            if deadline > now:
+                self._wake.clear()
+                timer = self._loop.call_at(deadline, self._wake.set)
+                try:
+                    await self._wake.wait()
+                finally:
+                    timer.cancel()
+                continue
+
+            _, _, stream = heapq.heappop(self._heap)
+            try:
+                next_deadline = stream._release(now)
+            except Exception:
+                logger.exception("Playout stream release failed")
+                continue
+            if next_deadline is not None:
+                heapq.heappush(self._heap, (next_deadline, next(self._seq), stream))
+
+
+_scheduler: Optional[PlayoutScheduler] = None
+
+
+def get_playout_scheduler() -> PlayoutScheduler:
+    """获取当前事件循环的共享调度器（需在事件循环中调用）"""
+    global _scheduler
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler._loop is not loop:
+        _scheduler = PlayoutScheduler(loop)
+    return _scheduler
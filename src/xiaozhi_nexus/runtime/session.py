@@ -1,27 +1,36 @@
 from __future__ import annotations
 
+import functools
 import logging
-import queue
 import threading
 import time
 from dataclasses import dataclass, field
-from typing import Callable, List, Optional
+from typing import Callable, Iterable, Iterator, List, Optional
 
 import numpy as np
 
 logger = logging.getLogger(__name__)
 
 from xiaozhi_nexus.audio.opus import OpusEncoder
+from xiaozhi_nexus.audio.ring import PCMRingBuffer
+from xiaozhi_nexus.audio.vad import StreamingVAD
 from xiaozhi_nexus.inferencers.stream_asr import OpenAIRealtimeASRInferencer
-from xiaozhi_nexus.inferencers.stream_asr.stub import get_is_speech
 from xiaozhi_nexus.inferencers.chat import OpenAIChatInferencer
 from xiaozhi_nexus.inferencers.tts import OpenAITTSInferencer
+from xiaozhi_nexus.observability.latency import TurnTimer
+from xiaozhi_nexus.runtime.playout import PlayoutStream
+from xiaozhi_nexus.runtime.tts_pipeline import TTSPipeline
 from xiaozhi_nexus.inferencers.tts.utils import (
+    StreamingSentenceSplitter,
     clean_text_for_tts,
     split_text_by_punctuation,
 )
 
 
+class LLMStreamError(RuntimeError):
+    """LLM 在已产出句子之后出错：由 TTS 在已排队的音频之后按顺序发送 llm error"""
+
+
 @dataclass
 class SessionState:
     tts_active: bool = False
@@ -49,14 +58,19 @@ class StreamSession:
     tts: OpenAITTSInferencer
     encoder: OpusEncoder
     chat_inferencer: Optional[OpenAIChatInferencer] = None
-    input_maxsize: int = 200
+    input_maxsize: int = 200  # 上行音频缓冲的帧数，超出时丢弃最旧的帧
+    input_frame_size: int = 320  # 上行音频每帧采样点数（与解码器 frame_size 一致）
     allow_interrupt: bool = True  # 是否允许用户打断
-    audio_send_delay_ms: float = 15.0  # 每个音频包发送后的延时（毫秒），用于控制发送速度接近实时
+    audio_send_delay_ms: Optional[float] = None  # 已废弃：仅在未提供 playout 时作为每个音频包之后的发送延时（毫秒）
     tts_split_by_punctuation: bool = True  # 是否按标点符号分段进行 TTS 合成
+    tts_lookahead: int = 2  # 当前句播放时并发预合成的后续句子数
     clear_outgoing_bytes: Optional[Callable[[], None]] = None
+    vad: Optional[StreamingVAD] = None  # 语音活动检测（用于打断），None 时按 ASR 采样率使用默认参数
+    playout: Optional[PlayoutStream] = None  # 播放调度队列，TTS 音频和 tts 控制消息按截止时间发送
+    turn_timer: Optional[TurnTimer] = None  # 链路计时与轮次追踪，记录首包/末包音频的发出时刻
 
     # 内部状态
-    _audio_q: queue.Queue[np.ndarray | None] = field(init=False, repr=False)
+    audio_ring: PCMRingBuffer = field(init=False, repr=False)
     _thread: Optional[threading.Thread] = field(default=None, init=False, repr=False)
     _running: threading.Event = field(
         default_factory=threading.Event, init=False, repr=False
@@ -65,9 +79,12 @@ class StreamSession:
         default_factory=threading.Event, init=False, repr=False
     )
     state: SessionState = field(default_factory=SessionState, init=False, repr=False)
+    _tts_pipeline: Optional[TTSPipeline] = field(default=None, init=False, repr=False)
 
     def __post_init__(self) -> None:
-        self._audio_q = queue.Queue(maxsize=self.input_maxsize)
+        self.audio_ring = self._new_ring()
+        if self.vad is None:
+            self.vad = StreamingVAD(sample_rate=self.asr_inferencer.sample_rate)
 
     def start(self) -> None:
         if self._thread and self._thread.is_alive():
@@ -76,21 +93,20 @@ class StreamSession:
         self._interrupted.clear()
         self.state.tts_active = False
         self.state.user_speaking = False
-        self._thread = threading.Thread(target=self._worker, daemon=True)
+        if self.vad is not None:
+            self.vad.reset()
+        if self.audio_ring.closed:
+            self.audio_ring = self._new_ring()
+        else:
+            self.audio_ring.clear()
+        self._thread = threading.Thread(target=self._worker, name="session-worker", daemon=True)
         self._thread.start()
 
     def stop(self) -> None:
         self._running.clear()
         self._abort_generation()
-        while True:
-            try:
-                self._audio_q.put(None, timeout=0.05)
-                break
-            except queue.Full:
-                try:
-                    self._audio_q.get_nowait()
-                except queue.Empty:
-                    break
+        # 关闭缓冲区以唤醒等待音频的工作线程
+        self.audio_ring.close()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2.0)
         self._thread = None
@@ -105,187 +121,379 @@ class StreamSession:
         if not self.allow_interrupt:
             return
         logger.warning("Session interrupted by user")
+        if self.turn_timer is not None:
+            self.turn_timer.event("interrupt", source="device")
         self._interrupted.set()
+        self._cancel_tts_pipeline()
 
     def clear_interrupt(self) -> None:
         """清除中断标志，准备处理新的输入"""
         self._interrupted.clear()
 
-    def push_audio(self, pcm_f32: np.ndarray) -> None:
+    def audio_input(self) -> Optional[PCMRingBuffer]:
+        """会话运行中时返回上行音频缓冲，解码器直接写入其中"""
+        return self.audio_ring if self._running.is_set() else None
+
+    def push_audio(self, pcm: np.ndarray) -> None:
+        """写入已解码的 PCM（int16 或 float32），供不经过 Opus 解码器的调用方使用"""
         if not self._running.is_set():
             return
-        try:
-            self._audio_q.put_nowait(np.asarray(pcm_f32, dtype=np.float32))
-        except queue.Full:
-            pass
+        self.audio_ring.write(pcm)
+
+    def _new_ring(self) -> PCMRingBuffer:
+        return PCMRingBuffer(frame_size=self.input_frame_size, capacity=self.input_maxsize)
 
     def _audio_iter(self):
+        ring = self.audio_ring
         while self._running.is_set():
-            item = self._audio_q.get()
-            if item is None:
-                break
-            self._update_user_speaking(item)
-            yield item
+            view = ring.pop_wait(timeout=0.05)
+            if view is None:
+                if ring.closed:
+                    break
+                continue
+            # 直接引用缓冲区中的 int16 数据，下游（VAD / 上传缓冲）立即消费
+            pcm = np.frombuffer(view, dtype=np.int16)
+            self._update_user_speaking(pcm)
+            yield pcm
 
     def _is_interrupted(self) -> bool:
         """检查是否被中断"""
         return self._interrupted.is_set() or not self._running.is_set()
 
+    def _cancel_tts_pipeline(self) -> None:
+        """唤醒阻塞在 TTS 流水线队列上的工作线程"""
+        pipeline = self._tts_pipeline
+        if pipeline is not None:
+            pipeline.cancel()
+
     def _clear_audio_queue(self) -> None:
-        try:
-            while True:
-                self._audio_q.get_nowait()
-        except queue.Empty:
-            pass
+        self.audio_ring.clear()
 
     def _abort_generation(self) -> None:
         if not self.allow_interrupt:
             return
         self._interrupted.set()
+        self._cancel_tts_pipeline()
         self._clear_audio_queue()
+        if self.playout is not None:
+            self.playout.clear()
         if self.clear_outgoing_bytes:
             self.clear_outgoing_bytes()
 
-    def _update_user_speaking(self, pcm_f32: np.ndarray) -> None:
-        is_speech = get_is_speech(pcm_f32)
+    def _update_user_speaking(self, pcm: np.ndarray) -> None:
+        assert self.vad is not None
+        is_speech = self.vad.process(pcm)
         if is_speech is None:
             return
         prev_speaking = self.state.user_speaking
         self.state.user_speaking = is_speech
         if is_speech and not prev_speaking and self.state.tts_active:
             logger.warning("Barge-in detected by VAD")
+            if self.turn_timer is not None:
+                self.turn_timer.event("interrupt", source="vad")
             self._abort_generation()
 
     def _worker(self) -> None:
-        for user_text in self.asr_inferencer(self._audio_iter()):
-            if self._is_interrupted():
-                self.clear_interrupt()
-                continue
+        try:
+            for user_text in self.asr_inferencer(self._audio_iter()):
+                try:
+                    self._handle_user_text(user_text)
+                except Exception as e:
+                    logger.exception("Failed to handle user text")
+                    self._end_turn_with_error(e)
+                finally:
+                    self._mark("turn_end")
+        except Exception as e:
+            # ASR 连接失败或中途断开：通知设备，避免一直等待回复
+            logger.exception("Session worker failed")
+            if self._running.is_set():
+                self.publish_json({"type": "stt", "state": "error", "error": str(e)})
+
+    def _handle_user_text(self, user_text: str) -> None:
+        if self._is_interrupted():
+            self.clear_interrupt()
+            return
 
-            # 1. 发送 ASR 识别结果
-            self.publish_json({"type": "stt", "text": user_text})
+        # 1. 发送 ASR 识别结果
+        self.publish_json({"type": "stt", "text": user_text})
 
-            # 2. 调用 LLM 生成响应
-            if self.chat_inferencer:
-                response_text = self._process_llm(user_text)
-                if response_text is None:
-                    # 被中断，跳过 TTS
-                    self.clear_interrupt()
-                    continue
-            else:
-                # 无 LLM 时直接回显用户输入（用于测试）
-                response_text = user_text
+        # 2. 流式调用 LLM，按句切分，首句就绪后即开始 TTS（LLM 继续在后台生成）
+        # 本轮结束（完成、打断或出错）后置位，LLM 生成器据此尽早退出；
+        # 打断标志会在下一轮开始时清除，不能单独依赖
+        turn_over = threading.Event()
+        sentences = self._process_llm(user_text, turn_over.is_set)
+        handed_off = False
+        try:
+            first_sentence = next(sentences, None)
+            if first_sentence is None:
+                if self._is_interrupted():
+                    self.publish_json(
+                        {"type": "llm", "state": "stop", "interrupted": True}
+                    )
+                # 被中断、出错或无输出，跳过 TTS
+                self.clear_interrupt()
+                return
 
             # 3. TTS 合成并发送音频
             if self._is_interrupted():
                 self.clear_interrupt()
-                continue
+                return
 
             # 4. 发送情绪状态（在 TTS 之前，与官方服务保持一致）
             self.publish_json({"type": "llm", "emotion": "neutral"})
 
-            self._process_tts(response_text)
-
-    def _process_llm(self, user_text: str) -> Optional[str]:
+            # 交给 TTS 流水线后，生成器由流水线的句子线程消费并关闭：
+            # 该线程可能仍阻塞在 LLM 流中，此处再 close() 会与之冲突
+            handed_off = True
+            self._process_tts(self._prepend(first_sentence, sentences))
+        finally:
+            turn_over.set()
+            if not handed_off:
+                sentences.close()
+
+    @staticmethod
+    def _prepend(first: str, rest: Iterator[str]) -> Iterator[str]:
+        yield first
+        yield from rest
+
+    def _process_llm(
+        self, user_text: str, turn_over: Callable[[], bool] = lambda: False
+    ) -> Iterator[str]:
         """
         处理 LLM 推理，支持流式输出和中断
 
-        Returns:
-            完整的 LLM 响应文本，如果被中断则返回 None
+        LLM 的增量文本经 StreamingSentenceSplitter 切句，每凑齐一句立即产出，
+        供 TTS 边生成边合成。被中断时静默结束；尚未产出句子时出错直接发送 llm error，
+        已产出句子后出错则抛出 LLMStreamError，由 TTS 在已排队的音频之后发送。
+
+        Args:
+            user_text: 用户输入
+            turn_over: 本轮是否已结束（TTS 已退出），为 True 时不再继续生成
+
+        Yields:
+            待合成的句子（未开启分句时为完整响应）
         """
         if not self.chat_inferencer:
-            return user_text
+            # 无 LLM 时直接回显用户输入（用于测试）
+            text = clean_text_for_tts(user_text)
+            if self.tts_split_by_punctuation:
+                yield from split_text_by_punctuation(text)
+            elif text.strip():
+                yield text
+            return
 
         # self.publish_json({"type": "llm", "state": "start"})
 
+        splitter = StreamingSentenceSplitter()
         full_response = ""
+        emitted = False
         try:
             for chunk in self.chat_inferencer(user_text):
-                if self._is_interrupted():
-                    self.publish_json(
-                        {"type": "llm", "state": "stop", "interrupted": True}
-                    )
-                    return None
+                if self._is_interrupted() or turn_over():
+                    return
 
+                chunk = clean_text_for_tts(chunk)
                 full_response += chunk
                 # 流式发送 LLM 响应文本
                 # self.publish_json({"type": "llm", "text": chunk})
+                if self.tts_split_by_punctuation:
+                    for sentence in splitter.feed(chunk):
+                        emitted = True
+                        yield sentence
 
             # self.publish_json({"type": "llm", "state": "stop"})
-            return full_response
-
         except Exception as e:
+            if emitted:
+                raise LLMStreamError(str(e)) from e
             self.publish_json({"type": "llm", "state": "error", "error": str(e)})
-            return None
+            return
 
-    def _process_tts(self, text: str) -> None:
+        if self.tts_split_by_punctuation:
+            yield from splitter.flush()
+        elif full_response.strip():
+            yield full_response
+
+    def _publish_tts(self, payload: dict) -> None:
+        """发送 tts 控制消息：有播放队列时与音频按顺序排队"""
+        if self.playout is not None:
+            self.playout.push_json(payload)
+        else:
+            self.publish_json(payload)
+
+    def _end_turn_with_error(self, error: Exception) -> None:
+        """本轮处理出错：通知设备 llm error 并结束 TTS，工作循环继续处理下一句"""
+        self._publish_tts({"type": "llm", "state": "error", "error": str(error)})
+        self._publish_tts({"type": "tts", "state": "stop", "interrupted": True})
+        self.clear_interrupt()
+
+    def _publish_tts_interrupted(self) -> None:
+        """丢弃未发出的音频并立即通知设备 TTS 被打断"""
+        if self.playout is not None:
+            self.playout.clear()
+        self.publish_json({"type": "tts", "state": "stop", "interrupted": True})
+
+    def _send_packet(self, packet: bytes) -> None:
+        if self.playout is not None:
+            self.playout.push_audio(packet)
+            # 背压：播放队列积压过多时暂停编码
+            self.playout.wait_writable_blocking(self._is_interrupted)
+            return
+        self.publish_bytes(packet)
+        # 添加延时，控制发送速度接近实时播放
+        if self.audio_send_delay_ms:
+            time.sleep(self.audio_send_delay_ms / 1000.0)
+
+    def _mark(self, stage: str) -> None:
+        if self.turn_timer is not None:
+            self.turn_timer.mark(stage)
+
+    def _mark_sent(self, stage: str) -> None:
+        """在已写入的音频实际发出时记录链路阶段（有播放队列时排在这些音频之后）"""
+        if self.turn_timer is None:
+            return
+        if self.playout is not None:
+            self.playout.push_callback(functools.partial(self.turn_timer.mark, stage))
+        else:
+            self.turn_timer.mark(stage)
+
+    def _on_sent(self, fn: Callable[[float], None]) -> None:
+        """已写入的音频实际发出时以发出时刻调用 fn（有播放队列时排在这些音频之后）"""
+        if self.playout is not None:
+            self.playout.push_callback(lambda: fn(time.perf_counter()))
+        else:
+            fn(time.perf_counter())
+
+    def _trace_sentence(
+        self,
+        index: int,
+        text: str,
+        start: float,
+        packets: int,
+        encode_s: float,
+        sent_at: List[float],
+    ) -> None:
+        """
+        记录一句 TTS 的追踪 span：取音频与编码写入（tts.sentence），
+        以及从首个包到最后一个包实际发出（tts.send，在最后一个包发出时记录）
+        """
+        timer = self.turn_timer
+        if timer is None or not timer.tracing:
+            return
+        timer.span(
+            "tts.sentence",
+            start,
+            time.perf_counter(),
+            "tts",
+            index=index,
+            text=text[:40],
+            packets=packets,
+            encode_ms=round(encode_s * 1000.0, 3),
+        )
+
+        def sent(end: float) -> None:
+            if sent_at:
+                timer.span("tts.send", sent_at[0], end, "tts.sentence", index=index, packets=packets)
+
+        if packets:
+            self._on_sent(sent)
+
+    def _process_tts(self, sentences: Iterable[str]) -> None:
         """
         处理 TTS 合成，支持中断
 
-        将长文本按标点符号切分成短句，分别进行 TTS 合成，
-        按顺序返回音频，实现更快的首包响应时间。
+        逐句消费 LLM 流式切分出的短句，通过 TTSPipeline 前瞻并发合成，
+        按顺序写入播放队列，实现更快的首包响应时间且句间无合成空隙。
+        等队列中的音频全部发出后才结束（期间仍视为 TTS 播放中，可被打断）。
 
         Args:
-            text: 要合成的文本
+            sentences: 待合成的句子迭代器（随 LLM 生成逐步产出）
         """
-        # 清理文本
-        text = clean_text_for_tts(text)
-
-        logger.info(f"TTS start for text: {text[:50]}...")
+        logger.info("TTS start")
         self.state.tts_active = True
-        self.publish_json({"type": "tts", "state": "start"})
-
+        self._mark("tts_start")
+        # 上一轮被打断时编码器可能留有不足一帧的样本
+        self.encoder.reset()
+        self._publish_tts({"type": "tts", "state": "start"})
+
+        pipeline = TTSPipeline(
+            synthesize=self.tts.synthesize,
+            lookahead=self.tts_lookahead,
+            is_cancelled=self._is_interrupted,
+        )
+        self._tts_pipeline = pipeline
+
+        first_sent = False
         try:
-            # 根据配置决定是否按标点切分文本
-            if self.tts_split_by_punctuation:
-                sentences = split_text_by_punctuation(text)
-                logger.info(f"TTS split into {len(sentences)} sentences")
-            else:
-                sentences = [text]
-                logger.info("TTS processing as single sentence (split disabled)")
-
-            for sentence_idx, sentence in enumerate(sentences):
-                if not sentence.strip():
-                    continue
-
+            for sentence_idx, sentence, pcm_chunks in pipeline.run(sentences):
                 if self._is_interrupted():
                     logger.warning(f"TTS interrupted before sentence: {sentence[:20]}...")
-                    self.publish_json(
-                        {"type": "tts", "state": "stop", "interrupted": True}
-                    )
+                    self._publish_tts_interrupted()
                     return
 
                 # 发送句子文本（与官方格式一致：只有 text 字段，没有 state）
                 logger.info(f"TTS sentence[{sentence_idx}] start: {sentence}")
-                self.publish_json({"type": "tts", "text": sentence})
+                self._publish_tts({"type": "tts", "text": sentence})
 
-                # 对每个句子进行 TTS 合成
+                # 后续句子已由流水线在后台预合成，这里只按顺序取出当前句子的音频
+                tracing = self.turn_timer is not None and self.turn_timer.tracing
+                sentence_start = time.perf_counter()
+                sent_at: List[float] = []
+                encode_s = 0.0
                 packet_count = 0
-                for pcm in self.tts.synthesize(sentence):
+                for pcm in pcm_chunks:
                     if self._is_interrupted():
-                        self.publish_json(
-                            {"type": "tts", "state": "stop", "interrupted": True}
-                        )
+                        self._publish_tts_interrupted()
                         return
 
-                    for packet in self.encoder.encode_pcm_float32(pcm):
+                    encode_start = time.perf_counter()
+                    packets = self.encoder.encode_pcm_float32(pcm)
+                    encode_s += time.perf_counter() - encode_start
+                    for packet in packets:
                         if self._is_interrupted():
-                            self.publish_json(
-                                {"type": "tts", "state": "stop", "interrupted": True}
-                            )
+                            self._publish_tts_interrupted()
                             return
-                        self.publish_bytes(packet)
+                        self._send_packet(packet)
                         packet_count += 1
-                        # 添加延时，控制发送速度接近实时播放
-                        if self.audio_send_delay_ms > 0:
-                            time.sleep(self.audio_send_delay_ms / 1000.0)
-
+                        if tracing and packet_count == 1:
+                            self._on_sent(sent_at.append)
+                        if not first_sent:
+                            first_sent = True
+                            self._mark_sent("first_packet_sent")
+
+                if tracing:
+                    self._trace_sentence(
+                        sentence_idx, sentence, sentence_start, packet_count, encode_s, sent_at
+                    )
                 logger.info(f"TTS sentence[{sentence_idx}] end: {sentence} (sent {packet_count} packets)")
 
+            # LLM 在最后一句之后被中断时，句子迭代器会提前结束
+            if self._is_interrupted():
+                logger.warning("TTS interrupted while waiting for LLM")
+                self._publish_tts_interrupted()
+                return
+
+            # 流结束：编码器中剩余的样本补零发出
+            for packet in self.encoder.flush():
+                self._send_packet(packet)
+            self._mark_sent("last_packet_sent")
+
+            self._publish_tts({"type": "tts", "state": "stop"})
+            if self.playout is not None:
+                self.playout.wait_drained_blocking(self._is_interrupted)
+                if self._is_interrupted():
+                    logger.warning("TTS interrupted during playout")
+                    self._publish_tts_interrupted()
+                    return
             logger.info("TTS stop (completed)")
-            self.publish_json({"type": "tts", "state": "stop"})
 
+        except LLMStreamError as e:
+            # 已合成的句子照常播放，llm error 与本轮 TTS 的结束消息排在这些音频之后
+            logger.error(f"LLM failed during TTS: {e}")
+            self._publish_tts({"type": "llm", "state": "error", "error": str(e)})
+            self._publish_tts({"type": "tts", "state": "stop", "interrupted": True})
         except Exception as e:
-            self.publish_json({"type": "tts", "state": "error", "error": str(e)})
+            self._publish_tts({"type": "tts", "state": "error", "error": str(e)})
         finally:
+            self._tts_pipeline = None
             self.state.tts_active = False
+            self._mark("tts_end")
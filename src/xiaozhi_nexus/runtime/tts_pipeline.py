@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterable,
+    Iterator,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_FEEDER_JOIN_TIMEOUT_SEC = 0.5
+
+_ChunkItem = Union[np.ndarray, BaseException, None]
+
+
+@dataclass(eq=False)
+class _SentenceJob:
+    index: int
+    text: str
+    chunks: "queue.Queue[_ChunkItem]" = field(default_factory=queue.Queue)
+
+
+@dataclass
+class TTSPipeline:
+    """
+    有界前瞻的 TTS 合成流水线
+
+    当前句子在播放（按节奏下发音频包）时，后续最多 lookahead 个句子已在有界线程池中并发合成，
+    消除句与句之间一次 TTS 往返的空隙；音频仍严格按句子顺序产出。
+
+    - synthesize: 单句合成函数，返回 float32 PCM 片段迭代器
+    - is_cancelled: 取消判定（通常为会话的打断标志），为 True 时排队/进行中的合成全部放弃
+
+    队列均为阻塞读取；打断时调用方应调用 cancel()，向各队列投递结束标记以立即唤醒等待方。
+    """
+
+    synthesize: Callable[[str], Iterator[np.ndarray]]
+    lookahead: int = 2
+    is_cancelled: Callable[[], bool] = lambda: False
+
+    # 内部状态
+    _stopped: threading.Event = field(
+        default_factory=threading.Event, init=False, repr=False
+    )
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+    _jobs: Optional["queue.Queue"] = field(default=None, init=False, repr=False)
+    _slots: Optional[threading.Semaphore] = field(default=None, init=False, repr=False)
+    _pending: Set[_SentenceJob] = field(default_factory=set, init=False, repr=False)
+
+    def _cancelled(self) -> bool:
+        return self._stopped.is_set() or self.is_cancelled()
+
+    def cancel(self) -> None:
+        """放弃所有尚未播放的句子，并唤醒阻塞在队列上的消费方与句子线程（可从任意线程调用）"""
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            self._stopped.set()
+            if self._jobs is not None:
+                self._jobs.put(None)
+            if self._slots is not None:
+                self._slots.release()
+            for job in self._pending:
+                job.chunks.put(None)
+
+    def run(
+        self, sentences: Iterable[str]
+    ) -> Iterator[Tuple[int, str, Iterator[np.ndarray]]]:
+        """
+        按顺序产出 (句子序号, 句子文本, PCM 片段迭代器)
+
+        句子迭代器在后台线程中消费（可以是仍在生成中的 LLM 输出），并由该线程在结束时关闭；
+        run() 返回后该线程可能仍阻塞在迭代器中，调用方不能再自行关闭它。
+        调用方必须在取下一句之前消费完当前句子的 PCM 迭代器。
+        """
+        size = max(0, int(self.lookahead)) + 1
+        slots = threading.Semaphore(size)
+        jobs: queue.Queue[Union[_SentenceJob, BaseException, None]] = queue.Queue()
+        with self._lock:
+            self._stopped.clear()
+            self._jobs = jobs
+            self._slots = slots
+            self._pending = set()
+        executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="tts-synth")
+
+        feeder = threading.Thread(
+            target=self._feed,
+            args=(sentences, slots, jobs, executor),
+            name="tts-feeder",
+            daemon=True,
+        )
+        feeder.start()
+
+        try:
+            while not self._cancelled():
+                job = jobs.get()
+                if job is None:
+                    return
+                if isinstance(job, BaseException):
+                    raise job
+                try:
+                    yield job.index, job.text, self._iter_chunks(job)
+                finally:
+                    slots.release()
+        finally:
+            self.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+            # 句子迭代器可能正阻塞在 LLM 流上，不能等它返回；线程为守护线程，返回后自行关闭迭代器
+            feeder.join(timeout=_FEEDER_JOIN_TIMEOUT_SEC)
+            if feeder.is_alive():
+                logger.warning("TTS feeder still waiting for LLM output, detaching")
+
+    def _feed(
+        self,
+        sentences: Iterable[str],
+        slots: threading.Semaphore,
+        jobs: "queue.Queue",
+        executor: ThreadPoolExecutor,
+    ) -> None:
+        it = iter(sentences)
+        index = 0
+        try:
+            for sentence in it:
+                if self._cancelled():
+                    return
+                if not sentence.strip():
+                    continue
+                slots.acquire()
+                with self._lock:
+                    if self._cancelled():
+                        return
+                    job = _SentenceJob(index=index, text=sentence)
+                    self._pending.add(job)
+                index += 1
+                executor.submit(self._synthesize_job, job)
+                jobs.put(job)
+        except Exception as e:
+            jobs.put(e)
+        finally:
+            jobs.put(None)
+            close = getattr(it, "close", None)
+            if close is not None:
+                close()
+
+    def _synthesize_job(self, job: _SentenceJob) -> None:
+        chunks = None
+        try:
+            if self._cancelled():
+                return
+            chunks = self.synthesize(job.text)
+            for pcm in chunks:
+                if self._cancelled():
+                    logger.info(f"TTS lookahead cancelled: {job.text[:20]}...")
+                    break
+                job.chunks.put(pcm)
+        except Exception as e:
+            job.chunks.put(e)
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            with self._lock:
+                self._pending.discard(job)
+            job.chunks.put(None)
+
+    def _iter_chunks(self, job: _SentenceJob) -> Iterator[np.ndarray]:
+        while not self._cancelled():
+            item = job.chunks.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+@dataclass
+class _AsyncSentenceJob:
+    index: int
+    text: str
+    chunks: "asyncio.Queue[_ChunkItem]" = field(default_factory=asyncio.Queue)
+
+
+@dataclass
+class AsyncTTSPipeline:
+    """
+    TTSPipeline 的 asyncio 版本
+
+    合成任务以协程形式运行在当前事件循环上，取消时直接 cancel 排队与进行中的任务。
+    """
+
+    synthesize: Callable[[str], AsyncIterator[np.ndarray]]
+    lookahead: int = 2
+
+    async def run(
+        self, sentences: AsyncIterator[str]
+    ) -> AsyncIterator[Tuple[int, str, AsyncIterator[np.ndarray]]]:
+        """
+        按顺序产出 (句子序号, 句子文本, PCM 片段异步迭代器)
+
+        调用方在取下一句之前必须消费完当前句子的 PCM 迭代器；
+        提前结束迭代（如被打断）时，所有前瞻合成任务都会被取消。
+        """
+        slots = asyncio.Semaphore(max(0, int(self.lookahead)) + 1)
+        jobs: asyncio.Queue[Union[_AsyncSentenceJob, BaseException, None]] = (
+            asyncio.Queue()
+        )
+        tasks: Set[asyncio.Task] = set()
+
+        feeder = asyncio.create_task(self._feed(sentences, slots, jobs, tasks))
+
+        try:
+            while True:
+                job = await jobs.get()
+                if job is None:
+                    return
+                if isinstance(job, BaseException):
+                    raise job
+                try:
+                    yield job.index, job.text, self._iter_chunks(job)
+                finally:
+                    slots.release()
+        finally:
+            feeder.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(feeder, *tasks, return_exceptions=True)
+
+    async def _feed(
+        self,
+        sentences: AsyncIterator[str],
+        slots: asyncio.Semaphore,
+        jobs: "asyncio.Queue",
+        tasks: Set[asyncio.Task],
+    ) -> None:
+        index = 0
+        try:
+            async for sentence in sentences:
+                if not sentence.strip():
+                    continue
+                await slots.acquire()
+                job = _AsyncSentenceJob(index=index, text=sentence)
+                index += 1
+                task = asyncio.create_task(self._synthesize_job(job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                jobs.put_nowait(job)
+        except Exception as e:
+            jobs.put_nowait(e)
+        finally:
+            jobs.put_nowait(None)
+
+    async def _synthesize_job(self, job: _AsyncSentenceJob) -> None:
+        try:
+            async for pcm in self.synthesize(job.text):
+                job.chunks.put_nowait(pcm)
+        except Exception as e:
+            job.chunks.put_nowait(e)
+        finally:
+            job.chunks.put_nowait(None)
+
+    async def _iter_chunks(self, job: _AsyncSentenceJob) -> AsyncIterator[np.ndarray]:
+        while True:
+            item = await job.chunks.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
@@ -0,0 +1,98 @@
+"""
+WebSocket 下行发送循环性能基准
+
+对比逐条出队 + json.dumps 的旧发送循环与按批出队 + 预编码模板的 run_sender，
+以单核每秒发出的消息数衡量（WebSocket 用只计数的假对象代替，只测服务端自身开销）。
+
+运行方式:
+    python tests/test_api/bench_sender.py
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+from xiaozhi_nexus.api.outgoing import OutgoingChannel, run_sender
+
+N_TURNS = 2000
+PACKETS_PER_TURN = 50  # 1 秒的 20ms Opus 包
+PACKET = bytes(120)
+
+
+class CountingWebSocket:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def send_text(self, data: str) -> None:
+        self.sent += 1
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.sent += 1
+
+
+def turn_messages():
+    """一轮对话的下行消息：tts start/text、音频、tts stop"""
+    yield "json", {"type": "tts", "state": "start"}
+    yield "json", {"type": "tts", "text": "今天天气不错，适合出门散步。"}
+    for _ in range(PACKETS_PER_TURN):
+        yield "bytes", PACKET
+    yield "json", {"type": "tts", "state": "stop"}
+
+
+async def bench_legacy() -> float:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=2000)
+    ws = CountingWebSocket()
+
+    async def sender_loop() -> None:
+        while True:
+            kind, payload = await queue.get()
+            if kind == "json":
+                await ws.send_text(json.dumps(payload, ensure_ascii=False))
+            else:
+                await ws.send_bytes(payload)
+
+    task = asyncio.create_task(sender_loop())
+    total = 0
+    start = time.perf_counter()
+    for _ in range(N_TURNS):
+        for item in turn_messages():
+            queue.put_nowait(item)
+            total += 1
+        await asyncio.sleep(0)
+    while ws.sent < total:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    return total / elapsed
+
+
+async def bench_batched() -> float:
+    channel = OutgoingChannel(audio_maxsize=100000)
+    ws = CountingWebSocket()
+    task = asyncio.create_task(run_sender(channel, ws))  # type: ignore[arg-type]
+    total = 0
+    start = time.perf_counter()
+    for _ in range(N_TURNS):
+        for kind, payload in turn_messages():
+            if kind == "json":
+                channel.put_control(payload)
+            else:
+                channel.put_audio(payload)
+            total += 1
+        await asyncio.sleep(0)
+    while ws.sent < total:
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    task.cancel()
+    channel.close()
+    return total / elapsed
+
+
+if __name__ == "__main__":
+    legacy = asyncio.run(bench_legacy())
+    batched = asyncio.run(bench_batched())
+    print(f"legacy  (Queue + json.dumps):       {legacy:,.0f} msg/s")
+    print(f"batched (two lanes + templates):    {batched:,.0f} msg/s")
+    print(f"speedup: {batched / legacy:.2f}x")
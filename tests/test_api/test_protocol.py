@@ -0,0 +1,81 @@
+"""
+小智二进制协议 v1/v2/v3 帧的封装与解析
+
+运行方式:
+    python -m pytest tests/test_api/test_protocol.py -v
+"""
+
+from __future__ import annotations
+
+import struct
+
+import pytest
+
+from xiaozhi_nexus.api.protocol import (
+    BINARY_TYPE_JSON,
+    BINARY_TYPE_OPUS,
+    BinaryProtocol,
+    negotiate_version,
+)
+
+
+@pytest.mark.parametrize("version", [2, 3])
+@pytest.mark.parametrize("frame_type", [BINARY_TYPE_OPUS, BINARY_TYPE_JSON])
+def test_frame_parse_roundtrip(version, frame_type):
+    protocol = BinaryProtocol(version=version)
+    payload = bytes(range(200))
+    frame = bytes(protocol.frame(payload, frame_type))
+    parsed = protocol.parse(frame)
+    assert parsed is not None
+    assert parsed.type == frame_type
+    assert bytes(parsed.payload) == payload
+    if version == 2:
+        assert parsed.timestamp_ms is not None
+    else:
+        assert parsed.timestamp_ms is None
+
+
+def test_v2_header_layout():
+    protocol = BinaryProtocol(version=2)
+    frame = bytes(protocol.frame(b"abc"))
+    version, frame_type, reserved, _, size = struct.unpack(">HHIII", frame[:16])
+    assert (version, frame_type, reserved, size) == (2, BINARY_TYPE_OPUS, 0, 3)
+    assert frame[16:] == b"abc"
+
+
+def test_v3_header_layout():
+    protocol = BinaryProtocol(version=3)
+    frame = bytes(protocol.frame(b"abcd", BINARY_TYPE_JSON))
+    assert struct.unpack(">BBH", frame[:4]) == (BINARY_TYPE_JSON, 0, 4)
+    assert frame[4:] == b"abcd"
+
+
+def test_frame_grows_buffer_for_large_payload():
+    protocol = BinaryProtocol(version=3, max_payload=8)
+    payload = b"x" * 100
+    parsed = protocol.parse(bytes(protocol.frame(payload)))
+    assert parsed is not None and bytes(parsed.payload) == payload
+
+
+@pytest.mark.parametrize("version", [2, 3])
+def test_parse_rejects_truncated_frames(version):
+    protocol = BinaryProtocol(version=version)
+    frame = bytes(protocol.frame(b"payload"))
+    assert protocol.parse(frame[:2]) is None
+    assert protocol.parse(frame[:-1]) is None
+
+
+def test_v1_is_raw_opus():
+    protocol = BinaryProtocol(version=1)
+    assert protocol.frame(b"opus") == b"opus"
+    parsed = protocol.parse(b"opus")
+    assert parsed is not None
+    assert parsed.type == BINARY_TYPE_OPUS and bytes(parsed.payload) == b"opus"
+
+
+def test_negotiate_version():
+    assert negotiate_version(3) == 3
+    assert negotiate_version(None, "2") == 2
+    assert negotiate_version(3, max_version=2) == 1
+    assert negotiate_version("bad") == 1
+    assert negotiate_version(7) == 1
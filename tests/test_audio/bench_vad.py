@@ -0,0 +1,57 @@
+"""
+StreamingVAD 性能基准
+
+运行方式:
+    python tests/test_audio/bench_vad.py
+"""
+
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from xiaozhi_nexus.audio.vad import StreamingVAD
+
+SAMPLE_RATE = 16000
+FRAME_MS = 20
+N_FRAMES = 20000
+
+
+def make_test_audio(n_frames: int, frame_size: int) -> np.ndarray:
+    """交替生成 1 秒底噪和 1 秒带噪正弦（模拟说话）"""
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(n_frames * frame_size) * 0.002).astype(np.float32)
+    t = np.arange(audio.shape[0]) / SAMPLE_RATE
+    speech = ((t.astype(np.int64) % 2) == 1).astype(np.float32)
+    audio += (0.3 * np.sin(2 * np.pi * 220 * t) * speech).astype(np.float32)
+    return audio
+
+
+def bench(frames_per_call: int) -> None:
+    vad = StreamingVAD(sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS)
+    frame_size = vad.frame_size
+    audio = make_test_audio(N_FRAMES, frame_size)
+    step = frame_size * frames_per_call
+
+    transitions = 0
+    prev = False
+    start = time.perf_counter()
+    for idx in range(0, audio.shape[0], step):
+        is_speech = vad.process(audio[idx : idx + step])
+        if is_speech is not None and is_speech != prev:
+            transitions += 1
+            prev = is_speech
+    elapsed = time.perf_counter() - start
+
+    per_frame_us = elapsed / N_FRAMES * 1e6
+    print(
+        f"{frames_per_call} frame(s)/call: {per_frame_us:.2f} us/frame "
+        f"({N_FRAMES * FRAME_MS / 1000 / elapsed:.0f}x realtime, "
+        f"{transitions} speech transitions)"
+    )
+
+
+if __name__ == "__main__":
+    for frames_per_call in (1, 3, 10):
+        bench(frames_per_call)
@@ -0,0 +1,63 @@
+"""
+基于 VAD 尾部静音的端点检测
+
+运行方式:
+    python -m pytest tests/test_audio/test_endpointer.py -v
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from xiaozhi_nexus.audio.vad import Endpointer, StreamingVAD
+
+SAMPLE_RATE = 16000
+CHUNK = 320  # 20ms
+
+
+def _chunks(speech_ms: int, silence_ms: int) -> list[np.ndarray]:
+    t = np.arange(SAMPLE_RATE * speech_ms // 1000) / SAMPLE_RATE
+    speech = (0.3 * np.sin(2 * np.pi * 200 * t)).astype(np.float32)
+    silence = np.zeros(SAMPLE_RATE * silence_ms // 1000, dtype=np.float32)
+    pcm = np.concatenate([speech, silence])
+    return [pcm[i : i + CHUNK] for i in range(0, pcm.size, CHUNK)]
+
+
+def _end_offsets_ms(chunks: list[np.ndarray], process, speech_ms: int) -> list[int]:
+    # 每个判定点：相对语音结束的静音时长（以块结束时刻计）
+    return [(i + 1) * 20 - speech_ms for i, chunk in enumerate(chunks) if process(chunk)]
+
+
+def test_silence_is_counted_past_vad_hangover():
+    vad = StreamingVAD(sample_rate=SAMPLE_RATE, hangover_ms=300)
+    endpointer = Endpointer(vad=vad, silence_ms=500)
+    assert _end_offsets_ms(_chunks(1000, 1000), endpointer.process, 1000) == [500]
+    # 不修改注入的 VAD
+    assert vad.hangover_ms == 300
+
+
+def test_short_noise_is_not_committed():
+    endpointer = Endpointer(vad=StreamingVAD(sample_rate=SAMPLE_RATE), min_speech_ms=200)
+    assert _end_offsets_ms(_chunks(100, 1000), endpointer.process, 100) == []
+
+
+def test_shared_vad_is_processed_once():
+    vad = StreamingVAD(sample_rate=SAMPLE_RATE, hangover_ms=300)
+    endpointer = Endpointer(vad=vad, silence_ms=500, feed_vad=False)
+    calls = []
+    process = vad.process
+
+    def counted(chunk):
+        calls.append(chunk.size)
+        return process(chunk)
+
+    vad.process = counted
+
+    def session_then_asr(chunk):
+        # 会话先用同一个 VAD 做打断检测，再把音频交给 ASR 端点检测
+        vad.process(chunk)
+        return endpointer.process(chunk)
+
+    chunks = _chunks(1000, 1000)
+    assert _end_offsets_ms(chunks, session_then_asr, 1000) == [500]
+    assert len(calls) == len(chunks)
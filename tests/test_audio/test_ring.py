@@ -0,0 +1,89 @@
+"""
+上行 PCM 环形缓冲的绕回与溢出
+
+运行方式:
+    python -m pytest tests/test_audio/test_ring.py -v
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from xiaozhi_nexus.audio.ring import PCMRingBuffer
+
+
+def _frame(value: int, size: int = 4) -> np.ndarray:
+    return np.full(size, value, dtype=np.int16)
+
+
+def _pop_values(ring: PCMRingBuffer) -> list[int]:
+    values = []
+    while (view := ring.pop()) is not None:
+        values.append(int(np.frombuffer(view, dtype=np.int16)[0]))
+    return values
+
+
+def test_wraparound_keeps_order():
+    ring = PCMRingBuffer(frame_size=4, capacity=3)
+    for round_start in range(0, 12, 2):
+        # 每次写两帧读两帧，读写位置多次越过槽位末尾
+        ring.write(_frame(round_start))
+        ring.write(_frame(round_start + 1))
+        assert _pop_values(ring) == [round_start, round_start + 1]
+    assert ring.overruns == 0
+    assert len(ring) == 0
+
+
+def test_overrun_drops_oldest_frames():
+    ring = PCMRingBuffer(frame_size=4, capacity=3)
+    for value in range(5):
+        ring.write(_frame(value))
+    assert ring.overruns == 2
+    assert len(ring) == 3
+    assert _pop_values(ring) == [2, 3, 4]
+
+
+def test_partial_frame_length():
+    ring = PCMRingBuffer(frame_size=4, capacity=2)
+    ring.write(np.arange(6, dtype=np.int16))
+    first, second = ring.pop(), ring.pop()
+    assert np.frombuffer(first, dtype=np.int16).tolist() == [0, 1, 2, 3]
+    assert np.frombuffer(second, dtype=np.int16).tolist() == [4, 5]
+    assert ring.pop() is None
+
+
+def test_close_drops_pending_and_ignores_writes():
+    ring = PCMRingBuffer(frame_size=4, capacity=2)
+    ring.write(_frame(1))
+    ring.close()
+    ring.write(_frame(2))
+    assert ring.closed
+    assert ring.pop() is None
+
+
+def test_reserve_drops_oldest_before_overwrite():
+    ring = PCMRingBuffer(frame_size=4, capacity=3)
+    for value in range(3):
+        ring.reserve()[:] = value
+        ring.commit(4)
+
+    # 解码器路径：reserve() 拿到的槽是最旧的未读帧，此时它必须已不可读
+    slot = ring.reserve()
+    assert ring.overruns == 1
+    assert len(ring) == 2
+    first = ring.pop()
+    assert np.frombuffer(first, dtype=np.int16)[0] == 1
+
+    slot[:] = 3
+    ring.commit(4)
+    assert _pop_values(ring) == [2, 3]
+    assert ring.overruns == 1
+
+
+def test_reserve_commit_overrun_keeps_latest_frames():
+    ring = PCMRingBuffer(frame_size=4, capacity=3)
+    for value in range(7):
+        ring.reserve()[:] = value
+        ring.commit(4)
+    assert ring.overruns == 4
+    assert _pop_values(ring) == [4, 5, 6]
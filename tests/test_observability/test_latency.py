@@ -0,0 +1,57 @@
+"""
+TurnTimer 轮次追踪：回复期间用户再次开口（打断）时的阶段归属
+
+运行方式:
+    python -m pytest tests/test_observability/test_latency.py -v
+"""
+
+from __future__ import annotations
+
+from xiaozhi_nexus.observability.latency import TurnTimer
+from xiaozhi_nexus.observability.tracing import Tracer
+
+
+def _timer() -> tuple[TurnTimer, Tracer]:
+    tracer = Tracer(sample_rate=1.0)
+    return TurnTimer(tracer=tracer, device_id="dev", session_id="s1"), tracer
+
+
+def test_speech_start_during_reply_belongs_to_next_turn():
+    timer, tracer = _timer()
+    timer.mark("speech_start")
+    timer.mark("speech_end")
+    timer.mark("first_packet_sent")
+    assert timer.tracing
+
+    # 回复播放中用户开口：记到下一轮，不覆盖本轮的 speech_start
+    timer.mark("speech_start")
+    timer.mark("turn_end")
+    assert not timer.tracing
+
+    (first,) = tracer.recent()
+    assert first.stages["speech_start"] < first.stages["speech_end"]
+    assert first.has("first_packet_sent")
+
+    timer.mark("speech_end")
+    timer.mark("turn_end")
+    second, previous = tracer.recent()
+    assert previous is first
+    assert second.stages["speech_start"] > first.stages["first_packet_sent"]
+    assert second.stages["speech_start"] <= second.stages["speech_end"]
+    assert not second.has("first_packet_sent")
+
+
+def test_new_speech_end_before_turn_end_closes_previous_turn():
+    timer, tracer = _timer()
+    timer.mark("speech_end")
+    timer.mark("llm_first_token")
+    timer.mark("speech_start")  # 打断
+    timer.mark("speech_end")  # 上一轮尚未 turn_end 又说完一句
+    (first,) = tracer.recent()
+    assert first.has("llm_first_token")
+    assert not first.has("speech_start")
+
+    timer.mark("turn_end")
+    second, _ = tracer.recent()
+    assert second.has("speech_start")
+    assert not second.has("llm_first_token")
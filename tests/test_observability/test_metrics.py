@@ -0,0 +1,58 @@
+"""
+直方图分桶与多进程汇总
+
+运行方式:
+    python -m pytest tests/test_observability/test_metrics.py -v
+"""
+
+from __future__ import annotations
+
+from xiaozhi_nexus.observability.metrics import MetricsRegistry, render_snapshots
+
+
+def _samples(metric):
+    return {(name, pairs): value for name, pairs, value in metric.labeled_samples()}
+
+
+def test_histogram_le_is_inclusive_and_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("h_seconds", "h", buckets=(0.1, 0.5, 1.0))
+    for value in (0.1, 0.2, 0.5, 0.7, 1.0, 3.0):
+        histogram.observe(value)
+
+    samples = _samples(histogram)
+    # 等于上界的观测值计入该桶（le 含等号），各桶为累计计数
+    assert samples[("h_seconds_bucket", (("le", "0.1"),))] == 1
+    assert samples[("h_seconds_bucket", (("le", "0.5"),))] == 3
+    assert samples[("h_seconds_bucket", (("le", "1"),))] == 5
+    assert samples[("h_seconds_bucket", (("le", "+Inf"),))] == 6
+    assert samples[("h_seconds_count", ())] == 6
+    assert abs(samples[("h_seconds_sum", ())] - 5.5) < 1e-9
+    assert histogram.count() == 6
+
+
+def test_histogram_labels_are_independent():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("h2", "h", labelnames=("stage",), buckets=(1.0,))
+    histogram.observe(0.5, stage="asr")
+    histogram.observe(2.0, stage="tts")
+    assert histogram.count(stage="asr") == 1
+    assert histogram.count(stage="tts") == 1
+    samples = _samples(histogram)
+    assert samples[("h2_bucket", (("stage", "asr"), ("le", "1")))] == 1
+    assert samples[("h2_bucket", (("stage", "tts"), ("le", "1")))] == 0
+
+
+def test_render_snapshots_merges_workers():
+    snapshots = []
+    for lag in (0.2, 0.05):
+        registry = MetricsRegistry()
+        registry.gauge("lag_seconds", "lag", fn=lambda lag=lag: lag, merge="max")
+        registry.gauge("connections", "connections", fn=lambda: 3)
+        registry.histogram("h3", "h", buckets=(1.0,)).observe(0.5)
+        snapshots.append(registry.snapshot())
+
+    lines = render_snapshots(snapshots).splitlines()
+    assert "lag_seconds 0.2" in lines
+    assert "connections 6" in lines
+    assert 'h3_bucket{le="1"} 2' in lines
@@ -0,0 +1,65 @@
+"""
+多 worker 指标汇总：worker 退出后计数器与直方图保持单调
+
+运行方式:
+    python -m pytest tests/test_observability/test_multiprocess.py -v
+"""
+
+from __future__ import annotations
+
+import json
+
+from xiaozhi_nexus.observability import multiprocess
+from xiaozhi_nexus.observability.metrics import MetricsRegistry
+
+DEAD_PID = 999_999_001
+LIVE_PID = 999_999_002
+
+
+def _write_worker(directory, pid: int, requests: int, connections: int) -> None:
+    registry = MetricsRegistry()
+    registry.counter("mp_requests_total", "requests").inc(requests)
+    registry.gauge("mp_connections", "connections").set(connections)
+    registry.histogram("mp_seconds", "seconds", buckets=(1.0,)).observe(0.5)
+    path = multiprocess.snapshot_path(directory, pid)
+    path.write_text(json.dumps(registry.snapshot()), encoding="utf-8")
+
+
+def _render(directory, monkeypatch) -> list[str]:
+    monkeypatch.setenv(multiprocess.METRICS_DIR_ENV, str(directory))
+    return multiprocess.render_metrics().splitlines()
+
+
+def test_retired_worker_counters_are_kept(tmp_path, monkeypatch):
+    _write_worker(tmp_path, DEAD_PID, requests=5, connections=2)
+    _write_worker(tmp_path, LIVE_PID, requests=3, connections=4)
+    before = _render(tmp_path, monkeypatch)
+    assert "mp_requests_total 8" in before
+    assert "mp_connections 6" in before
+
+    multiprocess.retire_snapshot(tmp_path, DEAD_PID)
+    after = _render(tmp_path, monkeypatch)
+    assert not multiprocess.snapshot_path(tmp_path, DEAD_PID).exists()
+    assert "mp_requests_total 8" in after
+    assert 'mp_seconds_bucket{le="1"} 2' in after
+    # 仪表只反映存活的 worker
+    assert "mp_connections 4" in after
+
+
+def test_retired_totals_accumulate_across_restarts(tmp_path, monkeypatch):
+    for pid in (DEAD_PID, LIVE_PID):
+        _write_worker(tmp_path, pid, requests=2, connections=1)
+        multiprocess.retire_snapshot(tmp_path, pid)
+    lines = _render(tmp_path, monkeypatch)
+    assert "mp_requests_total 4" in lines
+    assert "mp_seconds_count 2" in lines
+    assert not any(line.startswith("mp_connections ") for line in lines)
+
+
+def test_snapshot_still_present_after_retire_is_not_double_counted(tmp_path, monkeypatch):
+    _write_worker(tmp_path, DEAD_PID, requests=5, connections=2)
+    snapshot = multiprocess.snapshot_path(tmp_path, DEAD_PID).read_text(encoding="utf-8")
+    multiprocess.retire_snapshot(tmp_path, DEAD_PID)
+    # 模拟并入 retired.json 之后、删除快照之前被读取
+    multiprocess.snapshot_path(tmp_path, DEAD_PID).write_text(snapshot, encoding="utf-8")
+    assert "mp_requests_total 5" in _render(tmp_path, monkeypatch)
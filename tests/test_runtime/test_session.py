@@ -0,0 +1,226 @@
+"""
+会话的异常路径
+
+- 线程模式：LLM 流停顿期间被打断或 TTS 出错。句子迭代器由 TTS 流水线的后台线程消费，
+  流水线退出时该线程可能仍阻塞在 LLM 流中；会话线程不能因此崩溃，后台线程在 LLM 恢复后应尽快退出
+- 线程/异步模式：单轮处理出错时通知设备并结束本轮，工作循环继续处理下一句；ASR 失败时通知设备
+
+运行方式:
+    python -m pytest tests/test_runtime/test_session.py -v
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from xiaozhi_nexus.runtime.session import StreamSession
+
+STALL_SEC = 1.0
+
+
+class _StallingChat:
+    """产出第一句后停顿 STALL_SEC 秒再继续"""
+
+    def __init__(self) -> None:
+        self.closed = threading.Event()
+
+    def __call__(self, user_text: str):
+        try:
+            yield "第一句话。"
+            yield "然后"
+            time.sleep(STALL_SEC)
+            yield "第二句话。"
+            yield "第三句话。"
+        finally:
+            self.closed.set()
+
+
+class _Encoder:
+    def reset(self) -> None:
+        pass
+
+    def encode_pcm_float32(self, pcm):
+        return [b"opus"]
+
+    def flush(self):
+        return []
+
+
+class _TTS:
+    def __init__(self, fail: bool = False) -> None:
+        self.fail = fail
+
+    def synthesize(self, text: str):
+        if self.fail:
+            raise RuntimeError("tts failed")
+        yield np.zeros(960, dtype=np.float32)
+
+
+def _session(chat: _StallingChat, tts: _TTS, messages: list) -> StreamSession:
+    session = StreamSession(
+        publish_json=messages.append,
+        publish_bytes=lambda packet: None,
+        asr_inferencer=SimpleNamespace(sample_rate=16000),
+        tts=tts,
+        encoder=_Encoder(),
+        chat_inferencer=chat,
+    )
+    session._running.set()
+    return session
+
+
+def _run_turn(session: StreamSession) -> list:
+    errors: list = []
+
+    def target() -> None:
+        try:
+            session._handle_user_text("你好")
+        except BaseException as e:  # noqa: BLE001
+            errors.append(e)
+
+    worker = threading.Thread(target=target, daemon=True)
+    worker.start()
+    return [worker, errors]
+
+
+def _feeder_threads() -> list:
+    return [t for t in threading.enumerate() if t.name == "tts-feeder"]
+
+
+def test_interrupt_while_llm_stalled():
+    chat, messages = _StallingChat(), []
+    session = _session(chat, _TTS(), messages)
+    worker, errors = _run_turn(session)
+    time.sleep(0.3)
+    session.interrupt()
+
+    worker.join(timeout=STALL_SEC)
+    assert not worker.is_alive(), "turn should end without waiting for the LLM"
+    assert errors == []
+    assert {"type": "tts", "state": "stop", "interrupted": True} in messages
+
+    # LLM 恢复后，后台线程停止生成并关闭 LLM 流
+    assert chat.closed.wait(STALL_SEC + 1.0)
+    time.sleep(0.1)
+    assert _feeder_threads() == []
+
+
+def test_tts_error_while_llm_stalled():
+    chat, messages = _StallingChat(), []
+    session = _session(chat, _TTS(fail=True), messages)
+    worker, errors = _run_turn(session)
+
+    worker.join(timeout=STALL_SEC)
+    assert not worker.is_alive()
+    assert errors == []
+    assert any(m.get("type") == "tts" and m.get("state") == "error" for m in messages)
+
+    assert chat.closed.wait(STALL_SEC + 1.0)
+    time.sleep(0.1)
+    assert _feeder_threads() == []
+
+    # 会话仍可处理下一轮
+    session.tts = _TTS()
+    chat2 = _StallingChat()
+    session.chat_inferencer = chat2
+    worker, errors = _run_turn(session)
+    worker.join(timeout=STALL_SEC + 2.0)
+    assert errors == []
+
+
+def _failing_first_turn(session, handled: list) -> None:
+    original = session._handle_user_text
+
+    def handle(user_text: str):
+        handled.append(user_text)
+        if len(handled) == 1:
+            raise RuntimeError("turn failed")
+        return original(user_text)
+
+    session._handle_user_text = handle
+
+
+def test_worker_survives_turn_error():
+    messages, handled = [], []
+    session = _session(_StallingChat(), _TTS(), messages)
+    session.asr_inferencer = lambda audio: iter(["第一轮", "第二轮"])
+    _failing_first_turn(session, handled)
+
+    session._worker()
+
+    assert handled == ["第一轮", "第二轮"]
+    error = messages.index({"type": "llm", "state": "error", "error": "turn failed"})
+    assert messages[error + 1] == {"type": "tts", "state": "stop", "interrupted": True}
+    assert {"type": "stt", "text": "第二轮"} in messages
+
+
+def test_async_worker_survives_turn_error():
+    import asyncio
+
+    from xiaozhi_nexus.runtime.async_session import AsyncStreamSession
+
+    class _AsyncASR:
+        sample_rate = 16000
+
+        async def astream(self, audio):
+            for text in ("第一轮", "第二轮"):
+                yield text
+
+    class _AsyncTTS:
+        async def asynthesize(self, text: str):
+            yield np.zeros(960, dtype=np.float32)
+
+    messages, handled = [], []
+    session = AsyncStreamSession(
+        publish_json=messages.append,
+        publish_bytes=lambda packet: None,
+        asr_inferencer=_AsyncASR(),
+        tts=_AsyncTTS(),
+        encoder=_Encoder(),
+    )
+    session._running = True
+    _failing_first_turn(session, handled)
+
+    asyncio.run(session._worker())
+
+    assert handled == ["第一轮", "第二轮"]
+    error = messages.index({"type": "llm", "state": "error", "error": "turn failed"})
+    assert messages[error + 1] == {"type": "tts", "state": "stop", "interrupted": True}
+    assert {"type": "stt", "text": "第二轮"} in messages
+
+
+def test_async_worker_reports_asr_failure():
+    import asyncio
+
+    from xiaozhi_nexus.runtime.async_session import AsyncStreamSession
+
+    class _FailingASR:
+        sample_rate = 16000
+
+        async def astream(self, audio):
+            raise RuntimeError("Realtime connection pool exhausted (2 connections)")
+            yield  # pragma: no cover
+
+    messages: list = []
+    session = AsyncStreamSession(
+        publish_json=messages.append,
+        publish_bytes=lambda packet: None,
+        asr_inferencer=_FailingASR(),
+        tts=None,
+        encoder=_Encoder(),
+    )
+    session._running = True
+
+    asyncio.run(session._worker())
+
+    assert messages == [
+        {
+            "type": "stt",
+            "state": "error",
+            "error": "Realtime connection pool exhausted (2 connections)",
+        }
+    ]